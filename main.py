@@ -13,23 +13,34 @@ from pathlib import Path
 src_path = Path(__file__).parent / "src"
 sys.path.insert(0, str(src_path))
 
-# Set asyncio event loop policy for Windows
+# Set asyncio event loop policy (uvloop on non-Windows if available)
 if sys.platform.startswith('win'):
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+else:
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
 
 # Import after path setup
 from src.ui.main_window import main
 from src.logger import setup_logger
 
+# Marker cho biết các thư mục làm việc đã được tạo
+DIRS_MARKER = Path("Logs") / ".dirs_ok"
+
 
 def setup_application():
     """
     Setup application environment
     """
-    # Create necessary directories
-    directories = ["Database", "Outputs", "Logs", "docs", "samples"]
-    for directory in directories:
-        Path(directory).mkdir(parents=True, exist_ok=True)
+    # Create necessary directories (chỉ lần chạy đầu, đánh dấu bằng marker file)
+    if not DIRS_MARKER.exists():
+        directories = ["Database", "Outputs", "Logs", "docs", "samples"]
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
+        DIRS_MARKER.touch()
     
     # Setup main logger
     logger = setup_logger(
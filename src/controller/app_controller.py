@@ -6,7 +6,9 @@ Author: MiniMax Agent
 
 import logging
 import asyncio
-from typing import Optional, List, Dict, Any, Callable
+import threading
+import unicodedata
+from typing import Optional, List, Dict, Any, Callable, Tuple
 from datetime import datetime
 from pathlib import Path
 
@@ -22,7 +24,16 @@ from ..models import (
     Industry
 )
 from ..exporter import EnhancedExcelExporter
-from ..logger import setup_dual_logger
+from ..logger import setup_dual_logger, remove_database_handler
+
+
+def _normalize_name(name: str) -> str:
+    """
+    Chuẩn hoá tên để tra cứu: bỏ dấu tiếng Việt, lowercase, gộp khoảng trắng
+    """
+    text = unicodedata.normalize('NFD', name.replace('Đ', 'D').replace('đ', 'd'))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
 
 
 class EnhancedAppController:
@@ -55,8 +66,11 @@ class EnhancedAppController:
             db_manager=self.db_manager
         )
         
-        # Initialize API client
-        self.api_client = ThongTinDoanhNghiepAPIClient(logger=self.logger)
+        # Initialize API client (dữ liệu tham chiếu được cache cạnh database, dùng lại khi khởi động lại)
+        self.api_client = ThongTinDoanhNghiepAPIClient(
+            logger=self.logger,
+            http_cache_path=str(Path(db_path).parent / "http_cache.sqlite")
+        )
         self.api_helper = APIHelper(self.api_client)
         
         # Initialize enhanced data service
@@ -73,21 +87,26 @@ class EnhancedAppController:
         # Progress callback
         self.progress_callback = progress_callback
         
-        # Cache cho reference data
-        self._cities_cache = None
-        self._industries_cache = None
+        # Cache cho reference data: tuple bất biến + index build một lần mỗi lần tải
+        self._reference_lock = threading.Lock()
+        self._cities_cache: Tuple[City, ...] = ()
+        self._cities_by_slug: Dict[str, City] = {}
+        self._cities_by_name_norm: Dict[str, City] = {}
+        self._industries_cache: Tuple[Industry, ...] = ()
+        self._industries_by_slug: Dict[str, Industry] = {}
+        self._industries_by_name_norm: Dict[str, Industry] = {}
         
         self.logger.info("EnhancedAppController initialized")
     
-    def get_cities(self, use_cache: bool = True) -> List[City]:
+    def get_cities(self, use_cache: bool = True) -> Tuple[City, ...]:
         """
         Lấy danh sách tỉnh/thành phố
         
         Args:
-            use_cache: Sử dụng cache
+            use_cache: Sử dụng cache (False = tải lại và build lại index)
             
         Returns:
-            List of City objects
+            Tuple of City objects
         """
         try:
             if use_cache and self._cities_cache:
@@ -95,25 +114,28 @@ class EnhancedAppController:
             
             cities = self.api_client.get_cities(use_cache=use_cache)
             
-            if use_cache:
-                self._cities_cache = cities
+            if cities:
+                with self._reference_lock:
+                    self._cities_cache = tuple(cities)
+                    self._cities_by_slug = {city.slug: city for city in cities}
+                    self._cities_by_name_norm = {_normalize_name(city.name): city for city in cities}
             
             self.logger.info(f"Retrieved {len(cities)} cities")
-            return cities
+            return self._cities_cache
             
         except Exception as e:
             self.logger.error(f"Failed to get cities: {e}")
-            return []
+            return ()
     
-    def get_industries(self, use_cache: bool = True) -> List[Industry]:
+    def get_industries(self, use_cache: bool = True) -> Tuple[Industry, ...]:
         """
         Lấy danh sách ngành nghề
         
         Args:
-            use_cache: Sử dụng cache
+            use_cache: Sử dụng cache (False = tải lại và build lại index)
             
         Returns:
-            List of Industry objects
+            Tuple of Industry objects
         """
         try:
             if use_cache and self._industries_cache:
@@ -121,19 +143,24 @@ class EnhancedAppController:
             
             industries = self.api_client.get_industries(use_cache=use_cache)
             
-            if use_cache:
-                self._industries_cache = industries
+            if industries:
+                with self._reference_lock:
+                    self._industries_cache = tuple(industries)
+                    self._industries_by_slug = {industry.slug: industry for industry in industries}
+                    self._industries_by_name_norm = {
+                        _normalize_name(industry.name): industry for industry in industries
+                    }
             
             self.logger.info(f"Retrieved {len(industries)} industries")
-            return industries
+            return self._industries_cache
             
         except Exception as e:
             self.logger.error(f"Failed to get industries: {e}")
-            return []
+            return ()
     
     def find_city_by_name(self, name: str) -> Optional[City]:
         """
-        Tìm tỉnh/thành phố theo tên
+        Tìm tỉnh/thành phố theo tên hoặc slug
         
         Args:
             name: Tên tỉnh/thành phố
@@ -141,11 +168,23 @@ class EnhancedAppController:
         Returns:
             City object hoặc None
         """
-        return self.api_helper.find_city_by_name(name)
+        if not self._cities_cache:
+            self.get_cities()
+        
+        key = _normalize_name(name)
+        city = self._cities_by_name_norm.get(key) or self._cities_by_slug.get(name.strip())
+        if city is None:
+            # Fuzzy match qua api_helper, ghi nhớ kết quả cho các lần sau
+            city = self.api_helper.find_city_by_name(name)
+            if city is not None:
+                with self._reference_lock:
+                    self._cities_by_name_norm[key] = city
+        
+        return city
     
     def find_industry_by_name(self, name: str) -> Optional[Industry]:
         """
-        Tìm ngành nghề theo tên
+        Tìm ngành nghề theo tên hoặc slug
         
         Args:
             name: Tên ngành nghề
@@ -153,7 +192,19 @@ class EnhancedAppController:
         Returns:
             Industry object hoặc None
         """
-        return self.api_helper.find_industry_by_name(name)
+        if not self._industries_cache:
+            self.get_industries()
+        
+        key = _normalize_name(name)
+        industry = self._industries_by_name_norm.get(key) or self._industries_by_slug.get(name.strip())
+        if industry is None:
+            # Fuzzy match qua api_helper, ghi nhớ kết quả cho các lần sau
+            industry = self.api_helper.find_industry_by_name(name)
+            if industry is not None:
+                with self._reference_lock:
+                    self._industries_by_name_norm[key] = industry
+        
+        return industry
     
     async def collect_companies(
         self,
@@ -161,7 +212,8 @@ class EnhancedAppController:
         industry_name: Optional[str] = None,
         max_companies: int = 100,
         enable_hsctvn: bool = True,
-        hsctvn_delay: float = 2.0
+        hsctvn_delay: float = 2.0,
+        hsctvn_concurrency: int = 4
     ) -> Dict[str, Any]:
         """
         Thu thập dữ liệu công ty enhanced
@@ -171,7 +223,8 @@ class EnhancedAppController:
             industry_name: Tên ngành nghề
             max_companies: Số công ty tối đa
             enable_hsctvn: Có kích hoạt HSCTVN integration
-            hsctvn_delay: Delay giữa HSCTVN requests
+            hsctvn_delay: Delay của mỗi worker sau một HSCTVN request
+            hsctvn_concurrency: Số HSCTVN requests chạy đồng thời tối đa
             
         Returns:
             Thống kê kết quả
@@ -206,7 +259,8 @@ class EnhancedAppController:
                 industry_slug=industry_slug,
                 max_companies=max_companies,
                 enable_hsctvn=enable_hsctvn,
-                hsctvn_delay=hsctvn_delay
+                hsctvn_delay=hsctvn_delay,
+                hsctvn_concurrency=hsctvn_concurrency
             )
             
             self.logger.info(f"Collection completed successfully: {stats}")
@@ -247,7 +301,7 @@ class EnhancedAppController:
     
     def export_to_excel(
         self,
-        companies: List[EnhancedCompany],
+        companies: Optional[List[EnhancedCompany]] = None,
         filename: Optional[str] = None,
         include_charts: bool = True
     ) -> str:
@@ -255,7 +309,7 @@ class EnhancedAppController:
         Xuất dữ liệu ra Excel
         
         Args:
-            companies: Danh sách công ty
+            companies: Danh sách công ty (None = stream toàn bộ công ty từ database)
             filename: Tên file
             include_charts: Có bao gồm biểu đồ
             
@@ -263,7 +317,7 @@ class EnhancedAppController:
             Đường dẫn file đã tạo
         """
         try:
-            if not companies:
+            if companies is not None and not companies:
                 raise ValueError("No companies to export")
             
             # Auto-generate filename if not provided
@@ -271,12 +325,20 @@ class EnhancedAppController:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"enhanced_companies_{timestamp}.xlsx"
             
-            # Export using enhanced exporter
-            output_path = self.excel_exporter.export_enhanced_companies(
-                companies=companies,
-                filename=filename,
-                include_charts=include_charts
-            )
+            if companies is None:
+                # Stream từ database theo batch, không materialize cả danh sách
+                output_path = self.excel_exporter.export_enhanced_companies_stream(
+                    self.data_service.iter_enhanced_companies_from_db(batch_size=1000),
+                    filename=filename,
+                    include_charts=include_charts
+                )
+            else:
+                # Export using enhanced exporter
+                output_path = self.excel_exporter.export_enhanced_companies(
+                    companies=companies,
+                    filename=filename,
+                    include_charts=include_charts
+                )
             
             self.logger.info(f"Excel export completed: {output_path}")
             return output_path
@@ -285,6 +347,25 @@ class EnhancedAppController:
             self.logger.error(f"Excel export failed: {e}")
             raise
     
+    async def export_to_excel_async(
+        self,
+        companies: Optional[List[EnhancedCompany]] = None,
+        filename: Optional[str] = None,
+        include_charts: bool = True
+    ) -> str:
+        """
+        Xuất dữ liệu ra Excel trên worker thread (không block event loop)
+        
+        Args:
+            companies: Danh sách công ty (None = stream toàn bộ công ty từ database)
+            filename: Tên file
+            include_charts: Có bao gồm biểu đồ
+        
+        Returns:
+            Đường dẫn file đã tạo
+        """
+        return await asyncio.to_thread(self.export_to_excel, companies, filename, include_charts)
+    
     def get_database_stats(self) -> Dict[str, Any]:
         """
         Lấy thống kê database
@@ -412,6 +493,8 @@ class EnhancedAppController:
                 self.api_client.close()
             
             if hasattr(self, 'db_manager'):
+                # Ghi nốt và gỡ database log handler trước khi đóng database
+                remove_database_handler(self.logger)
                 self.db_manager.close()
             
             self.logger.info("EnhancedAppController closed")
@@ -5,18 +5,91 @@ Author: MiniMax Agent
 """
 
 import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import islice
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 from datetime import datetime
 import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.datavalidation import DataValidation
 from openpyxl.chart import BarChart, Reference
+from openpyxl.cell import WriteOnlyCell
 
 from ..models.enhanced_company import EnhancedCompany
 
 
+# Các trường quan trọng dùng để tính tỷ lệ hoàn chỉnh (tên hiển thị -> thuộc tính)
+IMPORTANT_FIELDS = {
+    'Tên công ty': 'ten_cong_ty',
+    'Địa chỉ': 'dia_chi_dang_ky',
+    'Người đại diện': 'nguoi_dai_dien',
+    'Điện thoại': 'dien_thoai',
+    'Ngành nghề': 'nganh_nghe_kinh_doanh_chinh',
+    'Tỉnh thành': 'tinh_thanh_pho'
+}
+
+# Chữ cái cột Excel, index theo số thứ tự cột (1-based): _COL_LETTERS[1] == 'A'
+_COL_LETTERS = ('',) + tuple(get_column_letter(i) for i in range(1, 64))
+
+# Độ rộng đặc biệt cho từng loại cột (số thứ tự cột -> độ rộng)
+SPECIAL_COLUMN_WIDTHS = {
+    1: 15,   # Mã số thuế
+    2: 30,   # Tên công ty
+    3: 40,   # Địa chỉ
+    4: 20,   # Người đại diện
+    5: 15,   # Điện thoại
+    8: 15,   # Tỉnh thành phố
+    17: 35,  # Ngành nghề chính
+}
+
+# Các trường HSCTVN bổ sung cho công ty có nguồn "dual"
+DUAL_ENHANCED_FIELDS = ('dien_thoai_dai_dien', 'dai_dien_phap_luat', 'dia_chi_thue')
+
+
+@dataclass(slots=True)
+class ExportStats:
+    """
+    Thống kê tổng hợp cho export, tính trong một lượt duyệt companies
+    """
+    total: int = 0
+    data_source_counts: Counter = field(default_factory=Counter)
+    status_counts: Counter = field(default_factory=Counter)
+    province_counts: Counter = field(default_factory=Counter)
+    field_completeness_counts: Counter = field(default_factory=Counter)
+    dual_enhanced_counts: Counter = field(default_factory=Counter)
+
+
+@dataclass(slots=True, frozen=True)
+class _StyleBundle:
+    """
+    Bộ style (Font/Fill/Border/Alignment) dùng chung cho nhiều cells
+    
+    Cùng một object được gán cho mọi cell nên openpyxl chỉ lưu một entry trong styles.xml.
+    """
+    font: Optional[Font] = None
+    fill: Optional[PatternFill] = None
+    border: Optional[Border] = None
+    alignment: Optional[Alignment] = None
+    
+    def apply(self, cell):
+        if self.font is not None:
+            cell.font = self.font
+        if self.fill is not None:
+            cell.fill = self.fill
+        if self.border is not None:
+            cell.border = self.border
+        if self.alignment is not None:
+            cell.alignment = self.alignment
+
+
+# Các cột quan trọng (1-based): MST, Tên, Đại diện, ĐT
+IMPORTANT_COLUMNS = (1, 2, 4, 5)
+
+
 class EnhancedExcelExporter:
     """
     Enhanced Excel exporter với 31 cột và formatting chuyên nghiệp
@@ -48,6 +121,40 @@ class EnhancedExcelExporter:
         if not companies:
             raise ValueError("No companies to export")
         
+        # Cả danh sách là một batch: độ rộng cột được đo trên toàn bộ dữ liệu
+        return self.export_enhanced_companies_stream(
+            companies,
+            filename=filename,
+            include_charts=include_charts,
+            total_hint=len(companies),
+            batch_size=len(companies)
+        )
+    
+    def export_enhanced_companies_stream(
+        self,
+        company_iter: Iterable[EnhancedCompany],
+        filename: Optional[str] = None,
+        include_charts: bool = True,
+        total_hint: Optional[int] = None,
+        batch_size: int = 1000
+    ) -> str:
+        """
+        Export enhanced companies từ một iterable (vd. generator đọc database theo batch)
+        
+        Rows được append vào write-only sheet theo từng batch và thống kê được cộng dồn,
+        nên bộ nhớ chỉ phụ thuộc batch_size chứ không phụ thuộc tổng số công ty.
+        
+        Args:
+            company_iter: Iterable các EnhancedCompany
+            filename: Tên file (auto-generate nếu None)
+            include_charts: Có bao gồm biểu đồ không
+            total_hint: Số công ty dự kiến (chỉ dùng cho log)
+            batch_size: Số công ty xử lý mỗi batch; batch đầu dùng để đo độ rộng cột
+        
+        Returns:
+            Đường dẫn file đã tạo
+        """
+        
         # Auto-generate filename
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -56,151 +163,186 @@ class EnhancedExcelExporter:
         output_path = self.output_dir / filename
         
         try:
-            # Tạo workbook với styles
-            wb = openpyxl.Workbook()
-            self._setup_styles(wb)
+            if total_hint:
+                self.logger.info(f"Exporting ~{total_hint} enhanced companies to {output_path}")
+            
+            # Tạo workbook write-only (rows được stream thẳng ra file) với styles
+            wb = openpyxl.Workbook(write_only=True)
+            self._setup_styles()
+            
+            # Sheet 1: Main Data (31 columns), thống kê được cộng dồn theo batch
+            ws_main = wb.create_sheet("Company Data")
+            stats = ExportStats()
+            self._create_main_data_sheet(ws_main, company_iter, stats, batch_size)
             
-            # Sheet 1: Main Data (31 columns)
-            ws_main = wb.active
-            ws_main.title = "Company Data"
-            self._create_main_data_sheet(ws_main, companies)
+            if not stats.total:
+                raise ValueError("No companies to export")
             
             # Sheet 2: Summary & Statistics
             ws_summary = wb.create_sheet("Summary")
-            self._create_enhanced_summary_sheet(ws_summary, companies)
+            summary_rows = self._create_enhanced_summary_sheet(ws_summary, stats)
             
             # Sheet 3: Data Source Analysis
             ws_sources = wb.create_sheet("Data Sources")
-            self._create_data_source_analysis(ws_sources, companies)
+            self._create_data_source_analysis(ws_sources, stats)
             
             # Thêm charts nếu yêu cầu
             if include_charts:
-                self._add_charts(ws_summary, companies)
+                self._add_charts(ws_summary, stats, summary_rows + 2)
             
             # Lưu file
             wb.save(output_path)
             
-            self.logger.info(f"Exported {len(companies)} enhanced companies to {output_path}")
+            self.logger.info(f"Exported {stats.total} enhanced companies to {output_path}")
             return str(output_path)
             
         except Exception as e:
             self.logger.error(f"Failed to export enhanced Excel: {e}")
             raise
     
-    def _setup_styles(self, wb):
+    @staticmethod
+    def _iter_batches(items: Iterable[EnhancedCompany], batch_size: int) -> Iterator[List[EnhancedCompany]]:
         """
-        Thiết lập các styles cho workbook
+        Chia iterable thành các batch (list) có tối đa batch_size phần tử
         """
-        # Header style
-        header_style = NamedStyle(name="header")
-        header_style.font = Font(bold=True, color="FFFFFF", size=12)
-        header_style.fill = PatternFill(start_color="2F4F4F", end_color="2F4F4F", fill_type="solid")
-        header_style.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        header_style.border = Border(
-            left=Side(style='medium'),
-            right=Side(style='medium'),
-            top=Side(style='medium'),
-            bottom=Side(style='medium')
-        )
-        
-        # Data style
-        data_style = NamedStyle(name="data")
-        data_style.alignment = Alignment(vertical="center", wrap_text=True)
-        data_style.border = Border(
+        iterator = iter(items)
+        while True:
+            batch = list(islice(iterator, max(batch_size, 1)))
+            if not batch:
+                return
+            yield batch
+    
+    def _setup_styles(self):
+        """
+        Thiết lập các style bundles dùng chung cho workbook
+        """
+        thin_border = Border(
             left=Side(style='thin'),
             right=Side(style='thin'),
             top=Side(style='thin'),
             bottom=Side(style='thin')
         )
+        data_alignment = Alignment(vertical="center", wrap_text=True)
         
-        # Important data style (for key fields)
-        important_style = NamedStyle(name="important")
-        important_style.font = Font(bold=True)
-        important_style.fill = PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid")
-        important_style.alignment = Alignment(vertical="center", wrap_text=True)
-        important_style.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
+        # Header style
+        self.header_style = _StyleBundle(
+            font=Font(bold=True, color="FFFFFF", size=12),
+            fill=PatternFill(start_color="2F4F4F", end_color="2F4F4F", fill_type="solid"),
+            border=Border(
+                left=Side(style='medium'),
+                right=Side(style='medium'),
+                top=Side(style='medium'),
+                bottom=Side(style='medium')
+            ),
+            alignment=Alignment(horizontal="center", vertical="center", wrap_text=True)
         )
         
-        # Thêm styles vào workbook
-        wb.add_named_style(header_style)
-        wb.add_named_style(data_style)
-        wb.add_named_style(important_style)
+        # Data style
+        self.data_style = _StyleBundle(border=thin_border, alignment=data_alignment)
+        
+        # Important data style (for key fields)
+        self.important_style = _StyleBundle(
+            font=Font(bold=True),
+            fill=PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid"),
+            border=thin_border,
+            alignment=data_alignment
+        )
     
-    def _create_main_data_sheet(self, ws, companies: List[EnhancedCompany]):
+    def _create_main_data_sheet(
+        self,
+        ws,
+        companies: Iterable[EnhancedCompany],
+        stats: ExportStats,
+        batch_size: int
+    ):
         """
         Tạo sheet dữ liệu chính với 31 cột
+        
+        Sheet ở chế độ write-only: độ rộng cột, freeze panes và chiều cao header
+        phải được đặt trước khi append hàng đầu tiên, nên độ rộng được đo trên batch đầu.
         """
         # Lấy headers (31 cột)
         headers = EnhancedCompany.get_excel_headers()
+        batches = self._iter_batches(companies, batch_size)
+        first_batch = next(batches, [])
+        if not first_batch:
+            return
+        
+        # Dựng các hàng của batch đầu và đồng thời ghi nhận độ dài lớn nhất của từng cột,
+        # bắt đầu từ độ dài header (bỏ qua các cột có độ rộng cố định)
+        measured_cols = [i for i in range(len(headers)) if i + 1 not in SPECIAL_COLUMN_WIDTHS]
+        max_lens = [len(header) for header in headers]
+        first_rows = EnhancedCompany.to_excel_rows(first_batch)
+        for row_data in first_rows:
+            for i in measured_cols:
+                value = row_data[i]
+                if value:
+                    length = len(str(value))
+                    if length > max_lens[i]:
+                        max_lens[i] = length
         
-        # Viết headers
-        for col_idx, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.style = "header"
+        # Auto-resize columns với giới hạn thông minh
+        self._smart_resize_columns(ws, max_lens)
         
-        # Viết dữ liệu
-        for row_idx, company in enumerate(companies, start=2):
-            row_data = company.to_excel_row()
-            
-            for col_idx, value in enumerate(row_data, start=1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                
-                # Áp dụng style dựa trên cột
-                if col_idx in [1, 2, 4, 5]:  # Các cột quan trọng: MST, Tên, Đại diện, ĐT
-                    cell.style = "important"
-                else:
-                    cell.style = "data"
+        # Freeze panes
+        ws.freeze_panes = "D2"  # Freeze 3 cột đầu và header
         
         # Đặt độ cao hàng header
         ws.row_dimensions[1].height = 40
         
-        # Auto-resize columns với giới hạn thông minh
-        self._smart_resize_columns(ws)
+        # Viết headers
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            self.header_style.apply(cell)
+            header_cells.append(cell)
+        ws.append(header_cells)
         
-        # Freeze panes
-        ws.freeze_panes = "D2"  # Freeze 3 cột đầu và header
+        # Viết dữ liệu theo từng batch, cộng dồn thống kê
+        self._compute_all_stats(first_batch, stats)
+        self._append_data_rows(ws, first_rows)
+        
+        for batch in batches:
+            self._compute_all_stats(batch, stats)
+            self._append_data_rows(ws, EnhancedCompany.to_excel_rows(batch))
         
         # Thêm filter
-        ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}{len(companies) + 1}"
+        ws.auto_filter.ref = f"A1:{_COL_LETTERS[len(headers)]}{stats.total + 1}"
         
         # Data validation cho một số cột
-        self._add_data_validation(ws, len(companies) + 1)
+        self._add_data_validation(ws, stats.total + 1)
     
-    def _smart_resize_columns(self, ws):
+    def _append_data_rows(self, ws, rows: Iterable[List[Any]]):
         """
-        Tự động điều chỉnh độ rộng cột thông minh
+        Append các hàng dữ liệu (đã convert bằng to_excel_rows) vào write-only sheet
         """
-        # Độ rộng đặc biệt cho từng loại cột
-        special_widths = {
-            1: 15,   # Mã số thuế
-            2: 30,   # Tên công ty
-            3: 40,   # Địa chỉ
-            4: 20,   # Người đại diện
-            5: 15,   # Điện thoại
-            8: 15,   # Tỉnh thành phố
-            17: 35,  # Ngành nghề chính
-        }
+        # Style của từng cột, chọn một lần cho mọi hàng
+        column_styles = [
+            self.important_style if col_idx in IMPORTANT_COLUMNS else self.data_style
+            for col_idx in range(1, len(_COL_LETTERS))
+        ]
+        
+        for row_data in rows:
+            row_cells = []
+            for value, style in zip(row_data, column_styles):
+                cell = WriteOnlyCell(ws, value=value)
+                style.apply(cell)
+                row_cells.append(cell)
+            ws.append(row_cells)
+    
+    def _smart_resize_columns(self, ws, max_lens: List[int]):
+        """
+        Tự động điều chỉnh độ rộng cột thông minh
         
-        for column in ws.columns:
-            column_letter = get_column_letter(column[0].column)
-            col_idx = column[0].column
+        Args:
+            max_lens: Độ dài nội dung lớn nhất của từng cột (đo khi dựng các hàng)
+        """
+        for col_idx, max_length in enumerate(max_lens, start=1):
+            column_letter = _COL_LETTERS[col_idx]
             
-            if col_idx in special_widths:
-                ws.column_dimensions[column_letter].width = special_widths[col_idx]
+            if col_idx in SPECIAL_COLUMN_WIDTHS:
+                ws.column_dimensions[column_letter].width = SPECIAL_COLUMN_WIDTHS[col_idx]
             else:
-                # Tính toán độ rộng dựa trên nội dung
-                max_length = 0
-                for cell in column:
-                    try:
-                        if cell.value:
-                            max_length = max(max_length, len(str(cell.value)))
-                    except:
-                        pass
-                
                 # Đặt độ rộng (giới hạn 12-40)
                 adjusted_width = max(12, min(max_length + 2, 40))
                 ws.column_dimensions[column_letter].width = adjusted_width
@@ -217,172 +359,169 @@ class EnhancedExcelExporter:
         )
         
         # Áp dụng cho cột tình trạng (cột 20)
-        status_validation.add(f"T2:T{total_rows}")
-        ws.add_data_validation(status_validation)
+        status_col = _COL_LETTERS[20]
+        status_validation.add(f"{status_col}2:{status_col}{total_rows}")
+        # Write-only sheet không có add_data_validation()
+        ws.data_validations.append(status_validation)
     
-    def _create_enhanced_summary_sheet(self, ws, companies: List[EnhancedCompany]):
+    def _title_cell(self, ws, value: str, **font_kwargs) -> WriteOnlyCell:
+        """
+        Tạo cell tiêu đề (bold) cho write-only sheet
+        """
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = Font(bold=True, **font_kwargs)
+        return cell
+    
+    def _create_enhanced_summary_sheet(self, ws, stats: ExportStats) -> int:
         """
         Tạo sheet tổng hợp nâng cao
+        
+        Returns:
+            Số hàng đã ghi (để đặt dữ liệu chart phía dưới)
         """
         # Title
-        ws['A1'] = "Báo cáo Tổng hợp Thu thập Dữ liệu Doanh nghiệp (Enhanced)"
-        ws['A1'].font = Font(size=16, bold=True, color="2F4F4F")
-        ws.merge_cells('A1:E1')
+        ws.append([self._title_cell(ws, "Báo cáo Tổng hợp Thu thập Dữ liệu Doanh nghiệp (Enhanced)",
+                                    size=16, color="2F4F4F")])
+        ws.append([])
         
         # Timestamp và thông tin cơ bản
-        ws['A3'] = f"Tạo lúc: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        ws['A4'] = f"Tổng số công ty: {len(companies)}"
+        ws.append([f"Tạo lúc: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"])
+        ws.append([f"Tổng số công ty: {stats.total}"])
+        ws.append([])
+        row = 5
         
         # Thống kê theo nguồn dữ liệu
-        row = 6
-        ws[f'A{row}'] = "Thống kê theo nguồn dữ liệu:"
-        ws[f'A{row}'].font = Font(bold=True, size=12)
-        
-        data_source_stats = {}
-        for company in companies:
-            source = company.data_source
-            data_source_stats[source] = data_source_stats.get(source, 0) + 1
-        
+        ws.append([self._title_cell(ws, "Thống kê theo nguồn dữ liệu:", size=12)])
         row += 1
-        for source, count in data_source_stats.items():
-            ws[f'B{row}'] = f"{source}: {count} công ty ({count/len(companies)*100:.1f}%)"
+        
+        for source, count in stats.data_source_counts.items():
+            ws.append([None, f"{source}: {count} công ty ({count/stats.total*100:.1f}%)"])
             row += 1
         
         # Thống kê theo tình trạng
-        row += 1
-        ws[f'A{row}'] = "Thống kê theo tình trạng hoạt động:"
-        ws[f'A{row}'].font = Font(bold=True, size=12)
-        
-        status_stats = {}
-        for company in companies:
-            status = company.tinh_trang_hoat_dong or "Không xác định"
-            status_stats[status] = status_stats.get(status, 0) + 1
+        ws.append([])
+        ws.append([self._title_cell(ws, "Thống kê theo tình trạng hoạt động:", size=12)])
+        row += 2
         
-        row += 1
-        for status, count in status_stats.items():
-            ws[f'B{row}'] = f"{status}: {count} công ty"
+        for status, count in stats.status_counts.items():
+            ws.append([None, f"{status}: {count} công ty"])
             row += 1
         
         # Thống kê theo tỉnh thành
-        row += 1
-        ws[f'A{row}'] = "Top 10 tỉnh thành có nhiều công ty nhất:"
-        ws[f'A{row}'].font = Font(bold=True, size=12)
-        
-        province_stats = {}
-        for company in companies:
-            province = company.tinh_thanh_pho or "Không xác định"
-            province_stats[province] = province_stats.get(province, 0) + 1
+        ws.append([])
+        ws.append([self._title_cell(ws, "Top 10 tỉnh thành có nhiều công ty nhất:", size=12)])
+        row += 2
         
         # Sắp xếp và lấy top 10
-        top_provinces = sorted(province_stats.items(), key=lambda x: x[1], reverse=True)[:10]
+        top_provinces = stats.province_counts.most_common(10)
         
-        row += 1
         for i, (province, count) in enumerate(top_provinces, 1):
-            ws[f'B{row}'] = f"{i}. {province}: {count} công ty"
+            ws.append([None, f"{i}. {province}: {count} công ty"])
             row += 1
         
         # Chất lượng dữ liệu
-        row += 1
-        ws[f'A{row}'] = "Chất lượng dữ liệu:"
-        ws[f'A{row}'].font = Font(bold=True, size=12)
+        ws.append([])
+        ws.append([self._title_cell(ws, "Chất lượng dữ liệu:", size=12)])
+        row += 2
         
-        # Đếm các trường có dữ liệu
-        field_completeness = self._calculate_field_completeness(companies)
+        # Tỷ lệ các trường có dữ liệu
+        field_completeness = self._calculate_field_completeness(stats)
         
-        row += 1
-        for field, percentage in field_completeness.items():
-            ws[f'B{row}'] = f"{field}: {percentage:.1f}% hoàn chỉnh"
+        for display_name, percentage in field_completeness.items():
+            ws.append([None, f"{display_name}: {percentage:.1f}% hoàn chỉnh"])
             row += 1
+        
+        return row
     
-    def _calculate_field_completeness(self, companies: List[EnhancedCompany]) -> Dict[str, float]:
+    def _compute_all_stats(
+        self,
+        companies: List[EnhancedCompany],
+        stats: Optional[ExportStats] = None
+    ) -> ExportStats:
         """
-        Tính toán tỷ lệ hoàn chỉnh cho các trường quan trọng
+        Tính tất cả thống kê cho các sheet tổng hợp trong một lượt duyệt companies
+        
+        Nếu truyền stats, kết quả được cộng dồn vào đó (dùng khi export theo batch).
         """
-        if not companies:
-            return {}
+        if stats is None:
+            stats = ExportStats()
         
-        important_fields = {
-            'Tên công ty': 'ten_cong_ty',
-            'Địa chỉ': 'dia_chi_dang_ky',
-            'Người đại diện': 'nguoi_dai_dien',
-            'Điện thoại': 'dien_thoai',
-            'Ngành nghề': 'nganh_nghe_kinh_doanh_chinh',
-            'Tỉnh thành': 'tinh_thanh_pho'
-        }
+        stats.total += len(companies)
         
-        completeness = {}
-        total_companies = len(companies)
+        get_keys = attrgetter('data_source', 'tinh_trang_hoat_dong', 'tinh_thanh_pho')
+        field_items = list(IMPORTANT_FIELDS.items())
+        get_fields = attrgetter(*IMPORTANT_FIELDS.values())
+        get_dual_fields = attrgetter(*DUAL_ENHANCED_FIELDS)
         
-        for display_name, field_name in important_fields.items():
-            complete_count = 0
-            for company in companies:
-                value = getattr(company, field_name, None)
+        for company in companies:
+            source, status, province = get_keys(company)
+            stats.data_source_counts[source] += 1
+            stats.status_counts[status or "Không xác định"] += 1
+            stats.province_counts[province or "Không xác định"] += 1
+            
+            for (display_name, _), value in zip(field_items, get_fields(company)):
                 if value and str(value).strip():
-                    complete_count += 1
+                    stats.field_completeness_counts[display_name] += 1
             
-            completeness[display_name] = (complete_count / total_companies) * 100
+            if source == "dual":
+                for field_name, value in zip(DUAL_ENHANCED_FIELDS, get_dual_fields(company)):
+                    if value:
+                        stats.dual_enhanced_counts[field_name] += 1
         
-        return completeness
+        return stats
     
-    def _create_data_source_analysis(self, ws, companies: List[EnhancedCompany]):
+    def _calculate_field_completeness(self, stats: ExportStats) -> Dict[str, float]:
         """
-        Tạo sheet phân tích nguồn dữ liệu
+        Tính toán tỷ lệ hoàn chỉnh cho các trường quan trọng
         """
-        ws['A1'] = "Phân tích Nguồn Dữ liệu"
-        ws['A1'].font = Font(size=14, bold=True)
-        
-        # Phân tích chi tiết theo nguồn
-        api_only = [c for c in companies if c.data_source == "api"]
-        hsctvn_only = [c for c in companies if c.data_source == "hsctvn"]
-        dual_source = [c for c in companies if c.data_source == "dual"]
+        if not stats.total:
+            return {}
         
-        row = 3
-        ws[f'A{row}'] = "Phân phối nguồn dữ liệu:"
-        ws[f'A{row}'].font = Font(bold=True)
+        return {
+            display_name: (stats.field_completeness_counts[display_name] / stats.total) * 100
+            for display_name in IMPORTANT_FIELDS
+        }
+    
+    def _create_data_source_analysis(self, ws, stats: ExportStats):
+        """
+        Tạo sheet phân tích nguồn dữ liệu
+        """
+        ws.append([self._title_cell(ws, "Phân tích Nguồn Dữ liệu", size=14)])
+        ws.append([])
         
-        row += 1
-        ws[f'B{row}'] = f"Chỉ từ API chính: {len(api_only)} công ty"
-        row += 1
-        ws[f'B{row}'] = f"Chỉ từ HSCTVN: {len(hsctvn_only)} công ty"
-        row += 1
-        ws[f'B{row}'] = f"Kết hợp 2 nguồn: {len(dual_source)} công ty"
+        ws.append([self._title_cell(ws, "Phân phối nguồn dữ liệu:")])
+        ws.append([None, f"Chỉ từ API chính: {stats.data_source_counts['api']} công ty"])
+        ws.append([None, f"Chỉ từ HSCTVN: {stats.data_source_counts['hsctvn']} công ty"])
+        ws.append([None, f"Kết hợp 2 nguồn: {stats.data_source_counts['dual']} công ty"])
         
         # Lợi ích của việc kết hợp
-        row += 2
-        ws[f'A{row}'] = "Lợi ích của việc tích hợp HSCTVN:"
-        ws[f'A{row}'].font = Font(bold=True)
+        ws.append([])
+        ws.append([self._title_cell(ws, "Lợi ích của việc tích hợp HSCTVN:")])
         
-        # Đếm số công ty có thêm thông tin từ HSCTVN
-        enhanced_phone = len([c for c in dual_source if c.dien_thoai_dai_dien])
-        enhanced_legal_rep = len([c for c in dual_source if c.dai_dien_phap_luat])
-        enhanced_address = len([c for c in dual_source if c.dia_chi_thue])
+        # Số công ty có thêm thông tin từ HSCTVN
+        enhanced = stats.dual_enhanced_counts
         
-        row += 1
-        ws[f'B{row}'] = f"Có thêm số điện thoại: {enhanced_phone} công ty"
-        row += 1
-        ws[f'B{row}'] = f"Có thêm đại diện pháp luật: {enhanced_legal_rep} công ty"
-        row += 1
-        ws[f'B{row}'] = f"Có thêm địa chỉ thuế: {enhanced_address} công ty"
+        ws.append([None, f"Có thêm số điện thoại: {enhanced['dien_thoai_dai_dien']} công ty"])
+        ws.append([None, f"Có thêm đại diện pháp luật: {enhanced['dai_dien_phap_luat']} công ty"])
+        ws.append([None, f"Có thêm địa chỉ thuế: {enhanced['dia_chi_thue']} công ty"])
     
-    def _add_charts(self, ws, companies: List[EnhancedCompany]):
+    def _add_charts(self, ws, stats: ExportStats, start_row: int):
         """
         Thêm biểu đồ vào sheet
+        
+        Dùng lại thống kê đã tổng hợp cho summary sheet, không duyệt lại companies.
+        Dữ liệu chart được append vào cuối sheet, bắt đầu từ start_row
+        (sheet write-only không ghi được vào ô tuỳ ý).
         """
+        status_stats = stats.status_counts
         try:
-            # Biểu đồ phân phối theo tình trạng
-            status_stats = {}
-            for company in companies:
-                status = company.tinh_trang_hoat_dong or "Không xác định"
-                status_stats[status] = status_stats.get(status, 0) + 1
-            
-            # Tạo dữ liệu cho chart
-            start_row = 25
-            ws[f'G{start_row}'] = "Tình trạng"
-            ws[f'H{start_row}'] = "Số lượng"
+            # Biểu đồ phân phối theo tình trạng: tạo dữ liệu cho chart (cột G, H)
+            ws.append([])
+            padding = [None] * 6
+            ws.append(padding + ["Tình trạng", "Số lượng"])
             
-            for i, (status, count) in enumerate(status_stats.items(), 1):
-                ws[f'G{start_row + i}'] = status
-                ws[f'H{start_row + i}'] = count
+            for status, count in status_stats.items():
+                ws.append(padding + [status, count])
             
             # Tạo chart
             chart = BarChart()
@@ -397,7 +536,7 @@ class EnhancedExcelExporter:
             chart.add_data(data, titles_from_data=True)
             chart.set_categories(cats)
             
-            ws.add_chart(chart, "J25")
+            ws.add_chart(chart, f"J{start_row}")
             
         except Exception as e:
-            self.logger.warning(f"Failed to add charts: {e}")
\ No newline at end of file
+            self.logger.warning(f"Failed to add charts: {e}")
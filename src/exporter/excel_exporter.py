@@ -5,12 +5,107 @@ Author: MiniMax Agent
 """
 
 import logging
+import math
+import sys
+import warnings
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Sequence, Tuple, Union
+from datetime import datetime, timezone
+from dataclasses import fields, is_dataclass
+from itertools import islice
 import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Font, Alignment, PatternFill
 from openpyxl.utils import get_column_letter
+from openpyxl.writer.excel import ExcelWriter as OpenpyxlWriter
+from openpyxl.worksheet.filters import AutoFilter
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+
+try:
+    import xlsxwriter
+except ImportError:  # xlsxwriter là tuỳ chọn, mặc định dùng openpyxl
+    xlsxwriter = None
+
+try:
+    import pyexcelerate
+except ImportError:  # pyexcelerate là tuỳ chọn, mặc định dùng openpyxl
+    pyexcelerate = None
+
+
+# Số hàng đầu tiên dùng để ước lượng độ rộng cột khi ghi write-only
+WIDTH_SAMPLE_ROWS = 1000
+
+# Số công ty tối đa mỗi file export (Excel giới hạn 1,048,576 hàng mỗi sheet)
+ROWS_PER_FILE = 500_000
+
+# Từ số công ty này trở lên, engine openpyxl ghi thẳng XML của sheet (_fast_raw_export)
+RAW_EXPORT_THRESHOLD = 10_000
+
+# Các phần cố định của file xlsx cho _fast_raw_export
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_RAW_CONTENT_TYPES = _XML_HEADER + (
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RAW_ROOT_RELS = _XML_HEADER + (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_RAW_WORKBOOK_RELS = _XML_HEADER + (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+    f'<Relationship Id="rId2" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Style 0: mặc định; style 1: header (bold, chữ trắng, nền 366092, căn giữa)
+_RAW_STYLES = _XML_HEADER + (
+    f'<styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="2">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '<font><b/><sz val="11"/><color rgb="FFFFFFFF"/><name val="Calibri"/><family val="2"/></font>'
+    '</fonts>'
+    '<fills count="3">'
+    '<fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="FF366092"/><bgColor rgb="FF366092"/></patternFill></fill>'
+    '</fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="2" borderId="0" xfId="0" '
+    'applyFont="1" applyFill="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="center"/></xf>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+# Kiểu giá trị ghi thẳng vào cell, không cần chuyển đổi
+_PLAIN_TYPES = frozenset((str, int, float, bool))
+
+# Header formatting dùng chung
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
 
 
 class ExcelExporter:
@@ -18,27 +113,49 @@ class ExcelExporter:
     Basic Excel exporter cho company data
     """
     
-    def __init__(self, output_dir: str = "Outputs"):
+    def __init__(self, output_dir: str = "Outputs", engine: str = "openpyxl", compression_level: int = 6):
+        """
+        Args:
+            output_dir: Thư mục chứa file export
+            engine: "openpyxl", "xlsxwriter" hoặc "pyexcelerate" (nhanh hơn cho export lớn)
+            compression_level: Mức nén zip của file xlsx (0: không nén, 1: nhanh nhất ... 9),
+                áp dụng cho engine openpyxl; nên dùng 1 hoặc 0 cho file tạm dùng ngay rồi bỏ
+        """
+        optional_engines = {"xlsxwriter": xlsxwriter, "pyexcelerate": pyexcelerate}
+        if engine != "openpyxl" and engine not in optional_engines:
+            raise ValueError(f"Unsupported Excel engine: {engine}")
+        if not 0 <= compression_level <= 9:
+            raise ValueError(f"Invalid compression level: {compression_level}")
+        self.compression_level = compression_level
+        
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.logger = logging.getLogger(__name__)
+        
+        if engine in optional_engines and optional_engines[engine] is None:
+            self.logger.warning(f"{engine} is not installed, falling back to openpyxl")
+            engine = "openpyxl"
+        self.engine = engine
     
     def export_companies(
         self,
         companies: List[Dict[str, Any]],
         filename: Optional[str] = None,
-        sheet_name: str = "Companies"
-    ) -> str:
+        sheet_name: str = "Companies",
+        rows_per_file: Optional[int] = ROWS_PER_FILE
+    ) -> Union[str, List[str]]:
         """
         Export danh sách công ty ra Excel
         
         Args:
-            companies: Danh sách công ty
+            companies: Danh sách công ty (dict, hoặc CompanyDetail/CompanySearchResult)
             filename: Tên file (auto-generate nếu None)
             sheet_name: Tên sheet
+            rows_per_file: Số công ty tối đa mỗi file; nhiều hơn sẽ tách thành
+                các file <tên>_part1.xlsx, <tên>_part2.xlsx, ... (None: không tách)
             
         Returns:
-            Đường dẫn file đã tạo
+            Đường dẫn file đã tạo, hoặc danh sách đường dẫn nếu export bị tách
         """
         
         if not companies:
@@ -49,101 +166,385 @@ class ExcelExporter:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"companies_export_{timestamp}.xlsx"
         
+        # Tách thành nhiều file khi vượt ngưỡng
+        if rows_per_file and len(companies) > rows_per_file:
+            name = Path(filename)
+            paths = []
+            for part, start in enumerate(range(0, len(companies), rows_per_file), start=1):
+                paths.append(self.export_companies(
+                    companies[start:start + rows_per_file],
+                    filename=f"{name.stem}_part{part}{name.suffix}",
+                    sheet_name=sheet_name,
+                    rows_per_file=None
+                ))
+            
+            self.logger.info(f"Split {len(companies)} companies into {len(paths)} files")
+            return paths
+        
         output_path = self.output_dir / filename
         
+        if self.engine == "xlsxwriter":
+            return self._export_companies_xlsxwriter(companies, output_path, sheet_name)
+        if self.engine == "pyexcelerate":
+            return self._export_companies_pyexcelerate(companies, output_path, sheet_name)
+        if len(companies) >= RAW_EXPORT_THRESHOLD:
+            return self._fast_raw_export(companies, output_path, sheet_name)
+        
         try:
-            # Tạo workbook
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = sheet_name
+            # Tạo workbook write-only (rows được stream thẳng ra file)
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet(sheet_name)
             
             # Lấy headers từ company đầu tiên
-            headers = list(companies[0].keys())
+            headers = self._company_headers(companies)
+            self._write_companies_rows(ws, companies, headers)
             
-            # Viết headers
-            self._write_headers(ws, headers)
+            # Lưu file
+            self._save_workbook(wb, output_path)
             
-            # Viết dữ liệu
-            for row_idx, company in enumerate(companies, start=2):
-                for col_idx, header in enumerate(headers, start=1):
-                    value = company.get(header, '')
-                    
-                    # Xử lý giá trị đặc biệt
-                    if value is None:
-                        value = ''
-                    elif isinstance(value, (list, dict)):
-                        value = str(value)
-                    
-                    ws.cell(row=row_idx, column=col_idx, value=value)
+            self.logger.info(f"Exported {len(companies)} companies to {output_path}")
+            return str(output_path)
             
-            # Auto-resize columns
-            self._auto_resize_columns(ws)
+        except Exception as e:
+            self.logger.error(f"Failed to export Excel: {e}")
+            raise
+    
+    def _export_companies_xlsxwriter(
+        self,
+        companies: List[Dict[str, Any]],
+        output_path: Path,
+        sheet_name: str
+    ) -> str:
+        """
+        Export danh sách công ty bằng xlsxwriter (constant_memory: mỗi hàng được flush ra đĩa)
+        """
+        try:
+            wb = xlsxwriter.Workbook(
+                str(output_path),
+                {'constant_memory': True, 'strings_to_numbers': False}
+            )
+            ws = wb.add_worksheet(sheet_name)
+            header_format = wb.add_format({
+                'bold': True,
+                'bg_color': '#366092',
+                'font_color': '#FFFFFF',
+                'align': 'center',
+                'valign': 'vcenter'
+            })
+            
+            # Lấy headers từ company đầu tiên
+            headers = self._company_headers(companies)
+            rows = self._iter_rows(companies, headers)
             
-            # Apply basic formatting
-            self._apply_basic_formatting(ws, len(companies) + 1)
+            # constant_memory ghi theo thứ tự hàng: độ rộng cột đặt trước, đo trên các hàng mẫu
+            sample_rows = list(islice(rows, WIDTH_SAMPLE_ROWS))
+            for col_idx, width in enumerate(self._column_widths(headers, sample_rows)):
+                ws.set_column(col_idx, col_idx, width)
+            ws.freeze_panes(1, 0)
             
-            # Lưu file
-            wb.save(output_path)
+            ws.write_row(0, 0, headers, header_format)
+            
+            row_idx = 1
+            for row in sample_rows:
+                ws.write_row(row_idx, 0, row)
+                row_idx += 1
+            for row in rows:
+                ws.write_row(row_idx, 0, row)
+                row_idx += 1
+            
+            wb.close()
             
             self.logger.info(f"Exported {len(companies)} companies to {output_path}")
             return str(output_path)
-            
+        
         except Exception as e:
             self.logger.error(f"Failed to export Excel: {e}")
             raise
     
-    def _write_headers(self, ws, headers: List[str]):
+    def _export_companies_pyexcelerate(
+        self,
+        companies: List[Dict[str, Any]],
+        output_path: Path,
+        sheet_name: str
+    ) -> str:
         """
-        Viết headers với formatting
+        Export danh sách công ty bằng PyExcelerate (sheet XML được dựng một lượt từ list 2 chiều)
         """
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
+        try:
+            headers = self._company_headers(companies)
+            data = [headers]
+            data.extend(self._iter_rows(companies, headers))
+            
+            wb = pyexcelerate.Workbook()
+            ws = wb.new_sheet(sheet_name, data=data)
+            
+            # Header style cho cả hàng 1 (không truy cập từng cell)
+            ws.set_row_style(1, pyexcelerate.Style(
+                font=pyexcelerate.Font(bold=True, color=pyexcelerate.Color(255, 255, 255)),
+                fill=pyexcelerate.Fill(background=pyexcelerate.Color(54, 96, 146)),
+                alignment=pyexcelerate.Alignment(horizontal="center", vertical="center")
+            ))
+            
+            widths = self._column_widths(headers, data[1:WIDTH_SAMPLE_ROWS + 1])
+            for col_idx, width in enumerate(widths, start=1):
+                ws.set_col_style(col_idx, pyexcelerate.Style(size=width))
+            ws.panes = pyexcelerate.Panes(0, 1)
+            
+            wb.save(str(output_path))
+            
+            self.logger.info(f"Exported {len(companies)} companies to {output_path}")
+            return str(output_path)
         
-        for col_idx, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
+        except Exception as e:
+            self.logger.error(f"Failed to export Excel: {e}")
+            raise
     
-    def _auto_resize_columns(self, ws):
+    def _fast_raw_export(
+        self,
+        companies: List[Dict[str, Any]],
+        output_path: Path,
+        sheet_name: str
+    ) -> str:
         """
-        Tự động điều chỉnh độ rộng cột
+        Export danh sách công ty bằng cách ghi thẳng XML của sheet vào file xlsx
+        
+        Bỏ qua toàn bộ Cell/Style objects của openpyxl: mỗi hàng là một chuỗi XML,
+        string được ghi inline (t="inlineStr") nên không cần bảng shared strings.
+        Header vẫn có style, freeze, filter và độ rộng cột như export_companies.
         """
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
+        try:
+            headers = self._company_headers(companies)
+            letters = [get_column_letter(col_idx) for col_idx in range(1, len(headers) + 1)]
+            last_ref = f"{letters[-1]}{len(companies) + 1}"
+            
+            rows = self._iter_rows(companies, headers)
+            sample_rows = list(islice(rows, WIDTH_SAMPLE_ROWS))
+            widths = self._column_widths(headers, sample_rows)
+            
+            quoted_sheet = "'" + sheet_name.replace("'", "''") + "'"
+            filter_range = f"$A$1:${letters[-1]}${len(companies) + 1}"
+            workbook_xml = _XML_HEADER + (
+                f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+                f'<sheets><sheet name={quoteattr(sheet_name)} sheetId="1" r:id="rId1"/></sheets>'
+                '<definedNames><definedName name="_xlnm._FilterDatabase" localSheetId="0" hidden="1">'
+                f'{escape(quoted_sheet)}!{filter_range}</definedName></definedNames>'
+                '</workbook>'
+            )
             
-            for cell in column:
-                try:
-                    if cell.value:
-                        max_length = max(max_length, len(str(cell.value)))
-                except:
-                    pass
+            sheet_head = _XML_HEADER + (
+                f'<worksheet xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+                '<sheetViews><sheetView workbookViewId="0">'
+                '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+                '</sheetView></sheetViews>'
+                '<cols>' + ''.join(
+                    f'<col min="{i}" max="{i}" width="{width}" customWidth="1"/>'
+                    for i, width in enumerate(widths, start=1)
+                ) + '</cols><sheetData>'
+            )
+            header_row = '<row r="1">' + ''.join(
+                f'<c r="{letter}1" s="1" t="inlineStr"><is><t>{escape(str(header))}</t></is></c>'
+                for letter, header in zip(letters, headers)
+            ) + '</row>'
+            
+            with self._open_archive(output_path) as zf:
+                zf.writestr('[Content_Types].xml', _RAW_CONTENT_TYPES)
+                zf.writestr('_rels/.rels', _RAW_ROOT_RELS)
+                zf.writestr('xl/workbook.xml', workbook_xml)
+                zf.writestr('xl/_rels/workbook.xml.rels', _RAW_WORKBOOK_RELS)
+                zf.writestr('xl/styles.xml', _RAW_STYLES)
+                
+                with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+                    sheet.write((sheet_head + header_row).encode('utf-8'))
+                    
+                    buffer = []
+                    row_num = 1
+                    for part in (sample_rows, rows):
+                        for row_data in part:
+                            row_num += 1
+                            buffer.append(self._raw_row_xml(row_num, letters, row_data))
+                            if len(buffer) >= 1000:
+                                sheet.write(''.join(buffer).encode('utf-8'))
+                                buffer.clear()
+                    
+                    buffer.append(f'</sheetData><autoFilter ref="A1:{last_ref}"/></worksheet>')
+                    sheet.write(''.join(buffer).encode('utf-8'))
             
-            # Đặt độ rộng (giới hạn 50 ký tự)
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+            self.logger.info(f"Exported {len(companies)} companies to {output_path}")
+            return str(output_path)
+        
+        except Exception as e:
+            self.logger.error(f"Failed to export Excel: {e}")
+            raise
     
-    def _apply_basic_formatting(self, ws, total_rows: int):
+    @staticmethod
+    def _raw_row_xml(row_num: int, letters: List[str], row_data: List[Any]) -> str:
         """
-        Áp dụng formatting cơ bản
+        Dựng XML của một hàng dữ liệu cho _fast_raw_export
         """
-        # Border style
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
+        cells = []
+        for letter, value in zip(letters, row_data):
+            if value == '' or value is None:
+                continue
+            cls = value.__class__
+            if cls is bool:
+                cells.append(f'<c r="{letter}{row_num}" t="b"><v>{int(value)}</v></c>')
+            elif cls is int or (cls is float and math.isfinite(value)):
+                cells.append(f'<c r="{letter}{row_num}"><v>{value!r}</v></c>')
+            else:
+                text = ILLEGAL_CHARACTERS_RE.sub('', str(value))
+                space = ' xml:space="preserve"' if text != text.strip() else ''
+                cells.append(
+                    f'<c r="{letter}{row_num}" t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+                )
+        return f'<row r="{row_num}">' + ''.join(cells) + '</row>'
+    
+    def _open_archive(self, output_path: Path) -> zipfile.ZipFile:
+        """
+        Mở file zip đích theo compression_level
+        """
+        if self.compression_level == 0:
+            return zipfile.ZipFile(output_path, 'w', zipfile.ZIP_STORED, allowZip64=True)
+        return zipfile.ZipFile(
+            output_path, 'w', zipfile.ZIP_DEFLATED,
+            allowZip64=True, compresslevel=self.compression_level
         )
+    
+    def _save_workbook(self, wb, output_path: Path):
+        """
+        Lưu openpyxl workbook (như wb.save) nhưng với mức nén của exporter
+        """
+        wb.properties.modified = datetime.now(timezone.utc).replace(tzinfo=None)
+        OpenpyxlWriter(wb, self._open_archive(output_path)).save()
+    
+    def _write_companies_rows(self, ws, companies: List[Dict[str, Any]], headers: Sequence[str]):
+        """
+        Ghi header và các hàng công ty vào write-only sheet
+        """
+        rows = self._iter_rows(companies, headers)
         
-        # Áp dụng border cho tất cả các cell có dữ liệu
-        for row in ws.iter_rows(min_row=1, max_row=total_rows):
-            for cell in row:
-                cell.border = thin_border
-        
-        # Freeze first row
+        # Độ rộng cột và freeze panes phải đặt trước khi append hàng đầu tiên
+        sample_rows = list(islice(rows, WIDTH_SAMPLE_ROWS))
+        self._set_column_widths(ws, headers, sample_rows)
         ws.freeze_panes = "A2"
+        
+        # Viết headers
+        ws.append(self._header_cells(ws, headers))
+        
+        # Viết dữ liệu
+        for row in sample_rows:
+            ws.append(row)
+        for row in rows:
+            ws.append(row)
+        
+        # Table style thay cho border từng cell
+        self._apply_basic_formatting(ws, headers, len(companies) + 1)
+    
+    @staticmethod
+    def _company_headers(companies: List[Any]) -> Tuple[str, ...]:
+        """
+        Lấy headers từ company đầu tiên (keys của dict, hoặc các field public của model)
+        
+        Headers được intern để các lần dict.get theo header so khớp key bằng identity.
+        """
+        first = companies[0]
+        if is_dataclass(first):
+            names = (f.name for f in fields(first) if not f.name.startswith('_'))
+        else:
+            names = first.keys()
+        return tuple(sys.intern(name) if name.__class__ is str else name for name in names)
+    
+    @classmethod
+    def _iter_rows(cls, companies: List[Any], headers: Sequence[str]):
+        """
+        Sinh từng hàng giá trị (theo thứ tự headers) cho các writer
+        
+        companies là list dict, hoặc list model (CompanyDetail, CompanySearchResult):
+        model trả hàng trực tiếp qua to_row, không dựng dict trung gian.
+        """
+        cell_value = cls._cell_value
+        plain_types = _PLAIN_TYPES
+        use_rows = is_dataclass(companies[0]) if companies else False
+        for company in companies:
+            values = company.to_row(headers) if use_rows else map(company.get, headers)
+            # Giá trị kiểu cơ bản đi thẳng; chỉ None/list/dict/... mới qua _cell_value
+            yield [
+                value if value.__class__ in plain_types else cell_value(value)
+                for value in values
+            ]
+    
+    @staticmethod
+    def _cell_value(value: Any) -> Any:
+        """
+        Chuyển giá trị sang dạng ghi được vào cell
+        """
+        if value is None:
+            return ''
+        if isinstance(value, (list, dict)):
+            return str(value)
+        return value
+    
+    def _header_cells(self, ws, headers: Sequence[str]) -> List[WriteOnlyCell]:
+        """
+        Tạo header cells có formatting cho write-only sheet
+        """
+        cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = HEADER_FONT
+            cell.fill = HEADER_FILL
+            cell.alignment = HEADER_ALIGNMENT
+            cells.append(cell)
+        return cells
+    
+    @staticmethod
+    def _measure_rows(rows: Iterable[List[Any]], widths: List[int]) -> Iterator[List[Any]]:
+        """
+        Cho các hàng đi qua, đồng thời cập nhật độ dài lớn nhất của từng cột vào widths
+        """
+        for row in rows:
+            for i, value in enumerate(row):
+                if value:
+                    length = len(value) if value.__class__ is str else len(str(value))
+                    if length > widths[i]:
+                        widths[i] = length
+            yield row
+    
+    @classmethod
+    def _column_widths(cls, headers: Sequence[str], rows: Iterable[List[Any]]) -> List[int]:
+        """
+        Tính độ rộng cột theo headers và các hàng (giới hạn 50 ký tự)
+        """
+        widths = [len(str(header)) for header in headers]
+        for _ in cls._measure_rows(rows, widths):
+            pass
+        return [min(width + 2, 50) for width in widths]
+    
+    def _set_column_widths(self, ws, headers: Sequence[str], rows: List[List[Any]]):
+        """
+        Đặt độ rộng cột cho openpyxl sheet
+        """
+        for col_idx, width in enumerate(self._column_widths(headers, rows), start=1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
+    
+    def _apply_basic_formatting(self, ws, headers: Sequence[str], total_rows: int):
+        """
+        Áp dụng formatting cơ bản
+        
+        Vùng dữ liệu được khai báo là một Excel Table: Excel tự vẽ đường kẻ và
+        sọc hàng theo table style, thay vì gán border cho từng cell.
+        """
+        ref = f"A1:{get_column_letter(len(headers))}{total_rows}"
+        table = Table(displayName="CompaniesTable", ref=ref, autoFilter=AutoFilter(ref=ref))
+        # Khai báo tên cột sẵn (write-only sheet không đọc lại được hàng header)
+        table.tableColumns = [
+            TableColumn(id=col_idx, name=str(header))
+            for col_idx, header in enumerate(headers, start=1)
+        ]
+        table.tableStyleInfo = TableStyleInfo(name="TableStyleMedium2", showRowStripes=True)
+        with warnings.catch_warnings():
+            # Cột đã được khai báo ở trên, bỏ qua cảnh báo của write-only mode
+            warnings.filterwarnings("ignore", "In write-only mode")
+            ws.add_table(table)
     
     def export_summary_report(
         self,
@@ -170,32 +571,19 @@ class ExcelExporter:
         output_path = self.output_dir / filename
         
         try:
-            wb = openpyxl.Workbook()
+            wb = openpyxl.Workbook(write_only=True)
             
             # Sheet 1: Summary Statistics
-            ws_summary = wb.active
-            ws_summary.title = "Summary"
+            ws_summary = wb.create_sheet("Summary")
             self._create_summary_sheet(ws_summary, stats)
             
             # Sheet 2: Company Data
             ws_companies = wb.create_sheet("Companies")
             if companies:
-                headers = list(companies[0].keys())
-                self._write_headers(ws_companies, headers)
-                
-                for row_idx, company in enumerate(companies, start=2):
-                    for col_idx, header in enumerate(headers, start=1):
-                        value = company.get(header, '')
-                        if value is None:
-                            value = ''
-                        elif isinstance(value, (list, dict)):
-                            value = str(value)
-                        ws_companies.cell(row=row_idx, column=col_idx, value=value)
-                
-                self._auto_resize_columns(ws_companies)
-                self._apply_basic_formatting(ws_companies, len(companies) + 1)
+                headers = self._company_headers(companies)
+                self._write_companies_rows(ws_companies, companies, headers)
             
-            wb.save(output_path)
+            self._save_workbook(wb, output_path)
             
             self.logger.info(f"Exported summary report to {output_path}")
             return str(output_path)
@@ -208,33 +596,32 @@ class ExcelExporter:
         """
         Tạo sheet thống kê tổng hợp
         """
-        # Title
-        ws['A1'] = "Báo cáo Tổng hợp Thu thập Dữ liệu Doanh nghiệp"
-        ws['A1'].font = Font(size=16, bold=True)
-        ws.merge_cells('A1:D1')
+        bold = Font(bold=True)
         
-        # Timestamp
-        ws['A2'] = f"Tạo lúc: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        ws['A2'].font = Font(size=12)
+        # Dựng toàn bộ các hàng trước, font gắn theo chỉ số hàng
+        rows = [
+            ["Báo cáo Tổng hợp Thu thập Dữ liệu Doanh nghiệp"],
+            [f"Tạo lúc: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"],
+            [],
+            ["Thống kê tổng quát:"]
+        ]
+        fonts = {0: Font(size=16, bold=True), 1: Font(size=12), 3: bold}
         
-        # Basic stats
-        row = 4
-        ws[f'A{row}'] = "Thống kê tổng quát:"
-        ws[f'A{row}'].font = Font(bold=True)
-        
-        row += 1
         for key, value in stats.items():
             if isinstance(value, dict):
-                ws[f'A{row}'] = f"{key}:"
-                ws[f'A{row}'].font = Font(bold=True)
-                row += 1
-                
-                for sub_key, sub_value in value.items():
-                    ws[f'B{row}'] = f"  {sub_key}: {sub_value}"
-                    row += 1
+                fonts[len(rows)] = bold
+                rows.append([f"{key}:"])
+                rows.extend([None, f"  {sub_key}: {sub_value}"] for sub_key, sub_value in value.items())
             else:
-                ws[f'A{row}'] = f"{key}: {value}"
-                row += 1
+                rows.append([f"{key}: {value}"])
+        
+        # Độ rộng cột A, B (tiêu đề tràn sang các cột bên cạnh nên không tính)
+        self._set_column_widths(ws, ["", ""], rows[1:])
         
-        # Auto-resize
-        self._auto_resize_columns(ws)
\ No newline at end of file
+        for row_idx, row in enumerate(rows):
+            font = fonts.get(row_idx)
+            if font is not None:
+                cell = WriteOnlyCell(ws, value=row[0])
+                cell.font = font
+                row = [cell] + row[1:]
+            ws.append(row)
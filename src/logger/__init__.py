@@ -1,4 +1,9 @@
 # Logger package
-from .app_logger import setup_logger, get_logger, setup_dual_logger, setup_colored_logger
+from .app_logger import (
+    setup_logger, get_logger, setup_dual_logger, setup_colored_logger, remove_database_handler
+)
 
-__all__ = ['setup_logger', 'get_logger', 'setup_dual_logger', 'setup_colored_logger']
\ No newline at end of file
+__all__ = [
+    'setup_logger', 'get_logger', 'setup_dual_logger', 'setup_colored_logger',
+    'remove_database_handler'
+]
@@ -4,14 +4,49 @@ Unicode support and structured logging
 Author: MiniMax Agent
 """
 
+import atexit
 import logging
 import logging.handlers
+import queue
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from datetime import datetime
-from typing import Optional
+from typing import Optional, Deque, Tuple
 import sys
 
 
+# Mức log theo tên (tra một lần thay vì getattr(logging, ...) mỗi lần setup)
+_LEVEL_CACHE = {
+    name: getattr(logging, name)
+    for name in ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+}
+
+# Formatter dùng chung (Formatter không giữ state nên chia sẻ được giữa các handlers)
+_DEFAULT_FORMATTER = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+_DB_FORMATTER = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+# File log (rotate thành enterprise_collector.log.1, .2, ... khi vượt LOG_MAX_BYTES)
+LOG_FILENAME = "enterprise_collector.log"
+LOG_MAX_BYTES = 50_000_000
+
+
+def _resolve_level(level: str) -> int:
+    """
+    Chuyển tên level (không phân biệt hoa thường) sang giá trị logging
+    
+    Tên ngoài cache (WARN, FATAL, NOTSET, ...) tra bằng getattr(logging, ...) như trước.
+    """
+    name = level.upper()
+    try:
+        return _LEVEL_CACHE[name]
+    except KeyError:
+        return getattr(logging, name)
+
+
 def setup_logger(
     name: str = "EnterpriseDataCollector",
     level: str = "INFO",
@@ -29,31 +64,28 @@ def setup_logger(
         log_dir: Thư mục chứa log files
         console_output: Có xuất ra console không
         file_output: Có ghi vào file không
-        max_files: Số file log tối đa giữ lại
+        max_files: Số file log cũ (đã rotate) tối đa giữ lại
         
     Returns:
         Logger instance
     """
     
     # Tạo logger
+    log_level = _resolve_level(level)
     logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, level.upper()))
+    logger.setLevel(log_level)
     
     # Xóa các handler cũ (nếu có)
-    for handler in logger.handlers[:]:
-        logger.removeHandler(handler)
+    _remove_handlers(logger)
     
     # Formatter với Unicode support
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    formatter = _DEFAULT_FORMATTER
     
     # Console handler
     if console_output:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(formatter)
-        console_handler.setLevel(getattr(logging, level.upper()))
+        console_handler.setLevel(log_level)
         logger.addHandler(console_handler)
     
     # File handler
@@ -62,24 +94,14 @@ def setup_logger(
         log_path = Path(log_dir)
         log_path.mkdir(parents=True, exist_ok=True)
         
-        # Tên file log với timestamp
-        log_filename = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_enterprise_collector.log"
-        log_file_path = log_path / log_filename
-        
-        # File handler với UTF-8 encoding
-        file_handler = logging.FileHandler(
-            log_file_path, 
-            mode='w', 
-            encoding='utf-8'
-        )
+        # File handler với UTF-8 encoding, tự rotate và giữ tối đa max_files file cũ
+        log_file_path = log_path / LOG_FILENAME
+        file_handler = _create_file_handler(log_file_path, max_files)
         file_handler.setFormatter(formatter)
-        file_handler.setLevel(getattr(logging, level.upper()))
-        logger.addHandler(file_handler)
-        
-        # Cleanup old log files
-        _cleanup_old_logs(log_path, max_files)
+        file_handler.setLevel(log_level)
+        logger.addHandler(_queue_handler_for(file_handler))
         
-        logger.info(f"Log file created: {log_file_path}")
+        logger.info(f"Logging to file: {log_file_path}")
     
     logger.info(f"Logger '{name}' initialized with level {level}")
     return logger
@@ -98,52 +120,215 @@ def get_logger(name: str = "EnterpriseDataCollector") -> logging.Logger:
     return logging.getLogger(name)
 
 
-def _cleanup_old_logs(log_dir: Path, max_files: int):
+class BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler ghi qua buffer lớn thay vì flush sau mỗi record
+    
+    Stream được flush tối đa một lần mỗi flush_interval giây; records còn trong buffer
+    được flush bằng threading.Timer sau khoảng đó, hoặc khi handler đóng.
+    """
+    
+    def __init__(self, *args, buffer_size: int = 65536, flush_interval: float = 1.0, **kwargs):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+        super().__init__(*args, **kwargs)
+    
+    def _open(self):
+        return open(
+            self.baseFilename, self.mode,
+            buffering=self.buffer_size, encoding=self.encoding, errors=self.errors
+        )
+    
+    def flush(self):
+        """
+        Flush stream nếu đã quá flush_interval, nếu không thì hẹn flush sau
+        """
+        self.acquire()
+        try:
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_stream()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_stream)
+                self._timer.daemon = True
+                self._timer.start()
+        finally:
+            self.release()
+    
+    def _flush_stream(self):
+        self.acquire()
+        try:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            super().flush()
+            self._last_flush = time.monotonic()
+        finally:
+            self.release()
+    
+    def close(self):
+        self.acquire()
+        try:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            super().close()
+        finally:
+            self.release()
+
+
+def _create_file_handler(log_file_path: Path, max_files: int = 5) -> logging.Handler:
     """
-    Dọn dẹp các file log cũ
+    Tạo file handler ghi nối tiếp vào một file log, rotate khi vượt LOG_MAX_BYTES
     
     Args:
-        log_dir: Thư mục chứa log files
-        max_files: Số file tối đa giữ lại
+        log_file_path: Đường dẫn file log
+        max_files: Số file log cũ tối đa giữ lại
+    """
+    return BufferedRotatingFileHandler(
+        log_file_path,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=max_files,
+        encoding='utf-8'
+    )
+
+
+def _queue_handler_for(handler: logging.Handler) -> logging.handlers.QueueHandler:
+    """
+    Chuyển handler sang thread riêng: logger chỉ put record vào queue,
+    QueueListener gọi handler (I/O không chặn thread đang log)
+    """
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.listener = listener
+    return queue_handler
+
+
+def _stop_listener(listener: logging.handlers.QueueListener):
+    """
+    Dừng listener rồi đóng các handlers của nó (ghi nốt records còn trong buffer)
     """
     try:
-        # Lấy tất cả các file log
-        log_files = list(log_dir.glob("*_enterprise_collector.log"))
-        
-        # Sắp xếp theo thời gian tạo (mới nhất trước)
-        log_files.sort(key=lambda f: f.stat().st_mtime, reverse=True)
-        
-        # Xóa các file cũ vượt quá giới hạn
-        for old_file in log_files[max_files:]:
-            try:
-                old_file.unlink()
-                print(f"Deleted old log file: {old_file.name}")
-            except Exception as e:
-                print(f"Failed to delete old log file {old_file.name}: {e}")
-                
-    except Exception as e:
-        print(f"Failed to cleanup old logs: {e}")
+        listener.stop()
+    except AttributeError:
+        pass  # Listener đã dừng trước đó
+    finally:
+        for handler in listener.handlers:
+            handler.close()
+
+
+def remove_database_handler(logger: logging.Logger):
+    """
+    Gỡ database handler khỏi logger: ghi nốt records đang buffer rồi dừng ghi vào database
+    
+    Gọi trước DatabaseManager.close() để các log sau đó không dùng database đã đóng.
+    """
+    for handler in logger.handlers[:]:
+        listener = getattr(handler, 'listener', None)
+        if listener is not None and any(
+            isinstance(target, DatabaseLogHandler) for target in listener.handlers
+        ):
+            logger.removeHandler(handler)
+            _stop_listener(listener)
+
+
+def _remove_handlers(logger: logging.Logger):
+    """
+    Gỡ các handler cũ khỏi logger, dừng listener của các queue handlers
+    """
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+        listener = getattr(handler, 'listener', None)
+        if listener is not None:
+            _stop_listener(listener)
 
 
 class DatabaseLogHandler(logging.Handler):
     """
-    Custom log handler để ghi log vào database
+    Custom log handler để ghi log vào database theo batch
+    
+    Records được gom lại và ghi bằng một transaction khi đủ batch_size records,
+    hoặc sau flush_interval giây kể từ record đầu tiên của batch (qua threading.Timer,
+    nên batch cuối vẫn được ghi khi không còn log mới). Khi database không ghi được,
+    batch được trả về buffer và ghi lại sau flush_interval giây; buffer giới hạn
+    max_buffer records, records cũ nhất bị bỏ.
     """
     
-    def __init__(self, db_manager):
+    def __init__(
+        self,
+        db_manager,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_buffer: int = 1000
+    ):
         super().__init__()
         self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: Deque[Tuple[str, str]] = deque(maxlen=max_buffer)
+        self._timer: Optional[threading.Timer] = None
+        # Lần ghi trước lỗi: chỉ ghi lại theo timer, không ghi mỗi record mới
+        self._write_failed = False
+        self._closing = False
     
     def emit(self, record):
         """
-        Emit log record to database
+        Emit log record to database (buffered)
         """
         try:
             log_entry = self.format(record)
-            self.db_manager.log_message(record.levelname, log_entry)
+            self._buffer.append((record.levelname, log_entry))
+            
+            if len(self._buffer) >= self.batch_size and not self._write_failed:
+                self.flush()
+            elif self._timer is None:
+                self._schedule_flush()
         except Exception:
             # Không được raise exception từ log handler
             pass
+    
+    def _schedule_flush(self):
+        """Flush sau flush_interval giây (threading.Timer)"""
+        self._timer = threading.Timer(self.flush_interval, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def flush(self):
+        """
+        Ghi các records đang buffer vào database
+        """
+        self.acquire()
+        try:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            
+            if self._buffer:
+                entries = list(self._buffer)
+                self._buffer.clear()
+                self._write_failed = not self.db_manager.log_messages_bulk(entries)
+                if self._write_failed:
+                    # Trả batch về buffer (deque bỏ records cũ nhất khi vượt max_buffer)
+                    self._buffer.extend(entries)
+                    if not self._closing:
+                        self._schedule_flush()
+        except Exception:
+            pass
+        finally:
+            self.release()
+    
+    def close(self):
+        """
+        Flush phần còn lại trước khi đóng handler (không ghi lại nếu lỗi)
+        """
+        self._closing = True
+        self.flush()
+        super().close()
 
 
 def setup_dual_logger(
@@ -170,9 +355,10 @@ def setup_dual_logger(
     # Thêm database handler nếu có
     if db_manager:
         db_handler = DatabaseLogHandler(db_manager)
-        db_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        db_handler.setFormatter(db_formatter)
-        logger.addHandler(db_handler)
+        db_handler.setFormatter(_DB_FORMATTER)
+        
+        # Ghi database trên thread riêng
+        logger.addHandler(_queue_handler_for(db_handler))
         
         logger.info("Database logging enabled")
     
@@ -195,16 +381,37 @@ class ColoredConsoleHandler(logging.StreamHandler):
     
     RESET = '\033[0m'  # Reset color
     
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self._use_color = self._stream_supports_color(self.stream)
+        # Cặp (prefix, suffix) dựng sẵn cho từng level
+        self._wrapped = {name: (code, self.RESET) for name, code in self.COLORS.items()}
+    
+    @staticmethod
+    def _stream_supports_color(stream) -> bool:
+        """
+        Kiểm tra stream có phải terminal không (chỉ gọi isatty khi tạo/đổi stream)
+        """
+        try:
+            return hasattr(stream, 'isatty') and stream.isatty()
+        except Exception:
+            return False
+    
+    def setStream(self, stream):
+        old_stream = super().setStream(stream)
+        self._use_color = self._stream_supports_color(self.stream)
+        return old_stream
+    
     def emit(self, record):
         try:
             message = self.format(record)
             
             # Thêm màu sắc nếu hỗ trợ
-            if hasattr(self.stream, 'isatty') and self.stream.isatty():
-                color = self.COLORS.get(record.levelname, '')
-                message = f"{color}{message}{self.RESET}"
-            
-            self.stream.write(message + '\n')
+            if self._use_color:
+                prefix, suffix = self._wrapped.get(record.levelname, ('', ''))
+                self.stream.write(''.join((prefix, message, suffix, '\n')))
+            else:
+                self.stream.write(message + '\n')
             self.flush()
             
         except Exception:
@@ -229,17 +436,13 @@ def setup_colored_logger(
     """
     
     logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, level.upper()))
+    logger.setLevel(_resolve_level(level))
     
     # Xóa các handler cũ
-    for handler in logger.handlers[:]:
-        logger.removeHandler(handler)
+    _remove_handlers(logger)
     
     # Formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    formatter = _DEFAULT_FORMATTER
     
     # Colored console handler
     console_handler = ColoredConsoleHandler(sys.stdout)
@@ -250,12 +453,10 @@ def setup_colored_logger(
     log_path = Path(log_dir)
     log_path.mkdir(parents=True, exist_ok=True)
     
-    log_filename = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_enterprise_collector.log"
-    log_file_path = log_path / log_filename
-    
-    file_handler = logging.FileHandler(log_file_path, mode='w', encoding='utf-8')
+    log_file_path = log_path / LOG_FILENAME
+    file_handler = _create_file_handler(log_file_path)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    logger.addHandler(_queue_handler_for(file_handler))
     
     logger.info(f"Colored logger initialized: {log_file_path}")
     return logger
\ No newline at end of file
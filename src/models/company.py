@@ -4,13 +4,30 @@ Basic company data structures
 Author: MiniMax Agent
 """
 
-from dataclasses import dataclass, field
-from typing import Optional, Dict, Any, List
+from dataclasses import dataclass, field, fields
+from typing import Optional, Dict, Any, List, Sequence
 from datetime import datetime
 import json
 
+try:
+    import orjson
+except ImportError:  # orjson là tuỳ chọn, fallback sang json chuẩn
+    orjson = None
 
-@dataclass
+
+def _json_dumps(obj: Any) -> str:
+    """
+    Serialize sang JSON (UTF-8, không escape ký tự tiếng Việt), dùng orjson nếu có
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except TypeError:  # orjson.JSONEncodeError: kiểu dữ liệu orjson không hỗ trợ
+            pass
+    return json.dumps(obj, ensure_ascii=False)
+
+
+@dataclass(slots=True)
 class CompanySearchResult:
     """Company summary từ search results"""
     ma_so_thue: str
@@ -31,9 +48,13 @@ class CompanySearchResult:
             'ngay_cap': self.ngay_cap,
             'nganh_nghe': self.nganh_nghe
         }
+    
+    def to_row(self, headers: Sequence[str]) -> List[Any]:
+        """Giá trị theo thứ tự headers (cho exporter, không dựng dict)"""
+        return [getattr(self, name, '') for name in headers]
 
 
-@dataclass
+@dataclass(slots=True)
 class CompanyDetail:
     """Thông tin chi tiết công ty từ API"""
     ma_so_thue: str
@@ -61,7 +82,9 @@ class CompanyDetail:
     phuong_xa: str = ""
     co_quan_cap_phep: str = ""
     so_quyet_dinh: str = ""
-    raw_json: str = ""
+    # API response gốc; raw_json chỉ được serialize khi cần (lưu database)
+    _raw_data: Optional[Dict[str, Any]] = field(default=None, repr=False, compare=False)
+    _raw_json: Optional[str] = field(default=None, repr=False, compare=False)
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
@@ -69,75 +92,101 @@ class CompanyDetail:
     def from_api_response(cls, data: Dict[str, Any]) -> 'CompanyDetail':
         """Tạo CompanyDetail từ API response"""
         
+        # Giá trị theo thứ tự field, khởi tạo bằng tham số vị trí (không bind keyword arguments)
+        values = [data.get(key, default) if key else default for key, default in _API_RESPONSE_MAP]
+        
         # Parse danh sách ngành nghề khác nếu có
-        nganh_nghe_khac = []
-        if 'DSNganhNgheKinhDoanh' in data:
-            if isinstance(data['DSNganhNgheKinhDoanh'], list):
-                nganh_nghe_khac = data['DSNganhNgheKinhDoanh']
+        nganh_nghe_khac = data.get('DSNganhNgheKinhDoanh')
+        values[_NGANH_NGHE_KHAC_INDEX] = nganh_nghe_khac if isinstance(nganh_nghe_khac, list) else []
+        values[_TINH_TRANG_INDEX] = 'Hoạt động' if not data.get('IsDelete', False) else 'Ngừng hoạt động'
         
-        return cls(
-            ma_so_thue=data.get('MaSoThue', ''),
-            ten_cong_ty=data.get('Title', ''),
-            ten_giao_dich=data.get('Title', ''),  # Same as title in this API
-            ten_tieng_anh=data.get('TitleEn', ''),
-            nguoi_dai_dien=data.get('ChuSoHuu', ''),  # Owner/representative
-            chuc_vu_dai_dien='',  # Not provided in API
-            dia_chi=data.get('DiaChiCongTy', ''),
-            dien_thoai='',  # Not provided in basic API response
-            fax='',
-            email='',
-            website='',
-            tinh_trang_hoat_dong='Hoạt động' if not data.get('IsDelete', False) else 'Ngừng hoạt động',
-            ngay_cap_phep=data.get('NgayCap'),
-            ngay_hoat_dong=data.get('NgayBatDauHopDong'),
-            ngay_thay_doi_gan_nhat=data.get('Updated'),
-            nganh_nghe_kinh_doanh_chinh=data.get('NganhNgheTitle', ''),
-            nganh_nghe_khac=nganh_nghe_khac,
-            loai_hinh_doanh_nghiep=data.get('LoaiHinhTitle', ''),
-            von_dieu_le=data.get('VonDieuLe', ''),
-            von_dang_ky='',
-            tinh_thanh_pho=data.get('TinhThanhTitle', ''),
-            quan_huyen=data.get('QuanHuyenTitle', ''),
-            phuong_xa=data.get('PhuongXaTitle', ''),
-            co_quan_cap_phep=data.get('GiayPhepKinhDoanh_CoQuanCapTitle', ''),
-            so_quyet_dinh=data.get('GiayPhepKinhDoanh', ''),
-            raw_json=json.dumps(data, ensure_ascii=False),
-            created_at=datetime.now(),
-            updated_at=datetime.now()
-        )
+        now = datetime.now()
+        return cls(*values, data, None, now, now)
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary"""
-        return {
-            'ma_so_thue': self.ma_so_thue,
-            'ten_cong_ty': self.ten_cong_ty,
-            'ten_giao_dich': self.ten_giao_dich,
-            'ten_tieng_anh': self.ten_tieng_anh,
-            'nguoi_dai_dien': self.nguoi_dai_dien,
-            'chuc_vu_dai_dien': self.chuc_vu_dai_dien,
-            'dia_chi': self.dia_chi,
-            'dien_thoai': self.dien_thoai,
-            'fax': self.fax,
-            'email': self.email,
-            'website': self.website,
-            'tinh_trang_hoat_dong': self.tinh_trang_hoat_dong,
-            'ngay_cap_phep': self.ngay_cap_phep,
-            'ngay_hoat_dong': self.ngay_hoat_dong,
-            'ngay_thay_doi_gan_nhat': self.ngay_thay_doi_gan_nhat,
-            'nganh_nghe_kinh_doanh_chinh': self.nganh_nghe_kinh_doanh_chinh,
-            'nganh_nghe_khac': json.dumps(self.nganh_nghe_khac, ensure_ascii=False) if self.nganh_nghe_khac else '',
-            'loai_hinh_doanh_nghiep': self.loai_hinh_doanh_nghiep,
-            'von_dieu_le': self.von_dieu_le,
-            'von_dang_ky': self.von_dang_ky,
-            'tinh_thanh_pho': self.tinh_thanh_pho,
-            'quan_huyen': self.quan_huyen,
-            'phuong_xa': self.phuong_xa,
-            'co_quan_cap_phep': self.co_quan_cap_phep,
-            'so_quyet_dinh': self.so_quyet_dinh,
-            'raw_json': self.raw_json,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    @property
+    def raw_json(self) -> str:
+        """JSON của API response gốc (serialize ở lần đọc đầu tiên)"""
+        if self._raw_json is None:
+            self._raw_json = _json_dumps(self._raw_data) if self._raw_data is not None else ""
+        return self._raw_json
+    
+    @raw_json.setter
+    def raw_json(self, value: str):
+        self._raw_json = value
+    
+    def to_dict(self, include_raw_json: bool = True) -> Dict[str, Any]:
+        """
+        Convert to dictionary
+        
+        Args:
+            include_raw_json: Có kèm raw_json không (False: bỏ qua bước serialize response gốc)
+        """
+        data = {name: getattr(self, name) for name in _DETAIL_EXPORT_FIELDS}
+        
+        # Các field cần định dạng lại khi xuất
+        data['nganh_nghe_khac'] = _json_dumps(self.nganh_nghe_khac) if self.nganh_nghe_khac else ''
+        data['created_at'] = self.created_at.isoformat() if self.created_at else None
+        data['updated_at'] = self.updated_at.isoformat() if self.updated_at else None
+        if include_raw_json:
+            data['raw_json'] = self.raw_json
+        return data
+    
+    def to_row(self, headers: Sequence[str]) -> List[Any]:
+        """
+        Giá trị theo thứ tự headers (cho exporter, không dựng dict),
+        định dạng giống to_dict
+        """
+        return [
+            self._export_value(name) if name in _DETAIL_FORMATTED_FIELDS else getattr(self, name, '')
+            for name in headers
+        ]
+    
+    def _export_value(self, name: str) -> Any:
+        """Giá trị đã định dạng của nganh_nghe_khac / created_at / updated_at"""
+        value = getattr(self, name)
+        if name == 'nganh_nghe_khac':
+            return _json_dumps(value) if value else ''
+        return value.isoformat() if value else None
     
     def __str__(self) -> str:
-        return f"CompanyDetail({self.ma_so_thue}: {self.ten_cong_ty})"
\ No newline at end of file
+        return f"CompanyDetail({self.ma_so_thue}: {self.ten_cong_ty})"
+
+
+# Các field public của CompanyDetail theo thứ tự khai báo (tính một lần khi import)
+_DETAIL_EXPORT_FIELDS = tuple(f.name for f in fields(CompanyDetail) if not f.name.startswith('_'))
+
+# from_api_response: (key trong API response, giá trị mặc định) theo thứ tự field của CompanyDetail,
+# từ ma_so_thue đến so_quyet_dinh; key None: API không cung cấp, luôn dùng giá trị mặc định
+_API_RESPONSE_MAP = (
+    ('MaSoThue', ''),                          # ma_so_thue
+    ('Title', ''),                             # ten_cong_ty
+    ('Title', ''),                             # ten_giao_dich (same as title in this API)
+    ('TitleEn', ''),                           # ten_tieng_anh
+    ('ChuSoHuu', ''),                          # nguoi_dai_dien (owner/representative)
+    (None, ''),                                # chuc_vu_dai_dien
+    ('DiaChiCongTy', ''),                      # dia_chi
+    (None, ''),                                # dien_thoai
+    (None, ''),                                # fax
+    (None, ''),                                # email
+    (None, ''),                                # website
+    (None, ''),                                # tinh_trang_hoat_dong (tính từ IsDelete)
+    ('NgayCap', None),                         # ngay_cap_phep
+    ('NgayBatDauHopDong', None),               # ngay_hoat_dong
+    ('Updated', None),                         # ngay_thay_doi_gan_nhat
+    ('NganhNgheTitle', ''),                    # nganh_nghe_kinh_doanh_chinh
+    (None, None),                              # nganh_nghe_khac (parse từ DSNganhNgheKinhDoanh)
+    ('LoaiHinhTitle', ''),                     # loai_hinh_doanh_nghiep
+    ('VonDieuLe', ''),                         # von_dieu_le
+    (None, ''),                                # von_dang_ky
+    ('TinhThanhTitle', ''),                    # tinh_thanh_pho
+    ('QuanHuyenTitle', ''),                    # quan_huyen
+    ('PhuongXaTitle', ''),                     # phuong_xa
+    ('GiayPhepKinhDoanh_CoQuanCapTitle', ''),  # co_quan_cap_phep
+    ('GiayPhepKinhDoanh', ''),                 # so_quyet_dinh
+)
+
+_TINH_TRANG_INDEX = _DETAIL_EXPORT_FIELDS.index('tinh_trang_hoat_dong')
+_NGANH_NGHE_KHAC_INDEX = _DETAIL_EXPORT_FIELDS.index('nganh_nghe_khac')
+
+# Các field được định dạng lại khi xuất (xem to_dict)
+_DETAIL_FORMATTED_FIELDS = frozenset(('nganh_nghe_khac', 'created_at', 'updated_at'))
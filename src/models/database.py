@@ -4,33 +4,345 @@ SQLite database operations
 Author: MiniMax Agent
 """
 
+import os
+import re
 import sqlite3
 import logging
+import queue
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple, Union
+from datetime import datetime, timedelta, timezone
 import json
 
 
+# Các cột của bảng Companies (cùng thứ tự với EnhancedCompany.to_dict, trừ raw JSON)
+COMPANY_COLUMNS = (
+    'ma_so_thue', 'ten_cong_ty', 'ten_giao_dich', 'ten_tieng_anh',
+    'nguoi_dai_dien', 'chuc_vu_dai_dien', 'dai_dien_phap_luat',
+    'dien_thoai', 'dien_thoai_dai_dien', 'fax', 'email', 'website',
+    'dia_chi_dang_ky', 'dia_chi_thue', 'tinh_thanh_pho', 'quan_huyen', 'phuong_xa',
+    'nganh_nghe_kinh_doanh_chinh', 'nganh_nghe_khac', 'loai_hinh_doanh_nghiep',
+    'tinh_trang_hoat_dong', 'so_giay_phep_kinh_doanh', 'ngay_cap_giay_phep',
+    'ngay_hoat_dong', 'ngay_thay_doi_gan_nhat', 'co_quan_cap_phep', 'so_quyet_dinh',
+    'von_dieu_le', 'von_dang_ky', 'cap_nhat_lan_cuoi', 'trang_thai_hsctvn',
+    'data_source', 'created_at', 'updated_at',
+)
+
+# Response gốc (vài KB mỗi company) nằm ở bảng phụ CompanyRaw, để các trang của
+# Companies chỉ chứa các cột nhỏ (SELECT * / quét bảng đọc ít trang hơn)
+RAW_JSON_COLUMNS = ('raw_json_api', 'raw_json_hsctvn')
+
+# created_at / updated_at lưu dạng INTEGER (epoch giây, UTC)
+TIMESTAMP_COLUMNS = ('created_at', 'updated_at')
+_EPOCH_NOW_SQL = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+# Mã số thuế: 10 chữ số, hoặc 13 (mã chi nhánh dạng 0123456789-001)
+_TAX_RE = re.compile(r'\A\d{10}(?:-\d{3})?\Z', re.ASCII)
+
+# PRAGMA user_version của schema hiện tại (1: timestamps dạng epoch, 2: raw JSON ở CompanyRaw)
+SCHEMA_VERSION = 2
+
+
+def to_epoch(value: Any) -> Optional[int]:
+    """
+    Chuyển giá trị thời gian (datetime, chuỗi ISO, số) sang epoch giây
+    
+    datetime/chuỗi không có timezone được hiểu theo giờ local (như datetime.now()).
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def _migrated_epoch(value: str) -> Optional[int]:
+    """to_epoch cho timestamp text của database cũ; None nếu không parse được (như strftime)"""
+    try:
+        return to_epoch(value)
+    except ValueError:
+        return None
+
+
+def _split_raw_json(company_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Tách các cột raw JSON (bảng CompanyRaw) khỏi company_data: (cột Companies, cột raw)"""
+    if not any(column in company_data for column in RAW_JSON_COLUMNS):
+        return company_data, {}
+    data = dict(company_data)
+    raw = {column: data.pop(column) for column in RAW_JSON_COLUMNS if column in data}
+    return data, raw
+
+
+def _with_epoch_timestamps(company_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Bản sao company_data với created_at/updated_at đã chuyển sang epoch (nếu có)"""
+    if 'created_at' not in company_data and 'updated_at' not in company_data:
+        return company_data
+    data = dict(company_data)
+    for column in TIMESTAMP_COLUMNS:
+        if column in data:
+            data[column] = to_epoch(data[column])
+    return data
+
+
+# Các cột được index full-text trong Companies_fts
+FTS_COLUMNS = ('ten_cong_ty', 'nganh_nghe_kinh_doanh_chinh', 'dia_chi_dang_ky')
+
+
+def _fts_phrase(column: str, text: str) -> str:
+    """Truy vấn FTS5 tìm text như một cụm (chuỗi con với tokenizer trigram) trong column"""
+    escaped = text.replace('"', '""')
+    return f'{column} : "{escaped}"'
+
+
+@lru_cache(maxsize=32)
+def _company_upsert_sql(columns: Tuple[str, ...]) -> str:
+    """
+    Insert-or-update một company bằng một câu lệnh (SQLite UPSERT)
+    
+    Chỉ các cột trong columns được ghi; bản ghi đã có giữ nguyên created_at,
+    updated_at lấy thời điểm ghi. Timestamps không có trong columns vẫn được ghi
+    (epoch hiện tại), không dùng DEFAULT của cột (database đã migrate còn DEFAULT
+    CURRENT_TIMESTAMP dạng text). SQL được cache theo bộ cột.
+    """
+    values = [
+        f'COALESCE(?, {_EPOCH_NOW_SQL})' if column in TIMESTAMP_COLUMNS else '?'
+        for column in columns
+    ]
+    missing = tuple(column for column in TIMESTAMP_COLUMNS if column not in columns)
+    values.extend(_EPOCH_NOW_SQL for _ in missing)
+    values = ', '.join(values)
+    columns += missing
+    updates = [
+        f'{column} = excluded.{column}'
+        for column in columns
+        if column not in ('ma_so_thue', 'created_at', 'updated_at')
+    ]
+    updates.append(f'updated_at = {_EPOCH_NOW_SQL}')
+    return (
+        f"INSERT INTO Companies ({', '.join(columns)}) VALUES ({values}) "
+        f"ON CONFLICT(ma_so_thue) DO UPDATE SET {', '.join(updates)}"
+    )
+
+
+_COMPANY_UPSERT_SQL = _company_upsert_sql(COMPANY_COLUMNS)
+
+# Các cột dữ liệu (COMPANY_COLUMNS trừ timestamps ở cuối)
+_COMPANY_DATA_COLUMNS = COMPANY_COLUMNS[:-len(TIMESTAMP_COLUMNS)]
+
+
+@lru_cache(maxsize=4)
+def _company_raw_upsert_sql(columns: Tuple[str, ...]) -> str:
+    """
+    Insert-or-update raw JSON của một company vào CompanyRaw (SQL được cache theo bộ cột)
+    
+    Giá trị rỗng/NULL không ghi đè raw JSON đã lưu (company đọc từ Companies không mang raw JSON).
+    """
+    updates = ', '.join(
+        f"{column} = COALESCE(NULLIF(excluded.{column}, ''), {column})" for column in columns
+    )
+    return (
+        f"INSERT INTO CompanyRaw (ma_so_thue, {', '.join(columns)}) VALUES (?{', ?' * len(columns)}) "
+        f"ON CONFLICT(ma_so_thue) DO UPDATE SET {updates}"
+    )
+
+
+_COMPANY_RAW_UPSERT_SQL = _company_raw_upsert_sql(RAW_JSON_COLUMNS)
+
+
+@lru_cache(maxsize=32)
+def _company_insert_sql(columns: Tuple[str, ...]) -> str:
+    """
+    INSERT một company theo bộ cột (SQL được cache theo bộ cột)
+    
+    Timestamps không có trong columns được ghi là epoch hiện tại (như _company_upsert_sql).
+    """
+    missing = tuple(column for column in TIMESTAMP_COLUMNS if column not in columns)
+    values = ['?'] * len(columns) + [_EPOCH_NOW_SQL] * len(missing)
+    return f"INSERT INTO Companies ({', '.join(columns + missing)}) VALUES ({', '.join(values)})"
+
+
+@lru_cache(maxsize=32)
+def _company_update_sql(columns: Tuple[str, ...]) -> str:
+    """UPDATE một company theo bộ cột, tham số cuối là mã số thuế (SQL được cache theo bộ cột)"""
+    assignments = [f'{column} = ?' for column in columns]
+    assignments.append(f'updated_at = {_EPOCH_NOW_SQL}')
+    return f"UPDATE Companies SET {', '.join(assignments)} WHERE ma_so_thue = ?"
+
+
+@lru_cache(maxsize=None)
+def _companies_query_sql(conditions: Tuple[str, ...], limited: bool) -> str:
+    """SELECT companies theo các điều kiện lọc (SQL được cache theo tổ hợp điều kiện)"""
+    where_clause = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+    limit_clause = ' LIMIT ?' if limited else ''
+    return f"SELECT * FROM Companies {where_clause}ORDER BY updated_at DESC{limit_clause}"
+
+
 class DatabaseManager:
     """Database manager for SQLite operations"""
     
-    def __init__(self, db_path: str = "Database/enterprise_data.db"):
+    # PRAGMAs áp dụng cho mỗi connection (journal_mode=WAL được lưu trong file DB)
+    CONNECTION_PRAGMAS = (
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA mmap_size=268435456',
+        'PRAGMA cache_size=-65536',
+        'PRAGMA busy_timeout=5000',
+    )
+    
+    # Số prepared statements sqlite3 giữ lại cho mỗi connection
+    STATEMENT_CACHE_SIZE = 256
+    
+    # Số mã số thuế tối đa giữ trong cache tồn tại (vượt thì xoá cache)
+    KNOWN_TAX_CODES_LIMIT = 100_000
+    
+    # Số log messages tối đa ghi trong một transaction
+    LOG_BATCH_SIZE = 500
+    
+    # Số log cũ tối đa xoá trong một transaction
+    LOG_CLEANUP_BATCH_SIZE = 10_000
+    
+    # save_companies ghi nhiều hơn số rows này thì chạy ANALYZE (cập nhật thống kê cho query planner)
+    ANALYZE_THRESHOLD = 10_000
+    
+    def __init__(self, db_path: str = "Database/enterprise_data.db", read_pool_size: Optional[int] = None):
         self.db_path = db_path
         self.logger = logging.getLogger(__name__)
         
+        # Pool connection chỉ đọc (mode=ro, query_only): với WAL, UI stats/queries
+        # không chờ writer. Mặc định 2 connection cho mỗi CPU, tối thiểu 4
+        self._read_pool_size = read_pool_size or max(4, 2 * (os.cpu_count() or 1))
+        self._read_pool: queue.Queue = queue.Queue(maxsize=self._read_pool_size)
+        self._read_conns: List[sqlite3.Connection] = []
+        self._read_pool_lock = threading.Lock()
+        
+        # Một connection ghi duy nhất, các thread dùng lần lượt qua _write_lock
+        # (SQLite chỉ cho một writer tại một thời điểm; chờ lock thay vì retry theo busy_timeout)
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        
+        # Sau close() không mở lại connection nào (ghi/đọc raise, log bị bỏ qua)
+        self._closed = False
+        
         # Create database directory if not exists
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         
+        # Mã số thuế đã biết là có trong database (chỉ cache kết quả dương tính:
+        # không có thao tác xoá company nên chúng không bị lỗi thời)
+        self._known_tax_codes: set = set()
+        
+        # log_message chỉ put vào queue; thread nền ghi theo batch
+        self._log_queue: queue.Queue = queue.Queue()
+        self._log_thread: Optional[threading.Thread] = None
+        self._log_thread_lock = threading.Lock()
+        
         # Initialize database
+        self._fts_enabled = False
         self._init_database()
     
+    def _connect(self, check_same_thread: bool = True, read_only: bool = False) -> sqlite3.Connection:
+        """
+        Open a connection with performance PRAGMAs applied
+        
+        read_only=True mở file database qua URI mode=ro và bật query_only.
+        """
+        if read_only:
+            conn = sqlite3.connect(
+                f'{Path(self.db_path).resolve().as_uri()}?mode=ro',
+                uri=True,
+                check_same_thread=check_same_thread,
+                cached_statements=self.STATEMENT_CACHE_SIZE
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=check_same_thread,
+                cached_statements=self.STATEMENT_CACHE_SIZE
+            )
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute('PRAGMA query_only=1')
+        return conn
+    
+    def _get_writer(self) -> sqlite3.Connection:
+        """Connection ghi (mở ở lần dùng đầu tiên); chỉ gọi khi đang giữ _write_lock"""
+        self._check_open()
+        if self._writer is None:
+            self._writer = self._connect(check_same_thread=False)
+        return self._writer
+    
+    def _check_open(self):
+        """
+        Raises:
+            sqlite3.ProgrammingError: Database đã close()
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"Database {self.db_path} is closed")
+    
+    @contextmanager
+    def _write_conn(self) -> Iterator[sqlite3.Connection]:
+        """
+        Connection ghi dùng chung, giữ _write_lock trong suốt khối "with"
+        
+        Commit khi thành công, rollback khi lỗi; connection không bị đóng.
+        """
+        with self._write_lock:
+            conn = self._get_writer()
+            with conn:
+                yield conn
+    
+    def _is_file_database(self) -> bool:
+        """Database nằm trên file (không phải ':memory:' / URI mode=memory)"""
+        return ':memory:' not in self.db_path and 'mode=memory' not in self.db_path
+    
+    @contextmanager
+    def get_read_conn(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a read connection from the pool
+        
+        Database in-memory chỉ tồn tại trong connection ghi: dùng connection đó
+        (giữ _write_lock cho tới khi trả lại).
+        """
+        if not self._is_file_database():
+            with self._write_lock:
+                yield self._get_writer()
+            return
+        
+        self._check_open()
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._read_pool_lock:
+                if len(self._read_conns) < self._read_pool_size:
+                    conn = self._connect(check_same_thread=False, read_only=True)
+                    self._read_conns.append(conn)
+            if conn is None:
+                conn = self._read_pool.get()
+        
+        try:
+            yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._read_pool.put(conn)
+    
     def _init_database(self):
         """Initialize database with required tables"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._write_conn() as conn:
                 cursor = conn.cursor()
                 
+                # WAL mode: readers không bị block bởi writer (không áp dụng cho DB in-memory)
+                if self._is_file_database():
+                    cursor.execute('PRAGMA journal_mode=WAL')
+                
                 # Enhanced Companies table for v2.0
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS Companies (
@@ -66,12 +378,20 @@ class DatabaseManager:
                         cap_nhat_lan_cuoi TEXT,
                         trang_thai_hsctvn TEXT,
                         data_source TEXT DEFAULT 'api',
+                        created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                        updated_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+                    )
+                ''')
+                
+                # Raw JSON (API/HSCTVN) của từng company, chỉ đọc khi cần (get_raw)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS CompanyRaw (
+                        ma_so_thue TEXT PRIMARY KEY REFERENCES Companies(ma_so_thue),
                         raw_json_api TEXT,
-                        raw_json_hsctvn TEXT,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                        raw_json_hsctvn TEXT
                     )
                 ''')
+                vacuum = self._migrate_schema(cursor)
                 
                 # Logs table
                 cursor.execute('''
@@ -84,26 +404,164 @@ class DatabaseManager:
                 ''')
                 
                 # Create indexes
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_companies_tinh_trang ON Companies(tinh_trang_hoat_dong)')
+                # get_companies: lọc theo trạng thái (+ tỉnh/thành), sắp xếp theo updated_at
+                # đọc thẳng theo thứ tự index, không cần sort tạm
+                cursor.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_companies_status_prov_updated '
+                    'ON Companies(tinh_trang_hoat_dong, tinh_thanh_pho, updated_at DESC)'
+                )
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_companies_updated ON Companies(updated_at DESC)')
+                # get_stats: thống kê theo ngày tạo (7 ngày gần nhất) đọc theo khoảng trên index
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_companies_created ON Companies(created_at)')
+                # Index đơn cột trạng thái đã nằm trong index ghép ở trên
+                cursor.execute('DROP INDEX IF EXISTS idx_companies_tinh_trang')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_companies_nganh_nghe ON Companies(nganh_nghe_kinh_doanh_chinh)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_companies_tinh_thanh ON Companies(tinh_thanh_pho)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_companies_data_source ON Companies(data_source)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON Logs(timestamp)')
                 
+                # Full-text index cho tìm kiếm chuỗi con (ngành nghề, tên, địa chỉ)
+                self._fts_enabled = self._init_fulltext(cursor)
+                
                 conn.commit()
+                
+                # Thu hồi dung lượng của các cột đã xoá (VACUUM không chạy được trong transaction)
+                if vacuum:
+                    self.logger.info("Vacuuming database after schema migration")
+                    conn.execute('VACUUM')
+                
                 self.logger.info("Database initialized successfully")
                 
         except Exception as e:
             self.logger.error(f"Failed to initialize database: {e}")
             raise
     
+    def _migrate_schema(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Nâng cấp dữ liệu của database cũ lên SCHEMA_VERSION
+        
+        Version 1: created_at/updated_at dạng text được đổi sang epoch giây: chuỗi ISO
+        "YYYY-MM-DDTHH:MM:SS" (EnhancedCompany.to_dict, giờ local) qua to_epoch, chuỗi
+        "YYYY-MM-DD HH:MM:SS" (DEFAULT CURRENT_TIMESTAMP) theo UTC. Cột vẫn giữ kiểu
+        khai báo cũ (DATETIME, affinity NUMERIC).
+        Version 2: raw_json_api/raw_json_hsctvn chuyển sang bảng CompanyRaw.
+        
+        Returns:
+            True nếu đã chuyển raw JSON (nên VACUUM để thu hồi dung lượng)
+        """
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return False
+        
+        if version < 1:
+            for column in TIMESTAMP_COLUMNS:
+                cursor.execute(
+                    f"SELECT rowid, {column} FROM Companies "
+                    f"WHERE typeof({column}) = 'text' AND instr({column}, 'T')"
+                )
+                local_values = [(_migrated_epoch(value), rowid) for rowid, value in cursor.fetchall()]
+                cursor.executemany(f"UPDATE Companies SET {column} = ? WHERE rowid = ?", local_values)
+                cursor.execute(
+                    f"UPDATE Companies SET {column} = CAST(strftime('%s', {column}) AS INTEGER) "
+                    f"WHERE typeof({column}) = 'text'"
+                )
+                migrated = len(local_values) + cursor.rowcount
+                if migrated:
+                    self.logger.info(f"Migrated {migrated} {column} values to epoch seconds")
+        
+        moved = version < 2 and self._move_raw_json(cursor)
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        return moved
+    
+    def _move_raw_json(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Chuyển các cột raw JSON của Companies (schema cũ) sang CompanyRaw rồi xoá khỏi Companies
+        
+        SQLite cũ không có DROP COLUMN (< 3.35): cột được giữ lại nhưng xoá dữ liệu.
+        """
+        cursor.execute('PRAGMA table_info(Companies)')
+        if not set(RAW_JSON_COLUMNS).issubset(row[1] for row in cursor.fetchall()):
+            return False
+        
+        columns = ', '.join(RAW_JSON_COLUMNS)
+        cursor.execute(
+            f"INSERT OR REPLACE INTO CompanyRaw (ma_so_thue, {columns}) "
+            f"SELECT ma_so_thue, {columns} FROM Companies "
+            f"WHERE {' OR '.join(f'{column} IS NOT NULL' for column in RAW_JSON_COLUMNS)}"
+        )
+        self.logger.info(f"Moved raw JSON of {cursor.rowcount} companies to CompanyRaw")
+        
+        for column in RAW_JSON_COLUMNS:
+            try:
+                cursor.execute(f'ALTER TABLE Companies DROP COLUMN {column}')
+            except sqlite3.OperationalError:
+                cursor.execute(f'UPDATE Companies SET {column} = NULL')
+        return True
+    
+    def _init_fulltext(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Tạo bảng FTS5 (tokenizer trigram) đồng bộ với Companies qua triggers
+        
+        Returns:
+            False nếu SQLite không hỗ trợ FTS5/trigram (tìm kiếm dùng LIKE)
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Companies_fts'")
+        exists = cursor.fetchone() is not None
+        try:
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS Companies_fts USING fts5(
+                    ma_so_thue UNINDEXED, {', '.join(FTS_COLUMNS)},
+                    content='Companies', content_rowid='rowid', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            self.logger.warning(f"Full-text search unavailable, using LIKE: {e}")
+            return False
+        
+        columns = ', '.join(('ma_so_thue',) + FTS_COLUMNS)
+        new_values = ', '.join(f'new.{column}' for column in ('ma_so_thue',) + FTS_COLUMNS)
+        old_values = ', '.join(f'old.{column}' for column in ('ma_so_thue',) + FTS_COLUMNS)
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS companies_fts_insert AFTER INSERT ON Companies BEGIN
+                INSERT INTO Companies_fts(rowid, {columns}) VALUES (new.rowid, {new_values});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS companies_fts_delete AFTER DELETE ON Companies BEGIN
+                INSERT INTO Companies_fts(Companies_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS companies_fts_update AFTER UPDATE OF {', '.join(FTS_COLUMNS)} ON Companies BEGIN
+                INSERT INTO Companies_fts(Companies_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+                INSERT INTO Companies_fts(rowid, {columns}) VALUES (new.rowid, {new_values});
+            END
+        ''')
+        
+        # Database cũ: index dữ liệu đã có
+        if not exists:
+            cursor.execute("INSERT INTO Companies_fts(Companies_fts) VALUES ('rebuild')")
+        return True
+    
+    def _remember_tax_codes(self, tax_codes: Iterable[str]):
+        """Ghi nhận các mã số thuế đã có trong database"""
+        if len(self._known_tax_codes) > self.KNOWN_TAX_CODES_LIMIT:
+            self._known_tax_codes.clear()
+        self._known_tax_codes.update(tax_codes)
+    
     def company_exists(self, tax_code: str) -> bool:
         """Check if company exists in database"""
+        if tax_code in self._known_tax_codes:
+            return True
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.get_read_conn() as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT 1 FROM Companies WHERE ma_so_thue = ?', (tax_code,))
-                return cursor.fetchone() is not None
+                cursor.execute('SELECT EXISTS(SELECT 1 FROM Companies WHERE ma_so_thue = ?)', (tax_code,))
+                exists = bool(cursor.fetchone()[0])
+            if exists:
+                self._remember_tax_codes((tax_code,))
+            return exists
         except Exception as e:
             self.logger.error(f"Failed to check company existence: {e}")
             return False
@@ -111,21 +569,15 @@ class DatabaseManager:
     def insert_company(self, company_data: Dict[str, Any]) -> bool:
         """Insert new company record"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            company_data, raw = _split_raw_json(_with_epoch_timestamps(company_data))
+            with self._write_conn() as conn:
                 cursor = conn.cursor()
-                
-                # Prepare fields and values
-                fields = list(company_data.keys())
-                placeholders = ', '.join(['?' for _ in fields])
-                
-                sql = f'''
-                    INSERT INTO Companies ({', '.join(fields)})
-                    VALUES ({placeholders})
-                '''
-                
-                cursor.execute(sql, list(company_data.values()))
+                cursor.execute(_company_insert_sql(tuple(company_data)), tuple(company_data.values()))
+                if raw:
+                    self._write_raw_json(cursor, company_data.get('ma_so_thue'), raw)
                 conn.commit()
                 
+                self._remember_tax_codes((company_data.get('ma_so_thue'),))
                 self.logger.debug(f"Company {company_data.get('ma_so_thue')} inserted successfully")
                 return True
                 
@@ -136,7 +588,8 @@ class DatabaseManager:
     def update_company(self, tax_code: str, company_data: Dict[str, Any]) -> bool:
         """Update existing company record"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            company_data, raw = _split_raw_json(_with_epoch_timestamps(company_data))
+            with self._write_conn() as conn:
                 cursor = conn.cursor()
                 
                 # Prepare update fields
@@ -144,19 +597,15 @@ class DatabaseManager:
                 update_values = []
                 
                 for field, value in company_data.items():
-                    if field not in ['ma_so_thue', 'created_at']:  # Skip PK and created_at
-                        update_fields.append(f'{field} = ?')
+                    if field not in ('ma_so_thue', 'created_at'):  # Skip PK and created_at
+                        update_fields.append(field)
                         update_values.append(value)
                 
                 update_values.append(tax_code)  # For WHERE clause
                 
-                sql = f'''
-                    UPDATE Companies 
-                    SET {', '.join(update_fields)}, updated_at = CURRENT_TIMESTAMP
-                    WHERE ma_so_thue = ?
-                '''
-                
-                cursor.execute(sql, update_values)
+                cursor.execute(_company_update_sql(tuple(update_fields)), update_values)
+                if raw and cursor.rowcount:
+                    self._write_raw_json(cursor, tax_code, raw)
                 conn.commit()
                 
                 self.logger.debug(f"Company {tax_code} updated successfully")
@@ -166,36 +615,182 @@ class DatabaseManager:
             self.logger.error(f"Failed to update company {tax_code}: {e}")
             return False
     
+    @staticmethod
+    def _write_raw_json(cursor: sqlite3.Cursor, tax_code: str, raw: Dict[str, Any]):
+        """Ghi các cột raw JSON của một company vào CompanyRaw"""
+        cursor.execute(_company_raw_upsert_sql(tuple(raw)), (tax_code, *raw.values()))
+    
+    def get_existing_tax_codes(self, tax_codes: List[str]) -> set:
+        """Get the subset of tax codes already in database"""
+        if not tax_codes:
+            return set()
+        
+        # Chỉ hỏi database các mã chưa có trong cache
+        known = self._known_tax_codes.intersection(tax_codes)
+        unknown = [tax_code for tax_code in tax_codes if tax_code not in known]
+        if not unknown:
+            return known
+        try:
+            with self.get_read_conn() as conn:
+                cursor = conn.cursor()
+                placeholders = ', '.join(['?' for _ in unknown])
+                cursor.execute(
+                    f'SELECT ma_so_thue FROM Companies WHERE ma_so_thue IN ({placeholders})',
+                    unknown
+                )
+                found = {row[0] for row in cursor.fetchall()}
+            self._remember_tax_codes(found)
+            return known | found
+        except Exception as e:
+            self.logger.error(f"Failed to check existing companies: {e}")
+            return set()
+    
+    def save_companies(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Save many companies (insert or update) in a single transaction
+        
+        Mỗi row được ghi bằng UPSERT theo COMPANY_COLUMNS và RAW_JSON_COLUMNS (key thiếu
+        được ghi NULL, key lạ bị bỏ qua); rows không có mã số thuế bị bỏ qua.
+        
+        Returns:
+            Số companies đã ghi (0 nếu lỗi)
+        """
+        try:
+            rows = [row for row in rows if row.get('ma_so_thue')]
+            if not rows:
+                return 0
+            values = [
+                (*map(row.get, _COMPANY_DATA_COLUMNS), to_epoch(row.get('created_at')), to_epoch(row.get('updated_at')))
+                for row in rows
+            ]
+            raw_values = [(row['ma_so_thue'], *map(row.get, RAW_JSON_COLUMNS)) for row in rows]
+            
+            with self._write_conn() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(_COMPANY_UPSERT_SQL, values)
+                conn.executemany(_COMPANY_RAW_UPSERT_SQL, raw_values)
+            
+            self._remember_tax_codes(row[0] for row in values)
+            self.logger.debug(f"Saved {len(values)} companies")
+            
+            if len(values) > self.ANALYZE_THRESHOLD:
+                self.analyze()
+            return len(values)
+        
+        except Exception as e:
+            self.logger.error(f"Failed to save companies: {e}")
+            return 0
+    
+    def bulk_insert_companies(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert or update many company records in a single transaction"""
+        # UPSERT thay cho INSERT OR REPLACE (REPLACE không kích hoạt trigger xoá của Companies_fts)
+        return self.save_companies(rows)
+    
     def save_company(self, company_data: Dict[str, Any]) -> bool:
         """Save company (insert or update)"""
         tax_code = company_data.get('ma_so_thue')
         if not tax_code:
             self.logger.error("Cannot save company without tax code")
             return False
+        if not isinstance(tax_code, str) or not _TAX_RE.match(tax_code):
+            self.logger.error(f"Cannot save company with malformed tax code: {tax_code!r}")
+            return False
         
-        if self.company_exists(tax_code):
-            return self.update_company(tax_code, company_data)
-        else:
-            return self.insert_company(company_data)
+        try:
+            # Một câu lệnh UPSERT thay cho SELECT rồi INSERT/UPDATE
+            company_data, raw = _split_raw_json(_with_epoch_timestamps(company_data))
+            columns = tuple(company_data)
+            with self._write_conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute(_company_upsert_sql(columns), tuple(company_data.values()))
+                if raw:
+                    self._write_raw_json(cursor, tax_code, raw)
+            
+            self._remember_tax_codes((tax_code,))
+            self.logger.debug(f"Company {tax_code} saved successfully")
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"Failed to save company {tax_code}: {e}")
+            return False
     
-    def get_company(self, tax_code: str) -> Optional[Dict[str, Any]]:
-        """Get company by tax code"""
+    def get_company_row(self, tax_code: str) -> Optional[sqlite3.Row]:
+        """Get company by tax code as sqlite3.Row (truy cập theo index hoặc tên cột, không copy sang dict)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.get_read_conn() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
                 
                 cursor.execute('SELECT * FROM Companies WHERE ma_so_thue = ?', (tax_code,))
-                row = cursor.fetchone()
-                
-                if row:
-                    return dict(row)
-                return None
+                return cursor.fetchone()
                 
         except Exception as e:
             self.logger.error(f"Failed to get company {tax_code}: {e}")
             return None
     
+    def get_company(self, tax_code: str) -> Optional[Dict[str, Any]]:
+        """Get company by tax code"""
+        row = self.get_company_row(tax_code)
+        return dict(row) if row is not None else None
+    
+    def get_raw(self, tax_code: str) -> Optional[Dict[str, Any]]:
+        """Get raw JSON (raw_json_api, raw_json_hsctvn) của company, None nếu không có"""
+        try:
+            with self.get_read_conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT {', '.join(RAW_JSON_COLUMNS)} FROM CompanyRaw WHERE ma_so_thue = ?",
+                    (tax_code,)
+                )
+                row = cursor.fetchone()
+                return dict(zip(RAW_JSON_COLUMNS, row)) if row is not None else None
+        
+        except Exception as e:
+            self.logger.error(f"Failed to get raw JSON of company {tax_code}: {e}")
+            return None
+    
+    def _build_companies_query(
+        self,
+        tinh_trang: Optional[str] = None,
+        nganh_nghe: Optional[str] = None,
+        tinh_thanh_pho: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[str, List[Any]]:
+        """
+        Build SELECT query for companies with filters
+        
+        tinh_thanh_pho so khớp chính xác (hoặc theo pattern LIKE nếu chứa % / _),
+        nganh_nghe tìm theo chuỗi con.
+        """
+        conditions = []
+        params = []
+        
+        if tinh_trang:
+            conditions.append('tinh_trang_hoat_dong = ?')
+            params.append(tinh_trang)
+        
+        if nganh_nghe:
+            # Chuỗi con: FTS5 trigram cần tối thiểu 3 ký tự, ngắn hơn thì dùng LIKE
+            if self._fts_enabled and len(nganh_nghe) >= 3:
+                conditions.append('rowid IN (SELECT rowid FROM Companies_fts WHERE Companies_fts MATCH ?)')
+                params.append(_fts_phrase('nganh_nghe_kinh_doanh_chinh', nganh_nghe))
+            else:
+                conditions.append('nganh_nghe_kinh_doanh_chinh LIKE ?')
+                params.append(f'%{nganh_nghe}%')
+        
+        if tinh_thanh_pho:
+            # Tên tỉnh/thành chính xác (dùng index); pattern có % hoặc _ thì dùng LIKE
+            if '%' in tinh_thanh_pho or '_' in tinh_thanh_pho:
+                conditions.append('tinh_thanh_pho LIKE ?')
+            else:
+                conditions.append('tinh_thanh_pho = ?')
+            params.append(tinh_thanh_pho)
+        
+        if limit:
+            params.append(int(limit))
+        
+        return _companies_query_sql(tuple(conditions), bool(limit)), params
+    
     def get_companies(
         self, 
         tinh_trang: Optional[str] = None,
@@ -203,69 +798,115 @@ class DatabaseManager:
         tinh_thanh_pho: Optional[str] = None,
         limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Get companies with filters"""
+        """Get companies with filters (dùng iter_companies khi cần stream)"""
+        return list(self.iter_companies(
+            tinh_trang=tinh_trang,
+            nganh_nghe=nganh_nghe,
+            tinh_thanh_pho=tinh_thanh_pho,
+            limit=limit
+        ))
+    
+    def iter_companies(
+        self,
+        batch_size: int = 1000,
+        tinh_trang: Optional[str] = None,
+        nganh_nghe: Optional[str] = None,
+        tinh_thanh_pho: Optional[str] = None,
+        limit: Optional[int] = None,
+        as_rows: bool = False
+    ) -> Iterator[Union[Dict[str, Any], sqlite3.Row]]:
+        """
+        Iterate companies with filters, fetching batch_size rows at a time
+        
+        Connection đọc được giữ cho tới khi generator chạy hết (hoặc bị close).
+        as_rows=True trả về sqlite3.Row nguyên bản thay vì dict.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.get_read_conn() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
                 
-                # Build query
-                conditions = []
-                params = []
-                
-                if tinh_trang:
-                    conditions.append('tinh_trang_hoat_dong = ?')
-                    params.append(tinh_trang)
-                
-                if nganh_nghe:
-                    conditions.append('nganh_nghe_kinh_doanh_chinh LIKE ?')
-                    params.append(f'%{nganh_nghe}%')
-                
-                if tinh_thanh_pho:
-                    conditions.append('tinh_thanh_pho LIKE ?')
-                    params.append(f'%{tinh_thanh_pho}%')
-                
-                where_clause = ''
-                if conditions:
-                    where_clause = 'WHERE ' + ' AND '.join(conditions)
-                
-                limit_clause = ''
-                if limit:
-                    limit_clause = f'LIMIT {limit}'
-                
-                sql = f'''
-                    SELECT * FROM Companies 
-                    {where_clause}
-                    ORDER BY updated_at DESC
-                    {limit_clause}
-                '''
-                
+                sql, params = self._build_companies_query(tinh_trang, nganh_nghe, tinh_thanh_pho, limit)
                 cursor.execute(sql, params)
-                rows = cursor.fetchall()
-                
-                return [dict(row) for row in rows]
                 
+                while rows := cursor.fetchmany(batch_size):
+                    yield from (rows if as_rows else map(dict, rows))
+        
         except Exception as e:
-            self.logger.error(f"Failed to get companies: {e}")
-            return []
+            self.logger.error(f"Failed to iterate companies: {e}")
     
     def log_message(self, level: str, message: str):
-        """Log message to database"""
+        """
+        Log message to database
+        
+        Message được đưa vào queue và ghi theo batch bởi thread nền (không chờ I/O).
+        Sau close() message bị bỏ qua.
+        """
+        if self._closed:
+            return
+        self._ensure_log_writer()
+        self._log_queue.put((level, message))
+    
+    def _ensure_log_writer(self):
+        """Start thread ghi log nền nếu chưa chạy"""
+        if self._log_thread is not None and self._log_thread.is_alive():
+            return
+        with self._log_thread_lock:
+            if self._log_thread is None or not self._log_thread.is_alive():
+                self._log_thread = threading.Thread(
+                    target=self._drain_log_queue, name="DatabaseLogWriter", daemon=True
+                )
+                self._log_thread.start()
+    
+    def _drain_log_queue(self):
+        """Lấy messages từ queue, ghi mỗi lần tối đa LOG_BATCH_SIZE dòng trong một transaction"""
+        stopping = False
+        while not stopping:
+            entry = self._log_queue.get()
+            if entry is None:
+                break
+            
+            batch = [entry]
+            while len(batch) < self.LOG_BATCH_SIZE:
+                try:
+                    entry = self._log_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            
+            self.log_messages_bulk(batch)
+    
+    def _stop_log_writer(self, timeout: float = 5.0):
+        """Ghi nốt các messages còn trong queue rồi dừng thread ghi log"""
+        thread = self._log_thread
+        if thread is not None and thread.is_alive():
+            self._log_queue.put(None)
+            thread.join(timeout)
+        self._log_thread = None
+    
+    def log_messages_bulk(self, entries: List[Tuple[str, str]]) -> int:
+        """Log many (level, message) entries to database in one transaction (0 sau close())"""
+        if not entries or self._closed:
+            return 0
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
+            with self._write_conn() as conn:
+                conn.executemany(
                     'INSERT INTO Logs (level, message) VALUES (?, ?)',
-                    (level, message)
+                    entries
                 )
                 conn.commit()
+            return len(entries)
         except Exception as e:
             self.logger.error(f"Failed to log to database: {e}")
+            return 0
     
     def get_stats(self) -> Dict[str, Any]:
         """Get database statistics"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.get_read_conn() as conn:
                 cursor = conn.cursor()
                 
                 stats = {}
@@ -304,11 +945,11 @@ class DatabaseManager:
                 
                 # Recent additions
                 cursor.execute('''
-                    SELECT DATE(created_at), COUNT(*)
+                    SELECT DATE(created_at, 'unixepoch'), COUNT(*)
                     FROM Companies
-                    WHERE created_at >= DATE('now', '-7 days')
-                    GROUP BY DATE(created_at)
-                    ORDER BY DATE(created_at) DESC
+                    WHERE created_at >= CAST(strftime('%s', 'now', '-7 days', 'start of day') AS INTEGER)
+                    GROUP BY 1
+                    ORDER BY 1 DESC
                 ''')
                 stats['recent_additions'] = dict(cursor.fetchall())
                 
@@ -323,26 +964,73 @@ class DatabaseManager:
             return {}
     
     def cleanup_old_logs(self, days: int = 30) -> int:
-        """Clean up old log entries"""
+        """
+        Clean up old log entries
+        
+        Xoá theo từng đợt LOG_CLEANUP_BATCH_SIZE dòng (transaction nhỏ, WAL không phình to).
+        """
+        # Mốc thời gian tính một lần (UTC, cùng định dạng với CURRENT_TIMESTAMP) để so sánh
+        # trực tiếp với cột timestamp qua idx_logs_timestamp
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d')
+        deleted_count = 0
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    DELETE FROM Logs 
-                    WHERE timestamp < DATE('now', '-{} days')
-                '''.format(days))
-                
-                deleted_count = cursor.rowcount
-                conn.commit()
-                
-                self.logger.info(f"Cleaned up {deleted_count} old log entries")
-                return deleted_count
+            while True:
+                with self._write_conn() as conn:
+                    cursor = conn.execute(
+                        'DELETE FROM Logs WHERE rowid IN '
+                        '(SELECT rowid FROM Logs WHERE timestamp < ? LIMIT ?)',
+                        (cutoff, self.LOG_CLEANUP_BATCH_SIZE)
+                    )
+                    deleted = cursor.rowcount
+                deleted_count += deleted
+                if deleted < self.LOG_CLEANUP_BATCH_SIZE:
+                    break
+            
+            self.logger.info(f"Cleaned up {deleted_count} old log entries")
+            return deleted_count
                 
         except Exception as e:
             self.logger.error(f"Failed to cleanup logs: {e}")
-            return 0
+            return deleted_count
+    
+    def analyze(self):
+        """Cập nhật thống kê cho query planner (sau khi ghi nhiều dữ liệu)"""
+        try:
+            with self._write_conn() as conn:
+                conn.execute('ANALYZE')
+        except Exception as e:
+            self.logger.error(f"Failed to analyze database: {e}")
     
     def close(self):
         """Close database connections"""
-        # SQLite connections are per-thread and auto-close
-        pass
\ No newline at end of file
+        # Ghi nốt log messages đang chờ
+        self._stop_log_writer()
+        
+        # Connection ghi (PRAGMA optimize trước khi đóng, theo khuyến nghị của SQLite)
+        with self._write_lock:
+            self._closed = True
+            if self._writer is not None:
+                try:
+                    self._writer.execute('PRAGMA optimize')
+                except Exception:
+                    pass
+                try:
+                    self._writer.close()
+                except Exception:
+                    pass
+                self._writer = None
+        
+        # Pooled read connections
+        with self._read_pool_lock:
+            for conn in self._read_conns:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._read_conns.clear()
+        
+        while not self._read_pool.empty():
+            try:
+                self._read_pool.get_nowait()
+            except queue.Empty:
+                break
\ No newline at end of file
@@ -4,13 +4,99 @@ Enhanced Company model for Enterprise Data Collector
 Author: MiniMax Agent
 """
 
-from dataclasses import dataclass, field
-from typing import Optional, Dict, Any, List
+from dataclasses import dataclass, field, fields, MISSING
+from operator import attrgetter
+from typing import Optional, Dict, Any, Iterable, List, Tuple
 from datetime import datetime
-import json
 
+from .company import _json_dumps
 
-@dataclass
+
+# Headers cho Excel export (31 cột) - dựng một lần khi load module
+EXCEL_HEADERS = (
+    'Mã số thuế',
+    'Tên công ty',
+    'Địa chỉ đăng ký',
+    'Người đại diện',
+    'Điện thoại đại diện',
+    'Số giấy phép kinh doanh',
+    'Ngày cấp giấy phép',
+    'Tỉnh thành phố',
+    'Tên giao dịch',
+    'Tên tiếng Anh',
+    'Chức vụ đại diện',
+    'Fax',
+    'Email',
+    'Website',
+    'Quận/Huyện',
+    'Phường/Xã',
+    'Ngành nghề kinh doanh chính',
+    'Ngành nghề khác',
+    'Loại hình doanh nghiệp',
+    'Tình trạng hoạt động',
+    'Ngày hoạt động',
+    'Ngày thay đổi gần nhất',
+    'Cơ quan cấp phép',
+    'Số quyết định',
+    'Vốn điều lệ',
+    'Vốn đăng ký',
+    'Đại diện pháp luật',
+    'Địa chỉ thuế',
+    'Cập nhật lần cuối',
+    'Trạng thái HSCTVN',
+    'Nguồn dữ liệu',
+)
+
+# Thuộc tính tương ứng từng cột Excel (cùng thứ tự với EXCEL_HEADERS)
+EXCEL_FIELDS = (
+    'ma_so_thue', 'ten_cong_ty', 'dia_chi_dang_ky',
+    'nguoi_dai_dien', 'dien_thoai_dai_dien', 'so_giay_phep_kinh_doanh',
+    'ngay_cap_giay_phep', 'tinh_thanh_pho', 'ten_giao_dich',
+    'ten_tieng_anh', 'chuc_vu_dai_dien', 'fax',
+    'email', 'website', 'quan_huyen',
+    'phuong_xa', 'nganh_nghe_kinh_doanh_chinh', 'nganh_nghe_khac',
+    'loai_hinh_doanh_nghiep', 'tinh_trang_hoat_dong', 'ngay_hoat_dong',
+    'ngay_thay_doi_gan_nhat', 'co_quan_cap_phep', 'so_quyet_dinh',
+    'von_dieu_le', 'von_dang_ky', 'dai_dien_phap_luat',
+    'dia_chi_thue', 'cap_nhat_lan_cuoi', 'trang_thai_hsctvn',
+    'data_source',
+)
+
+_get_excel_fields = attrgetter(*EXCEL_FIELDS)
+
+# from_api_data: (thuộc tính, key chính, key dự phòng trong API response, giá trị mặc định)
+_API_FIELD_MAP = (
+    ('ma_so_thue', 'ma_so_thue', 'MaSoThue', ''),
+    ('ten_cong_ty', 'ten_cong_ty', 'Title', ''),
+    ('ten_giao_dich', 'ten_giao_dich', 'Title', ''),
+    ('ten_tieng_anh', 'ten_tieng_anh', 'TitleEn', ''),
+    ('nguoi_dai_dien', 'nguoi_dai_dien', 'ChuSoHuu', ''),
+    ('chuc_vu_dai_dien', 'chuc_vu_dai_dien', None, ''),
+    ('dien_thoai', 'dien_thoai', None, ''),
+    ('fax', 'fax', None, ''),
+    ('email', 'email', None, ''),
+    ('website', 'website', None, ''),
+    ('dia_chi_dang_ky', 'dia_chi', 'DiaChiCongTy', ''),
+    ('tinh_thanh_pho', 'tinh_thanh_pho', 'TinhThanhTitle', ''),
+    ('quan_huyen', 'quan_huyen', 'QuanHuyenTitle', ''),
+    ('phuong_xa', 'phuong_xa', 'PhuongXaTitle', ''),
+    ('nganh_nghe_kinh_doanh_chinh', 'nganh_nghe_kinh_doanh_chinh', 'NganhNgheTitle', ''),
+    ('loai_hinh_doanh_nghiep', 'loai_hinh_doanh_nghiep', 'LoaiHinhTitle', ''),
+    ('tinh_trang_hoat_dong', 'tinh_trang_hoat_dong', None, ''),
+    ('so_giay_phep_kinh_doanh', 'so_giay_phep_kinh_doanh', 'GiayPhepKinhDoanh', ''),
+    ('ngay_cap_giay_phep', 'ngay_cap_phep', 'NgayCap', None),
+    ('ngay_hoat_dong', 'ngay_hoat_dong', 'NgayBatDauHopDong', None),
+    ('ngay_thay_doi_gan_nhat', 'ngay_thay_doi_gan_nhat', 'Updated', None),
+    ('co_quan_cap_phep', 'co_quan_cap_phep', 'GiayPhepKinhDoanh_CoQuanCapTitle', ''),
+    ('so_quyet_dinh', 'so_quyet_dinh', 'GiayPhepKinhDoanh', ''),
+    ('von_dieu_le', 'von_dieu_le', 'VonDieuLe', ''),
+    ('von_dang_ky', 'von_dang_ky', None, ''),
+)
+
+_MISSING = object()
+
+
+@dataclass(slots=True)
 class EnhancedCompany:
     """Enhanced company model với 31 trường thông tin từ 2 nguồn dữ liệu"""
     
@@ -65,50 +151,45 @@ class EnhancedCompany:
     updated_at: Optional[datetime] = None
     
     @classmethod
-    def from_api_data(cls, api_data: Dict[str, Any]) -> 'EnhancedCompany':
-        """Tạo EnhancedCompany từ dữ liệu API chính"""
+    def from_api_data(cls, api_data: Dict[str, Any], raw_json: Optional[str] = None) -> 'EnhancedCompany':
+        """
+        Tạo EnhancedCompany từ dữ liệu API chính
+        
+        Args:
+            api_data: Dữ liệu API
+            raw_json: JSON gốc đã serialize sẵn (None: serialize api_data)
+        """
+        
+        # Giá trị theo thứ tự field, khởi tạo bằng tham số vị trí (không bind keyword arguments)
+        values = list(_INIT_DEFAULTS)
+        for index, key, fallback_key, default in _API_FIELD_SLOTS:
+            value = api_data.get(key, _MISSING)
+            if value is _MISSING:
+                value = api_data.get(fallback_key, default) if fallback_key else default
+            values[index] = value
+        
+        if 'tinh_trang_hoat_dong' not in api_data:
+            values[_FIELD_INDEX['tinh_trang_hoat_dong']] = 'Hoạt động' if not api_data.get('IsDelete', False) else 'Ngừng hoạt động'
         
         # Parse ngành nghề khác
-        nganh_nghe_khac = []
-        if 'DSNganhNgheKinhDoanh' in api_data:
-            if isinstance(api_data['DSNganhNgheKinhDoanh'], list):
-                nganh_nghe_khac = api_data['DSNganhNgheKinhDoanh']
+        nganh_nghe_khac = api_data.get('DSNganhNgheKinhDoanh')
+        values[_FIELD_INDEX['nganh_nghe_khac']] = nganh_nghe_khac if isinstance(nganh_nghe_khac, list) else []
         
-        return cls(
-            ma_so_thue=api_data.get('ma_so_thue', api_data.get('MaSoThue', '')),
-            ten_cong_ty=api_data.get('ten_cong_ty', api_data.get('Title', '')),
-            ten_giao_dich=api_data.get('ten_giao_dich', api_data.get('Title', '')),
-            ten_tieng_anh=api_data.get('ten_tieng_anh', api_data.get('TitleEn', '')),
-            nguoi_dai_dien=api_data.get('nguoi_dai_dien', api_data.get('ChuSoHuu', '')),
-            chuc_vu_dai_dien=api_data.get('chuc_vu_dai_dien', ''),
-            dien_thoai=api_data.get('dien_thoai', ''),
-            fax=api_data.get('fax', ''),
-            email=api_data.get('email', ''),
-            website=api_data.get('website', ''),
-            dia_chi_dang_ky=api_data.get('dia_chi', api_data.get('DiaChiCongTy', '')),
-            tinh_thanh_pho=api_data.get('tinh_thanh_pho', api_data.get('TinhThanhTitle', '')),
-            quan_huyen=api_data.get('quan_huyen', api_data.get('QuanHuyenTitle', '')),
-            phuong_xa=api_data.get('phuong_xa', api_data.get('PhuongXaTitle', '')),
-            nganh_nghe_kinh_doanh_chinh=api_data.get('nganh_nghe_kinh_doanh_chinh', api_data.get('NganhNgheTitle', '')),
-            nganh_nghe_khac=nganh_nghe_khac,
-            loai_hinh_doanh_nghiep=api_data.get('loai_hinh_doanh_nghiep', api_data.get('LoaiHinhTitle', '')),
-            tinh_trang_hoat_dong=api_data.get('tinh_trang_hoat_dong', 'Hoạt động' if not api_data.get('IsDelete', False) else 'Ngừng hoạt động'),
-            so_giay_phep_kinh_doanh=api_data.get('so_giay_phep_kinh_doanh', api_data.get('GiayPhepKinhDoanh', '')),
-            ngay_cap_giay_phep=api_data.get('ngay_cap_phep', api_data.get('NgayCap')),
-            ngay_hoat_dong=api_data.get('ngay_hoat_dong', api_data.get('NgayBatDauHopDong')),
-            ngay_thay_doi_gan_nhat=api_data.get('ngay_thay_doi_gan_nhat', api_data.get('Updated')),
-            co_quan_cap_phep=api_data.get('co_quan_cap_phep', api_data.get('GiayPhepKinhDoanh_CoQuanCapTitle', '')),
-            so_quyet_dinh=api_data.get('so_quyet_dinh', api_data.get('GiayPhepKinhDoanh', '')),
-            von_dieu_le=api_data.get('von_dieu_le', api_data.get('VonDieuLe', '')),
-            von_dang_ky=api_data.get('von_dang_ky', ''),
-            data_source="api",
-            raw_json_api=json.dumps(api_data, ensure_ascii=False),
-            created_at=datetime.now(),
-            updated_at=datetime.now()
-        )
+        now = datetime.now()
+        values[_FIELD_INDEX['data_source']] = "api"
+        values[_FIELD_INDEX['raw_json_api']] = raw_json if raw_json is not None else _json_dumps(api_data)
+        values[_FIELD_INDEX['created_at']] = now
+        values[_FIELD_INDEX['updated_at']] = now
+        return cls(*values)
     
-    def integrate_hsctvn_data(self, hsctvn_data: Dict[str, Any]):
-        """Tích hợp dữ liệu từ HSCTVN vào company hiện tại"""
+    def integrate_hsctvn_data(self, hsctvn_data: Dict[str, Any], raw_json: Optional[str] = None):
+        """
+        Tích hợp dữ liệu từ HSCTVN vào company hiện tại
+        
+        Args:
+            hsctvn_data: Dữ liệu HSCTVN
+            raw_json: JSON gốc đã serialize sẵn (None: serialize hsctvn_data)
+        """
         
         # Ưu tiên dữ liệu từ HSCTVN cho một số trường
         if hsctvn_data.get('dai_dien_phap_luat'):
@@ -145,122 +226,73 @@ class EnhancedCompany:
         
         # Cập nhật metadata
         self.data_source = "dual"
-        self.raw_json_hsctvn = json.dumps(hsctvn_data, ensure_ascii=False)
+        self.raw_json_hsctvn = raw_json if raw_json is not None else _json_dumps(hsctvn_data)
         self.updated_at = datetime.now()
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for database/export"""
-        return {
-            'ma_so_thue': self.ma_so_thue,
-            'ten_cong_ty': self.ten_cong_ty,
-            'ten_giao_dich': self.ten_giao_dich,
-            'ten_tieng_anh': self.ten_tieng_anh,
-            'nguoi_dai_dien': self.nguoi_dai_dien,
-            'chuc_vu_dai_dien': self.chuc_vu_dai_dien,
-            'dai_dien_phap_luat': self.dai_dien_phap_luat,
-            'dien_thoai': self.dien_thoai,
-            'dien_thoai_dai_dien': self.dien_thoai_dai_dien,
-            'fax': self.fax,
-            'email': self.email,
-            'website': self.website,
-            'dia_chi_dang_ky': self.dia_chi_dang_ky,
-            'dia_chi_thue': self.dia_chi_thue,
-            'tinh_thanh_pho': self.tinh_thanh_pho,
-            'quan_huyen': self.quan_huyen,
-            'phuong_xa': self.phuong_xa,
-            'nganh_nghe_kinh_doanh_chinh': self.nganh_nghe_kinh_doanh_chinh,
-            'nganh_nghe_khac': json.dumps(self.nganh_nghe_khac, ensure_ascii=False) if self.nganh_nghe_khac else '',
-            'loai_hinh_doanh_nghiep': self.loai_hinh_doanh_nghiep,
-            'tinh_trang_hoat_dong': self.tinh_trang_hoat_dong,
-            'so_giay_phep_kinh_doanh': self.so_giay_phep_kinh_doanh,
-            'ngay_cap_giay_phep': self.ngay_cap_giay_phep,
-            'ngay_hoat_dong': self.ngay_hoat_dong,
-            'ngay_thay_doi_gan_nhat': self.ngay_thay_doi_gan_nhat,
-            'co_quan_cap_phep': self.co_quan_cap_phep,
-            'so_quyet_dinh': self.so_quyet_dinh,
-            'von_dieu_le': self.von_dieu_le,
-            'von_dang_ky': self.von_dang_ky,
-            'cap_nhat_lan_cuoi': self.cap_nhat_lan_cuoi,
-            'trang_thai_hsctvn': self.trang_thai_hsctvn,
-            'data_source': self.data_source,
-            'raw_json_api': self.raw_json_api,
-            'raw_json_hsctvn': self.raw_json_hsctvn,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        data = dict(zip(DICT_FIELDS, _get_dict_fields(self)))
+        
+        # Các field cần định dạng lại khi lưu/xuất
+        data['nganh_nghe_khac'] = _json_dumps(self.nganh_nghe_khac) if self.nganh_nghe_khac else ''
+        data['created_at'] = self.created_at.isoformat() if self.created_at else None
+        data['updated_at'] = self.updated_at.isoformat() if self.updated_at else None
+        return data
+    
+    @classmethod
+    def to_columnar(cls, companies: List['EnhancedCompany']) -> Dict[str, List[Any]]:
+        """
+        Chuyển danh sách companies sang dạng cột: {field: [giá trị của từng company]}
+        
+        Giá trị giữ nguyên kiểu gốc (list, datetime), không định dạng như to_dict.
+        """
+        if not companies:
+            return {name: [] for name in DICT_FIELDS}
+        columns = zip(*map(_get_dict_fields, companies))
+        return {name: list(values) for name, values in zip(DICT_FIELDS, columns)}
     
     def to_excel_row(self) -> List[Any]:
         """Convert to Excel row format (31 columns)"""
-        return [
-            self.ma_so_thue,
-            self.ten_cong_ty,
-            self.dia_chi_dang_ky or self.dia_chi_thue,
-            self.nguoi_dai_dien or self.dai_dien_phap_luat,
-            self.dien_thoai_dai_dien or self.dien_thoai,
-            self.so_giay_phep_kinh_doanh,
-            self.ngay_cap_giay_phep,
-            self.tinh_thanh_pho,
-            self.ten_giao_dich,
-            self.ten_tieng_anh,
-            self.chuc_vu_dai_dien,
-            self.fax,
-            self.email,
-            self.website,
-            self.quan_huyen,
-            self.phuong_xa,
-            self.nganh_nghe_kinh_doanh_chinh,
-            ', '.join(self.nganh_nghe_khac) if self.nganh_nghe_khac else '',
-            self.loai_hinh_doanh_nghiep,
-            self.tinh_trang_hoat_dong,
-            self.ngay_hoat_dong,
-            self.ngay_thay_doi_gan_nhat,
-            self.co_quan_cap_phep,
-            self.so_quyet_dinh,
-            self.von_dieu_le,
-            self.von_dang_ky,
-            self.dai_dien_phap_luat,
-            self.dia_chi_thue,
-            self.cap_nhat_lan_cuoi,
-            self.trang_thai_hsctvn,
-            self.data_source
-        ]
+        row = list(_get_excel_fields(self))
+        
+        # Các cột có nguồn dự phòng (API -> HSCTVN)
+        row[2] = row[2] or self.dia_chi_thue
+        row[3] = row[3] or self.dai_dien_phap_luat
+        row[4] = row[4] or self.dien_thoai
+        row[17] = ', '.join(row[17]) if row[17] else ''
+        return row
+    
+    @classmethod
+    def to_excel_rows(cls, companies: Iterable['EnhancedCompany']) -> List[List[Any]]:
+        """
+        Convert nhiều companies sang Excel rows (như to_excel_row, một lần cho cả batch)
+        """
+        return [company.to_excel_row() for company in companies]
     
     @staticmethod
-    def get_excel_headers() -> List[str]:
+    def get_excel_headers() -> Tuple[str, ...]:
         """Lấy headers cho Excel export (31 columns)"""
-        return [
-            'Mã số thuế',
-            'Tên công ty',
-            'Địa chỉ đăng ký',
-            'Người đại diện',
-            'Điện thoại đại diện',
-            'Số giấy phép kinh doanh',
-            'Ngày cấp giấy phép',
-            'Tỉnh thành phố',
-            'Tên giao dịch',
-            'Tên tiếng Anh',
-            'Chức vụ đại diện',
-            'Fax',
-            'Email',
-            'Website',
-            'Quận/Huyện',
-            'Phường/Xã',
-            'Ngành nghề kinh doanh chính',
-            'Ngành nghề khác',
-            'Loại hình doanh nghiệp',
-            'Tình trạng hoạt động',
-            'Ngày hoạt động',
-            'Ngày thay đổi gần nhất',
-            'Cơ quan cấp phép',
-            'Số quyết định',
-            'Vốn điều lệ',
-            'Vốn đăng ký',
-            'Đại diện pháp luật',
-            'Địa chỉ thuế',
-            'Cập nhật lần cuối',
-            'Trạng thái HSCTVN',
-            'Nguồn dữ liệu'
-        ]
+        return EXCEL_HEADERS
     
     def __str__(self) -> str:
-        return f"EnhancedCompany({self.ma_so_thue}: {self.ten_cong_ty})"
\ No newline at end of file
+        return f"EnhancedCompany({self.ma_so_thue}: {self.ten_cong_ty})"
+
+
+# Các field theo thứ tự khai báo (thứ tự keys của to_dict) - tính một lần khi load module
+DICT_FIELDS = tuple(f.name for f in fields(EnhancedCompany))
+
+# Vị trí của từng field trong tham số khởi tạo (dùng cho from_api_data)
+_FIELD_INDEX = {name: index for index, name in enumerate(DICT_FIELDS)}
+
+# Giá trị mặc định theo thứ tự field (field dùng default_factory luôn được from_api_data gán lại)
+_INIT_DEFAULTS = tuple(
+    f.default if f.default is not MISSING else None for f in fields(EnhancedCompany)
+)
+
+# _API_FIELD_MAP với tên thuộc tính đổi thành vị trí field
+_API_FIELD_SLOTS = tuple(
+    (_FIELD_INDEX[attr], key, fallback_key, default)
+    for attr, key, fallback_key, default in _API_FIELD_MAP
+)
+
+_get_dict_fields = attrgetter(*DICT_FIELDS)
@@ -5,10 +5,21 @@ Author: MiniMax Agent
 """
 
 from dataclasses import dataclass
+from operator import attrgetter
 from typing import Optional, Dict, Any
 
 
-@dataclass
+_CITY_FIELDS = ('id', 'name', 'slug', 'code', 'type')
+_DISTRICT_FIELDS = ('id', 'name', 'slug', 'city_id', 'code', 'type')
+_WARD_FIELDS = ('id', 'name', 'slug', 'district_id', 'code', 'type')
+
+# Đọc các field theo thứ tự bằng một lần gọi (dùng trong to_dict)
+_get_city_fields = attrgetter(*_CITY_FIELDS)
+_get_district_fields = attrgetter(*_DISTRICT_FIELDS)
+_get_ward_fields = attrgetter(*_WARD_FIELDS)
+
+
+@dataclass(slots=True, frozen=True)
 class City:
     """Tỉnh/Thành phố"""
     id: int
@@ -18,19 +29,13 @@ class City:
     type: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            'id': self.id,
-            'name': self.name,
-            'slug': self.slug,
-            'code': self.code,
-            'type': self.type
-        }
+        return dict(zip(_CITY_FIELDS, _get_city_fields(self)))
     
     def __str__(self) -> str:
         return f"{self.name} ({self.slug})"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class District:
     """Quận/Huyện"""
     id: int
@@ -41,20 +46,13 @@ class District:
     type: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            'id': self.id,
-            'name': self.name,
-            'slug': self.slug,
-            'city_id': self.city_id,
-            'code': self.code,
-            'type': self.type
-        }
+        return dict(zip(_DISTRICT_FIELDS, _get_district_fields(self)))
     
     def __str__(self) -> str:
         return f"{self.name} ({self.slug})"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Ward:
     """Phường/Xã"""
     id: int
@@ -65,14 +63,7 @@ class Ward:
     type: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            'id': self.id,
-            'name': self.name,
-            'slug': self.slug,
-            'district_id': self.district_id,
-            'code': self.code,
-            'type': self.type
-        }
+        return dict(zip(_WARD_FIELDS, _get_ward_fields(self)))
     
     def __str__(self) -> str:
-        return f"{self.name} ({self.slug})"
\ No newline at end of file
+        return f"{self.name} ({self.slug})"
@@ -5,10 +5,17 @@ Author: MiniMax Agent
 """
 
 from dataclasses import dataclass
+from operator import attrgetter
 from typing import Optional, Dict, Any
 
 
-@dataclass
+_INDUSTRY_FIELDS = ('id', 'name', 'slug', 'code', 'parent_id')
+
+# Đọc các field theo thứ tự bằng một lần gọi (dùng trong to_dict)
+_get_industry_fields = attrgetter(*_INDUSTRY_FIELDS)
+
+
+@dataclass(slots=True, frozen=True)
 class Industry:
     """Ngành nghề kinh doanh"""
     id: int
@@ -18,13 +25,7 @@ class Industry:
     parent_id: Optional[int] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            'id': self.id,
-            'name': self.name,
-            'slug': self.slug,
-            'code': self.code,
-            'parent_id': self.parent_id
-        }
+        return dict(zip(_INDUSTRY_FIELDS, _get_industry_fields(self)))
     
     def __str__(self) -> str:
         return f"{self.name} ({self.slug})"
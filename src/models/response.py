@@ -6,12 +6,11 @@ Author: MiniMax Agent
 
 from dataclasses import dataclass
 from typing import Generic, TypeVar, List, Optional, Dict, Any
-import math
 
 T = TypeVar('T')
 
 
-@dataclass
+@dataclass(slots=True)
 class ApiResponse(Generic[T]):
     """Generic API response wrapper"""
     success: bool
@@ -38,7 +37,7 @@ class ApiResponse(Generic[T]):
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class PaginatedResponse(Generic[T]):
     """Paginated response for list data"""
     items: List[T]
@@ -58,7 +57,8 @@ class PaginatedResponse(Generic[T]):
         total_count: int
     ) -> 'PaginatedResponse[T]':
         """Tạo PaginatedResponse từ dữ liệu API"""
-        total_pages = math.ceil(total_count / page_size) if page_size > 0 else 1
+        # Chia lấy trần bằng số nguyên (không qua float)
+        total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
         
         return cls(
             items=items,
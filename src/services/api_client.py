@@ -5,20 +5,381 @@ Author: MiniMax Agent
 """
 
 import requests
+import asyncio
 import time
+import random
 import logging
-from typing import Optional, List, Dict, Any, Union
-from urllib.parse import urljoin, urlencode
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from dataclasses import dataclass, fields
+from typing import Optional, List, Dict, Any, Union, Hashable, Tuple, Iterator, Callable
 import json
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+try:
+    import aiohttp
+except ImportError:  # aiohttp là tuỳ chọn, fallback sang requests trên worker thread
+    aiohttp = None
+
+try:
+    import httpx
+    import h2  # noqa: F401 - httpx chỉ dùng được HTTP/2 khi có gói h2
+except ImportError:  # httpx[http2] là tuỳ chọn, không có thì async requests dùng aiohttp (HTTP/1.1)
+    httpx = None
+
+try:
+    import orjson
+except ImportError:  # orjson là tuỳ chọn, fallback sang json chuẩn
+    orjson = None
+
+try:
+    import brotli  # noqa: F401 - urllib3/httpx/aiohttp giải nén "br" khi có gói brotli
+except ImportError:  # brotli là tuỳ chọn, không có thì chỉ nhận gzip/deflate
+    brotli = None
+
+try:
+    from requests_cache import CachedSession, DO_NOT_CACHE
+except ImportError:  # requests-cache là tuỳ chọn, không có thì chỉ cache trong bộ nhớ
+    CachedSession = None
+
 from models import (
     City, District, Ward, Industry, CompanySearchResult, CompanyDetail,
     ApiResponse, PaginatedResponse
 )
 
 
+# Async requests: httpx (HTTP/2, nhiều requests đồng thời dùng chung một kết nối TLS)
+# nếu có, nếu không thì aiohttp; không có cả hai thì chạy requests trên worker thread
+_HAS_ASYNC_HTTP = httpx is not None or aiohttp is not None
+
+if httpx is not None:
+    _AsyncHTTPError = httpx.HTTPError
+elif aiohttp is not None:
+    _AsyncHTTPError = aiohttp.ClientError
+else:
+    _AsyncHTTPError = None
+
+# Nén response: chỉ nhận brotli khi giải nén được (JSON nhỏ hơn gzip ~20%)
+ACCEPT_ENCODING = "br, gzip, deflate" if brotli is not None else "gzip, deflate"
+
+# Status codes được retry (requests Retry, async requests và sync HTTP/2 client)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Jitter ngẫu nhiên tối đa (giây) cộng vào mỗi lần chờ retry, để các clients không retry cùng lúc
+BACKOFF_JITTER = 0.5
+
+# Lỗi HTTP của sync requests (requests, và httpx khi dùng sync HTTP/2 client)
+if httpx is not None:
+    _SyncHTTPErrors = (requests.exceptions.RequestException, httpx.HTTPError)
+else:
+    _SyncHTTPErrors = (requests.exceptions.RequestException,)
+
+# Số kết nối tối đa của async session httpx (mỗi kết nối HTTP/2 mang nhiều requests)
+HTTP2_MAX_CONNECTIONS = 16
+
+# Connection pool của requests session: số host giữ pool và số kết nối keep-alive mỗi host
+# (đủ cho các worker threads chạy đồng thời, không phải bỏ kết nối rồi bắt tay TLS lại)
+HTTP_POOL_CONNECTIONS = 8
+HTTP_POOL_MAXSIZE = 64
+
+# Thời hạn cache (giây) của dữ liệu tham chiếu: địa giới hành chính và ngành nghề hiếm khi thay đổi
+REFERENCE_CACHE_TTL = 86400
+
+# Thời hạn cache trên đĩa (giây) của các endpoints dữ liệu tham chiếu, theo thứ tự so khớp
+# (pattern khớp theo tiền tố URL); các endpoints khác không được cache trên đĩa
+REFERENCE_CACHE_EXPIRY = (
+    ('/api/city/*', REFERENCE_CACHE_TTL),
+    ('/api/city', REFERENCE_CACHE_TTL),
+    ('/api/district/*', REFERENCE_CACHE_TTL),
+    ('/api/ward/*', REFERENCE_CACHE_TTL),
+    ('/api/industry', REFERENCE_CACHE_TTL),
+)
+
+# Các cấp mã ngành của /api/industry, từ cấp sâu nhất (Lv5) đến Lv1
+INDUSTRY_LEVEL_KEYS = ('Lv5', 'Lv4', 'Lv3', 'Lv2', 'Lv1')
+
+
+def _json_loads(content: bytes) -> Any:
+    """
+    Parse JSON body của response (orjson nếu có)
+    
+    Raises:
+        json.JSONDecodeError: Body không phải JSON hợp lệ (orjson.JSONDecodeError là lớp con)
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _make_parser(
+    model_cls: type,
+    field_map: Dict[str, Tuple],
+    args: Tuple[str, ...] = ()
+) -> Callable[..., List[Any]]:
+    """
+    Sinh (một lần khi import) hàm parse(items, *args) -> List[model_cls] cho một endpoint
+    
+    Hàm sinh ra là một list comprehension gọi model_cls với tham số vị trí theo thứ tự
+    field, tránh chi phí bind keyword arguments của __init__ với mỗi item.
+    
+    Args:
+        model_cls: Dataclass của model
+        field_map: {field: (api_key, default)} hoặc {field: (api_key, default, convert)}
+        args: Các field lấy từ tham số của parse (vd: city_id)
+    
+    Raises:
+        ValueError: field_map/args có field không thuộc model hoặc không liền mạch
+    """
+    namespace: Dict[str, Any] = {'_model': model_cls}
+    values = []
+    for f in fields(model_cls):
+        if not f.init:
+            continue
+        if f.name in args:
+            values.append(f.name)
+        elif f.name in field_map:
+            api_key, default, *convert = field_map[f.name]
+            if default is None:
+                expr = f"d.get({api_key!r})"
+            elif type(default) in (str, int, float, bool):
+                expr = f"d.get({api_key!r}, {default!r})"
+            else:
+                namespace[f'_default_{f.name}'] = default
+                expr = f"d.get({api_key!r}, _default_{f.name})"
+            if convert:
+                namespace[f'_convert_{f.name}'] = convert[0]
+                expr = f"_convert_{f.name}({expr})"
+            values.append(expr)
+        else:
+            # Các field sau dùng default của model
+            break
+    
+    if len(values) != len(field_map) + len(args):
+        raise ValueError(f"Invalid field map for {model_cls.__name__}: {sorted(field_map)} {args}")
+    
+    params = ''.join(f', {name}' for name in args)
+    source = (
+        f"def parse(items{params}):\n"
+        f"    return [_model({', '.join(values)}) for d in items]\n"
+    )
+    exec(source, namespace)
+    return namespace['parse']
+
+
+def _industry_level(item: Dict[str, Any]) -> Tuple[Optional[str], Optional[int]]:
+    """
+    (code, parent_id) của một ngành từ các cấp Lv1..Lv5
+    
+    Quét ngược từ Lv5: cấp không rỗng đầu tiên là mã cụ thể nhất, gặp thêm một cấp
+    không rỗng nữa thì không phải ngành cấp cao nhất.
+    """
+    code = None
+    for key in INDUSTRY_LEVEL_KEYS:
+        value = item.get(key)
+        if value and not value.isspace():
+            if code is not None:
+                # This is a simplification - in a real app you'd build a proper hierarchy
+                return code, 1  # Placeholder parent
+            code = value
+    return code, None
+
+
+def _strip_leading_slash(value: str) -> str:
+    return value.lstrip("/")
+
+
+# Parsers của từng endpoint: field của model -> (key trong API response, default[, convert])
+_parse_cities = _make_parser(City, {
+    'id': ("ID", 0),
+    'name': ("Title", ""),
+    'slug': ("SolrID", "", _strip_leading_slash),  # Remove leading slash
+    'code': ("code", None),
+    'type': ("Type", None),
+})
+
+_parse_districts = _make_parser(District, {
+    'id': ("id", 0),
+    'name': ("name", ""),
+    'slug': ("slug", ""),
+    'code': ("code", None),
+    'type': ("type", None),
+}, args=('city_id',))
+
+_parse_wards = _make_parser(Ward, {
+    'id': ("id", 0),
+    'name': ("name", ""),
+    'slug': ("slug", ""),
+    'code': ("code", None),
+    'type': ("type", None),
+}, args=('district_id',))
+
+_parse_company_search_results = _make_parser(CompanySearchResult, {
+    'ma_so_thue': ("MaSoThue", ""),
+    'ten_cong_ty': ("Title", ""),
+    'dia_chi': ("DiaChiCongTy", ""),
+    'tinh_trang': ("TrangThaiHoatDong", ""),
+    'slug': ("SolrID", ""),
+    'ngay_cap': ("NgayCap", None),
+    'nganh_nghe': ("NganhNgheTitle", None),
+})
+
+
+@dataclass(slots=True)
+class _CacheEntry:
+    """Một response trong _ResponseCache, hết hạn tại expires_at (time.monotonic)"""
+    expires_at: float
+    value: Any
+
+
+class _ResponseCache:
+    """
+    Cache responses có giới hạn: tối đa maxsize entries (bỏ entry lâu không dùng nhất
+    khi đầy), mỗi entry hết hạn sau ttl giây kể từ lúc ghi
+    
+    Entry hết hạn vẫn được giữ (tới khi bị thay hoặc bị bỏ vì đầy) để get_stale dùng
+    khi server lỗi.
+    """
+    
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+    
+    def get(self, key: Hashable) -> Any:
+        """Giá trị còn hạn của key, None nếu không có hoặc đã hết hạn"""
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            self.misses += 1
+            return None
+        try:
+            self._entries.move_to_end(key)
+        except KeyError:
+            pass  # Entry vừa bị thread khác bỏ đi
+        self.hits += 1
+        return entry.value
+    
+    def get_stale(self, key: Hashable) -> Any:
+        """Giá trị của key kể cả khi đã hết hạn, None nếu không có"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self.stale_hits += 1
+        return entry.value
+    
+    def set(self, key: Hashable, value: Any, ttl: float):
+        self._entries[key] = _CacheEntry(time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale_hits': self.stale_hits
+        }
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _TokenBucket:
+    """
+    Token bucket theo đồng hồ monotonic: trung bình một request mỗi interval giây,
+    cho phép burst tới capacity requests khi đã rảnh đủ lâu
+    
+    acquire() giữ chỗ một token và trả về thời gian caller phải chờ (token có thể âm:
+    các caller đồng thời xếp hàng, mỗi caller tự chờ phần của mình).
+    """
+    
+    def __init__(self, interval: float, capacity: int = 1):
+        self.interval = interval
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """Lấy một token, trả về số giây cần chờ trước khi gửi request"""
+        if self.interval <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) / self.interval)
+            self._last = now
+            self._tokens -= 1
+            return -self._tokens * self.interval if self._tokens < 0 else 0.0
+    
+    def refund(self):
+        """Trả lại token của request không tới server (response lấy từ cache trên đĩa)"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+
+class _CircuitBreaker:
+    """
+    Ngắt mạch khi server lỗi liên tiếp: sau threshold requests lỗi liên tiếp, requests
+    bị từ chối ngay (không gửi) trong cooldown giây
+    
+    Hết cooldown thì requests được gửi lại; một request lỗi nữa ngắt mạch tiếp,
+    request thành công đầu tiên đóng mạch và xoá bộ đếm.
+    """
+    
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+    
+    def remaining(self) -> float:
+        """Số giây mạch còn ngắt (0: được gửi request)"""
+        if self.threshold <= 0:
+            return 0.0
+        return max(0.0, self._open_until - time.monotonic())
+    
+    def record_success(self):
+        if self._failures:
+            with self._lock:
+                self._failures = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold:
+                self._open_until = time.monotonic() + self.cooldown
+
+
+def _is_server_failure(status: Optional[int]) -> bool:
+    """Request lỗi do server/mạng (không có response, 429 hoặc 5xx), tính cho circuit breaker"""
+    return status is None or status == 429 or status >= 500
+
+
+def _slug_cache_key(tax_code: str) -> Tuple[str, str]:
+    """Key cache của slug tương ứng một mã số thuế (không trùng key của requests)"""
+    return 'slug', tax_code
+
+
+def _cache_key(endpoint: str, params: Optional[Dict[str, Any]]) -> Hashable:
+    """
+    Key cache của một request: (endpoint, params đã sắp xếp), hoặc chỉ endpoint khi
+    không có params (str giữ sẵn hash, không phải tạo và hash lại tuple mỗi lần tra cứu)
+    """
+    if not params:
+        return endpoint
+    return endpoint, tuple(sorted(params.items()))
+
+
 class ThongTinDoanhNghiepAPIClient:
     """
     Client API cho thongtindoanhnghiep.co
@@ -38,7 +399,13 @@ class ThongTinDoanhNghiepAPIClient:
         max_retries: int = 3,
         retry_backoff_factor: float = 0.5,
         rate_limit_delay: float = 1.0,
-        logger: Optional[logging.Logger] = None
+        rate_limit_burst: int = 3,
+        logger: Optional[logging.Logger] = None,
+        cache_size: int = 4096,
+        http_cache_path: Optional[str] = None,
+        sync_http2: bool = False,
+        circuit_breaker_threshold: int = 5,
+        circuit_breaker_cooldown: float = 30.0
     ):
         """
         Initialize API client
@@ -48,26 +415,43 @@ class ThongTinDoanhNghiepAPIClient:
             timeout: Timeout cho requests (seconds)
             max_retries: Số lần retry khi request failed
             retry_backoff_factor: Delay factor cho retry
-            rate_limit_delay: Delay giữa các requests (seconds)
+            rate_limit_delay: Delay trung bình giữa các requests (seconds)
+            rate_limit_burst: Số requests được gửi liền nhau sau khi rảnh đủ lâu
             logger: Logger instance
+            cache_size: Số responses tối đa giữ trong cache
+            http_cache_path: File SQLite cache responses của các endpoints tham chiếu
+                (cần requests-cache; giữ được qua các lần chạy)
+            sync_http2: Gửi sync requests qua httpx.Client HTTP/2 (cần httpx[http2];
+                nhiều requests đồng thời dùng chung một kết nối TLS, không dùng cache trên đĩa)
+            circuit_breaker_threshold: Số requests lỗi liên tiếp thì ngừng gửi requests
+                (0 = tắt circuit breaker)
+            circuit_breaker_cooldown: Thời gian ngừng gửi requests (seconds)
         """
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff_factor = retry_backoff_factor
         self.rate_limit_delay = rate_limit_delay
         self.logger = logger or logging.getLogger(__name__)
         
         # Setup session với retry strategy
-        self.session = requests.Session()
+        self.session = self._create_session(http_cache_path)
         
         # Configure retry strategy
         retry_strategy = Retry(
             total=max_retries,
-            status_forcelist=[429, 500, 502, 503, 504],
+            status_forcelist=list(RETRY_STATUS_CODES),
             allowed_methods=["HEAD", "GET", "OPTIONS"],
-            backoff_factor=retry_backoff_factor
+            backoff_factor=retry_backoff_factor,
+            backoff_jitter=BACKOFF_JITTER
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            pool_block=False
+        )
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
@@ -75,13 +459,155 @@ class ThongTinDoanhNghiepAPIClient:
         self.session.headers.update({
             "User-Agent": "EnterpriseDataCollector/2.0 (thongtindoanhnghiep.co API Client)",
             "Accept": "application/json",
-            "Accept-Encoding": "gzip, deflate",
+            "Accept-Encoding": ACCEPT_ENCODING,
             "Connection": "keep-alive"
         })
         
-        # Cache cho dữ liệu ít thay đổi
-        self._cache = {}
-        self._last_request_time = 0
+        # Sync HTTP/2 client (tuỳ chọn), thay cho self.session khi gửi sync requests
+        self._http2_client = self._create_http2_client() if sync_http2 else None
+        
+        # Cache cho dữ liệu ít thay đổi (giới hạn số entries, hết hạn theo cache_ttl)
+        self._cache = _ResponseCache(cache_size)
+        
+        # Rate limiting và circuit breaker dùng chung cho sync và async requests
+        self._rate_limiter = _TokenBucket(rate_limit_delay, rate_limit_burst)
+        self._circuit_breaker = _CircuitBreaker(circuit_breaker_threshold, circuit_breaker_cooldown)
+        
+        # API có nhận MST làm slug của /api/company/{slug} không (None: chưa biết)
+        self._tax_code_as_slug: Optional[bool] = None
+        
+        # Async session (httpx/aiohttp) dùng chung cho các async requests (mở lazily, gắn với một event loop)
+        self._async_session = None
+        self._async_session_loop = None
+        self._rate_limited_until = 0.0
+    
+    def _create_http2_client(self):
+        """
+        Tạo httpx.Client HTTP/2 với connection pool giữ kết nối keep-alive;
+        None nếu chưa cài httpx[http2]
+        """
+        if httpx is None:
+            self.logger.warning("httpx[http2] is not installed, sync HTTP/2 client disabled")
+            return None
+        
+        transport = httpx.HTTPTransport(
+            http2=True,
+            retries=self.max_retries,  # Chỉ retry lỗi kết nối, status codes retry trong _http2_get
+            limits=httpx.Limits(
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                max_connections=2 * HTTP_POOL_MAXSIZE,
+                keepalive_expiry=60
+            )
+        )
+        headers = {k: v for k, v in self.session.headers.items() if k.lower() != "connection"}
+        return httpx.Client(transport=transport, headers=headers, timeout=self.timeout)
+    
+    def _http2_get(self, url: str, params: Optional[Dict[str, Any]]):
+        """
+        GET qua sync HTTP/2 client, retry RETRY_STATUS_CODES với exponential backoff
+        (như Retry của requests session)
+        """
+        for attempt in range(self.max_retries + 1):
+            response = self._http2_client.get(url, params=params)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+            
+            self.logger.warning("Request to %s returned %s, retrying...", url, response.status_code)
+            time.sleep(self._backoff_delay(attempt))
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Thời gian chờ trước lần retry thứ attempt + 1: exponential backoff có jitter"""
+        return self.retry_backoff_factor * (2 ** attempt) + random.uniform(0, BACKOFF_JITTER)
+    
+    def _create_session(self, http_cache_path: Optional[str]) -> requests.Session:
+        """
+        Tạo HTTP session; có http_cache_path và requests-cache thì responses của
+        các endpoints tham chiếu được cache trên đĩa theo REFERENCE_CACHE_EXPIRY
+        """
+        if not http_cache_path:
+            return requests.Session()
+        if CachedSession is None:
+            self.logger.warning("requests-cache is not installed, HTTP cache disabled")
+            return requests.Session()
+        
+        host = self.base_url.split("://", 1)[-1]
+        urls_expire_after = {f"{host}{pattern}": expiry for pattern, expiry in REFERENCE_CACHE_EXPIRY}
+        urls_expire_after["*"] = DO_NOT_CACHE
+        return CachedSession(
+            http_cache_path,
+            backend="sqlite",
+            urls_expire_after=urls_expire_after,
+            allowable_methods=("GET",),
+            stale_if_error=True
+        )
+    
+    async def __aenter__(self) -> 'ThongTinDoanhNghiepAPIClient':
+        await self._get_async_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    async def _get_async_session(self):
+        """
+        Lấy async session của event loop hiện tại (tạo mới nếu chưa có)
+        
+        httpx (HTTP/2): các requests đồng thời được multiplex trên cùng kết nối TLS.
+        aiohttp: connector giữ kết nối keep-alive và cache DNS nên các requests
+        liên tiếp không phải bắt tay TCP/TLS lại.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_session_closed() or self._async_session_loop is not loop:
+            headers = {k: v for k, v in self.session.headers.items() if k.lower() != "connection"}
+            if httpx is not None:
+                self._async_session = httpx.AsyncClient(
+                    http2=True,
+                    headers=headers,
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=HTTP2_MAX_CONNECTIONS)
+                )
+            else:
+                connector = aiohttp.TCPConnector(limit=200, limit_per_host=64, ttl_dns_cache=300)
+                self._async_session = aiohttp.ClientSession(
+                    connector=connector,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout)
+                )
+            self._async_session_loop = loop
+        return self._async_session
+    
+    def _async_session_closed(self) -> bool:
+        """Async session chưa mở hoặc đã đóng"""
+        session = self._async_session
+        if session is None:
+            return True
+        return session.is_closed if httpx is not None else session.closed
+    
+    async def aclose(self):
+        """
+        Đóng async session (phải gọi trong event loop đã mở session)
+        """
+        if self._async_session is not None:
+            if not self._async_session_closed():
+                if httpx is not None:
+                    await self._async_session.aclose()
+                else:
+                    await self._async_session.close()
+            self._async_session = None
+            self._async_session_loop = None
+    
+    def close(self):
+        """
+        Đóng các HTTP sessions
+        """
+        self.session.close()
+        if self._http2_client is not None:
+            self._http2_client.close()
+        if not self._async_session_closed():
+            # Event loop của session không còn chạy ở đây, chỉ bỏ tham chiếu
+            self.logger.debug("Dropping async session that was not closed in its event loop")
+        self._async_session = None
+        self._async_session_loop = None
     
     def _make_request(
         self, 
@@ -103,57 +629,228 @@ class ThongTinDoanhNghiepAPIClient:
             JSON response data
             
         Raises:
-            requests.RequestException: Khi request failed
+            requests.RequestException: Khi request failed (httpx.HTTPError với sync_http2)
         """
         
-        # Rate limiting
-        current_time = time.time()
-        time_since_last = current_time - self._last_request_time
-        if time_since_last < self.rate_limit_delay:
-            sleep_time = self.rate_limit_delay - time_since_last
-            self.logger.debug(f"Rate limiting: sleeping for {sleep_time:.2f}s")
-            time.sleep(sleep_time)
-        
-        # Build URL
-        url = urljoin(self.base_url, endpoint)
+        # Build URL (base_url không có "/" ở cuối, endpoint bắt đầu bằng "/")
+        url = self.base_url + endpoint
         
-        # Check cache
-        cache_key = f"{url}_{urlencode(params or {})}"
-        if use_cache and cache_key in self._cache:
-            cached_data, cache_time = self._cache[cache_key]
-            if current_time - cache_time < cache_ttl:
-                self.logger.debug(f"Using cached data for {url}")
+        # Check cache (cache hit không phải chờ rate limiting)
+        if use_cache:
+            cache_key = _cache_key(endpoint, params)
+            cached_data = self._cache.get(cache_key)
+            if cached_data is not None:
+                self.logger.debug("Using cached data for %s", url)
                 return cached_data
         
-        # Make request
-        self.logger.debug(f"Making request to {url} with params: {params}")
+        # Circuit breaker: server đang lỗi liên tiếp thì không gửi request
+        if self._circuit_breaker.remaining() > 0:
+            return self._reject_open_circuit(url, cache_key if use_cache else None, requests.RequestException)
+        
+        # Rate limiting
+        sleep_time = self._rate_limiter.acquire()
+        if sleep_time > 0:
+            self.logger.debug("Rate limiting: sleeping for %.2fs", sleep_time)
+            time.sleep(sleep_time)
+        
+        # Make request (log mỗi request dùng %-format: chỉ format khi level được bật)
+        self.logger.debug("Making request to %s with params: %s", url, params)
         
         try:
-            response = self.session.get(url, params=params, timeout=self.timeout)
+            if self._http2_client is not None:
+                response = self._http2_get(url, params)
+            else:
+                response = self.session.get(url, params=params, timeout=self.timeout)
             response.raise_for_status()
             
-            # Update last request time
-            self._last_request_time = time.time()
+            # Response lấy từ cache trên đĩa không tính vào rate limit
+            if getattr(response, "from_cache", False):
+                self._rate_limiter.refund()
             
             # Parse JSON
             try:
-                data = response.json()
+                data = _json_loads(response.content)
             except json.JSONDecodeError as e:
-                self.logger.error(f"Failed to parse JSON response: {e}")
+                self.logger.error("Failed to parse JSON response: %s", e)
                 raise requests.RequestException(f"Invalid JSON response: {e}")
             
             # Cache if requested
             if use_cache:
-                self._cache[cache_key] = (data, current_time)
-                self.logger.debug(f"Cached response for {url}")
+                self._cache.set(cache_key, data, cache_ttl)
+                self.logger.debug("Cached response for %s", url)
             
-            self.logger.info(f"Successfully requested {url}")
+            self._circuit_breaker.record_success()
+            self.logger.info("Successfully requested %s", url)
             return data
             
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Request failed for {url}: {e}")
+        except _SyncHTTPErrors as e:
+            self.logger.error("Request failed for %s: %s", url, e)
+            if _is_server_failure(getattr(getattr(e, "response", None), "status_code", None)):
+                self._circuit_breaker.record_failure()
+            if use_cache:
+                stale_data = self._get_stale(cache_key, url)
+                if stale_data is not None:
+                    return stale_data
             raise
     
+    def _reject_open_circuit(self, url: str, cache_key: Optional[Hashable], error_cls: type) -> Any:
+        """
+        Request bị chặn vì mạch đang ngắt: trả về dữ liệu cũ trong cache nếu có,
+        không có thì raise error_cls
+        """
+        if cache_key is not None:
+            stale_data = self._get_stale(cache_key, url)
+            if stale_data is not None:
+                return stale_data
+        remaining = self._circuit_breaker.remaining()
+        raise error_cls(f"Circuit open after repeated failures, skipping {url} for {remaining:.1f}s")
+    
+    def _get_stale(self, cache_key: Hashable, url: str) -> Any:
+        """
+        Response đã hết hạn trong cache, dùng thay khi request lỗi (stale-if-error)
+        """
+        stale_data = self._cache.get_stale(cache_key)
+        if stale_data is not None:
+            self.logger.warning("Serving stale cached data for %s", url)
+        return stale_data
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        Thống kê cache trong bộ nhớ: số entries, hits, misses, stale_hits
+        """
+        return self._cache.stats()
+    
+    async def _async_rate_limit(self):
+        """
+        Giãn cách async requests theo rate_limit_delay và theo giới hạn server báo về
+        """
+        wait = max(
+            self._rate_limiter.acquire(),
+            self._rate_limited_until - time.monotonic()
+        )
+        if wait > 0:
+            self.logger.debug("Rate limiting: sleeping for %.2fs", wait)
+            await asyncio.sleep(wait)
+    
+    def _update_rate_limit_from_headers(self, status: int, headers) -> None:
+        """
+        Cập nhật thời điểm được gửi request tiếp theo từ Retry-After / X-RateLimit-* headers
+        """
+        delay = None
+        retry_after = headers.get("Retry-After")
+        if status == 429 and retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = None
+        elif headers.get("X-RateLimit-Remaining") == "0":
+            try:
+                delay = float(headers.get("X-RateLimit-Reset", self.rate_limit_delay))
+            except ValueError:
+                delay = self.rate_limit_delay
+        
+        if status == 429 and delay is None:
+            delay = self.rate_limit_delay
+        
+        if delay is not None:
+            self._rate_limited_until = max(self._rate_limited_until, time.monotonic() + delay)
+    
+    async def _make_request_async(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        use_cache: bool = False,
+        cache_ttl: int = 3600
+    ) -> Dict[str, Any]:
+        """
+        Async version của _make_request qua async session dùng chung (httpx hoặc aiohttp)
+        
+        Dùng chung cache với _make_request; retry khi gặp 429/5xx (exponential backoff có jitter).
+        
+        Raises:
+            httpx.HTTPError / aiohttp.ClientError: Khi request failed
+        """
+        url = self.base_url + endpoint
+        
+        # Check cache
+        if use_cache:
+            cache_key = _cache_key(endpoint, params)
+            cached_data = self._cache.get(cache_key)
+            if cached_data is not None:
+                self.logger.debug("Using cached data for %s", url)
+                return cached_data
+        
+        if self._circuit_breaker.remaining() > 0:
+            return self._reject_open_circuit(url, cache_key if use_cache else None, _AsyncHTTPError)
+        
+        session = await self._get_async_session()
+        
+        for attempt in range(self.max_retries + 1):
+            await self._async_rate_limit()
+            self.logger.debug("Making async request to %s with params: %s", url, params)
+            
+            status = None
+            try:
+                try:
+                    status, headers, data = await self._async_get(session, url, params)
+                except ValueError as e:
+                    self.logger.error("Failed to parse JSON response: %s", e)
+                    raise _AsyncHTTPError(f"Invalid JSON response: {e}")
+                
+                self._update_rate_limit_from_headers(status, headers)
+                
+                if status in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    self.logger.warning("Request to %s returned %s, retrying...", url, status)
+                    await asyncio.sleep(self._backoff_delay(attempt))
+                    continue
+                
+                if status >= 400:
+                    raise _AsyncHTTPError(f"Request to {url} returned {status}")
+                
+                # Cache if requested
+                if use_cache:
+                    self._cache.set(cache_key, data, cache_ttl)
+                    self.logger.debug("Cached response for %s", url)
+                
+                self._circuit_breaker.record_success()
+                self.logger.info("Successfully requested %s", url)
+                return data
+            
+            except _AsyncHTTPError as e:
+                self.logger.error("Request failed for %s: %s", url, e)
+                if _is_server_failure(status):
+                    self._circuit_breaker.record_failure()
+                if use_cache:
+                    stale_data = self._get_stale(cache_key, url)
+                    if stale_data is not None:
+                        return stale_data
+                raise
+    
+    @staticmethod
+    async def _async_get(session, url: str, params: Optional[Dict[str, Any]]) -> Tuple[int, Any, Any]:
+        """
+        GET qua async session
+        
+        Returns:
+            (status, headers, JSON data); data là None khi status báo lỗi (>= 400)
+        
+        Raises:
+            ValueError: Response không phải JSON hợp lệ
+            httpx.HTTPError / aiohttp.ClientError: Khi request failed (kể cả timeout)
+        """
+        if httpx is not None:
+            response = await session.get(url, params=params)
+            data = _json_loads(response.content) if response.status_code < 400 else None
+            return response.status_code, response.headers, data
+        
+        try:
+            async with session.get(url, params=params) as response:
+                data = _json_loads(await response.read()) if response.status < 400 else None
+                return response.status, response.headers, data
+        except asyncio.TimeoutError as e:
+            # ClientTimeout của aiohttp raise asyncio.TimeoutError (không phải ClientError)
+            raise _AsyncHTTPError(f"Request to {url} timed out") from e
+    
     # =================== GEOGRAPHICAL ENDPOINTS ===================
     
     def get_cities(self, use_cache: bool = True) -> List[City]:
@@ -167,27 +864,19 @@ class ThongTinDoanhNghiepAPIClient:
             List of City objects
         """
         try:
-            data = self._make_request("/api/city", use_cache=use_cache, cache_ttl=86400)  # 24h cache
+            data = self._make_request("/api/city", use_cache=use_cache, cache_ttl=REFERENCE_CACHE_TTL)
             
             cities = []
             # API returns {"LtsItem": [...], "TotalDoanhNghiep": ...}
             items = data.get("LtsItem", [])
             if isinstance(items, list):
-                for item in items:
-                    city = City(
-                        id=item.get("ID", 0),
-                        name=item.get("Title", ""),
-                        slug=item.get("SolrID", "").lstrip("/"),  # Remove leading slash
-                        code=item.get("code"),
-                        type=item.get("Type")
-                    )
-                    cities.append(city)
+                cities = _parse_cities(items)
             
-            self.logger.info(f"Retrieved {len(cities)} cities")
+            self.logger.info("Retrieved %s cities", len(cities))
             return cities
             
         except Exception as e:
-            self.logger.error(f"Failed to get cities: {e}")
+            self.logger.error("Failed to get cities: %s", e)
             return []
     
     def get_city_by_id(self, city_id: int, use_cache: bool = True) -> Optional[City]:
@@ -202,7 +891,7 @@ class ThongTinDoanhNghiepAPIClient:
             City object hoặc None nếu không tìm thấy
         """
         try:
-            data = self._make_request(f"/api/city/{city_id}", use_cache=use_cache)
+            data = self._make_request(f"/api/city/{city_id}", use_cache=use_cache, cache_ttl=REFERENCE_CACHE_TTL)
             
             return City(
                 id=data.get("id", city_id),
@@ -213,7 +902,7 @@ class ThongTinDoanhNghiepAPIClient:
             )
             
         except Exception as e:
-            self.logger.error(f"Failed to get city {city_id}: {e}")
+            self.logger.error("Failed to get city %s: %s", city_id, e)
             return None
     
     def get_districts_by_city_id(self, city_id: int, use_cache: bool = True) -> List[District]:
@@ -228,26 +917,17 @@ class ThongTinDoanhNghiepAPIClient:
             List of District objects
         """
         try:
-            data = self._make_request(f"/api/city/{city_id}/district", use_cache=use_cache)
+            data = self._make_request(f"/api/city/{city_id}/district", use_cache=use_cache, cache_ttl=REFERENCE_CACHE_TTL)
             
             districts = []
             if isinstance(data, list):
-                for item in data:
-                    district = District(
-                        id=item.get("id", 0),
-                        name=item.get("name", ""),
-                        slug=item.get("slug", ""),
-                        city_id=city_id,
-                        code=item.get("code"),
-                        type=item.get("type")
-                    )
-                    districts.append(district)
+                districts = _parse_districts(data, city_id)
             
-            self.logger.info(f"Retrieved {len(districts)} districts for city {city_id}")
+            self.logger.info("Retrieved %s districts for city %s", len(districts), city_id)
             return districts
             
         except Exception as e:
-            self.logger.error(f"Failed to get districts for city {city_id}: {e}")
+            self.logger.error("Failed to get districts for city %s: %s", city_id, e)
             return []
     
     def get_district_by_id(self, district_id: int, use_cache: bool = True) -> Optional[District]:
@@ -262,7 +942,7 @@ class ThongTinDoanhNghiepAPIClient:
             District object hoặc None nếu không tìm thấy
         """
         try:
-            data = self._make_request(f"/api/district/{district_id}", use_cache=use_cache)
+            data = self._make_request(f"/api/district/{district_id}", use_cache=use_cache, cache_ttl=REFERENCE_CACHE_TTL)
             
             return District(
                 id=data.get("id", district_id),
@@ -274,7 +954,7 @@ class ThongTinDoanhNghiepAPIClient:
             )
             
         except Exception as e:
-            self.logger.error(f"Failed to get district {district_id}: {e}")
+            self.logger.error("Failed to get district %s: %s", district_id, e)
             return None
     
     def get_wards_by_district_id(self, district_id: int, use_cache: bool = True) -> List[Ward]:
@@ -289,26 +969,17 @@ class ThongTinDoanhNghiepAPIClient:
             List of Ward objects
         """
         try:
-            data = self._make_request(f"/api/district/{district_id}/ward", use_cache=use_cache)
+            data = self._make_request(f"/api/district/{district_id}/ward", use_cache=use_cache, cache_ttl=REFERENCE_CACHE_TTL)
             
             wards = []
             if isinstance(data, list):
-                for item in data:
-                    ward = Ward(
-                        id=item.get("id", 0),
-                        name=item.get("name", ""),
-                        slug=item.get("slug", ""),
-                        district_id=district_id,
-                        code=item.get("code"),
-                        type=item.get("type")
-                    )
-                    wards.append(ward)
+                wards = _parse_wards(data, district_id)
             
-            self.logger.info(f"Retrieved {len(wards)} wards for district {district_id}")
+            self.logger.info("Retrieved %s wards for district %s", len(wards), district_id)
             return wards
             
         except Exception as e:
-            self.logger.error(f"Failed to get wards for district {district_id}: {e}")
+            self.logger.error("Failed to get wards for district %s: %s", district_id, e)
             return []
     
     def get_ward_by_id(self, ward_id: int, use_cache: bool = True) -> Optional[Ward]:
@@ -323,7 +994,7 @@ class ThongTinDoanhNghiepAPIClient:
             Ward object hoặc None nếu không tìm thấy
         """
         try:
-            data = self._make_request(f"/api/ward/{ward_id}", use_cache=use_cache)
+            data = self._make_request(f"/api/ward/{ward_id}", use_cache=use_cache, cache_ttl=REFERENCE_CACHE_TTL)
             
             return Ward(
                 id=data.get("id", ward_id),
@@ -335,9 +1006,35 @@ class ThongTinDoanhNghiepAPIClient:
             )
             
         except Exception as e:
-            self.logger.error(f"Failed to get ward {ward_id}: {e}")
+            self.logger.error("Failed to get ward %s: %s", ward_id, e)
             return None
     
+    def warm_geography(self, include_wards: bool = True) -> Dict[str, int]:
+        """
+        Lấy trước toàn bộ tỉnh/thành phố, quận/huyện (và phường/xã) vào cache
+        
+        Với http_cache_path, dữ liệu được lưu trên đĩa nên các lần chạy sau (trong
+        REFERENCE_CACHE_TTL) không phải gọi lại API. Lưu ý mỗi quận/huyện là một
+        request phường/xã, tốc độ do rate limiter điều phối.
+        
+        Args:
+            include_wards: Lấy cả phường/xã của từng quận/huyện
+        
+        Returns:
+            Số cities/districts/wards đã lấy
+        """
+        counts = {'cities': 0, 'districts': 0, 'wards': 0}
+        for city in self.get_cities():
+            counts['cities'] += 1
+            districts = self.get_districts_by_city_id(city.id)
+            counts['districts'] += len(districts)
+            if include_wards:
+                for district in districts:
+                    counts['wards'] += len(self.get_wards_by_district_id(district.id))
+        
+        self.logger.info("Geography cache warmed: %s", counts)
+        return counts
+    
     # =================== INDUSTRY ENDPOINTS ===================
     
     def get_industries(self, use_cache: bool = True) -> List[Industry]:
@@ -351,41 +1048,90 @@ class ThongTinDoanhNghiepAPIClient:
             List of Industry objects
         """
         try:
-            data = self._make_request("/api/industry", use_cache=use_cache, cache_ttl=86400)  # 24h cache
+            data = self._make_request("/api/industry", use_cache=use_cache, cache_ttl=REFERENCE_CACHE_TTL)
             
             industries = []
             # API returns {"LtsItem": [...], "TotalItem": ..., "TotalNganhNghe": ...}
             items = data.get("LtsItem", [])
             if isinstance(items, list):
-                for item in items:
-                    # Determine parent based on level structure
-                    parent_id = None
-                    level_codes = [item.get("Lv1"), item.get("Lv2"), item.get("Lv3"), item.get("Lv4"), item.get("Lv5")]
-                    # Filter out empty levels
-                    level_codes = [code for code in level_codes if code and code.strip()]
-                    # If it's not a top-level industry (has more than just Lv1), it has a parent
-                    if len(level_codes) > 1:
-                        # This is a simplification - in a real app you'd build a proper hierarchy
-                        parent_id = 1  # Placeholder
-                    
-                    industry = Industry(
-                        id=item.get("ID", 0),
-                        name=item.get("Title", ""),
-                        slug=item.get("SolrID", "").lstrip("/"),  # Remove leading slash
-                        code=level_codes[-1] if level_codes else None,  # Use the most specific level
-                        parent_id=parent_id
+                # Industry(id, name, slug, code, parent_id)
+                industries = [
+                    Industry(
+                        item.get("ID", 0),
+                        item.get("Title", ""),
+                        item.get("SolrID", "").lstrip("/"),  # Remove leading slash
+                        *_industry_level(item)
                     )
-                    industries.append(industry)
+                    for item in items
+                ]
             
-            self.logger.info(f"Retrieved {len(industries)} industries")
+            self.logger.info("Retrieved %s industries", len(industries))
             return industries
             
         except Exception as e:
-            self.logger.error(f"Failed to get industries: {e}")
+            self.logger.error("Failed to get industries: %s", e)
             return []
     
     # =================== COMPANY ENDPOINTS ===================
     
+    def _build_search_params(
+        self,
+        location_slug: Optional[str],
+        keyword: Optional[str],
+        industry_slug: Optional[str],
+        page: int,
+        page_size: int
+    ) -> Dict[str, Any]:
+        """
+        Build query params cho /api/company
+        """
+        params = {
+            "p": page,
+            "r": page_size
+        }
+        
+        if location_slug:
+            params["l"] = location_slug
+        if keyword:
+            params["k"] = keyword
+        if industry_slug:
+            params["i"] = industry_slug
+        
+        return params
+    
+    def _parse_search_results(self, data: Dict[str, Any], page: int, page_size: int) -> PaginatedResponse:
+        """
+        Parse response của /api/company thành PaginatedResponse
+        """
+        # Parse company list
+        companies = []
+        # API returns structure with LtsItems array (updated structure)
+        company_list = data.get("LtsItems", data.get("LtsDoanhNghiep", []))
+        if isinstance(company_list, list):
+            companies = _parse_company_search_results(company_list)
+        
+        # Get pagination info from Option object
+        option = data.get("Option", {})
+        total_count = option.get("TotalRow", len(companies))
+        current_page = option.get("CurrentPage", page)
+        
+        response = PaginatedResponse.from_api_data(
+            items=companies,
+            page=current_page,
+            page_size=page_size,
+            total_count=total_count
+        )
+        
+        self.logger.info("Search found %s companies, page %s/%s", total_count, page, response.total_pages)
+        return response
+    
+    def _parse_company_detail(self, data: Dict[str, Any]) -> CompanyDetail:
+        """
+        Parse response của /api/company/{slug} thành CompanyDetail
+        """
+        # API trả về trực tiếp CompanyDetail
+        return CompanyDetail.from_api_response(data)
+    
     def search_companies(
         self,
         location_slug: Optional[str] = None,
@@ -407,58 +1153,41 @@ class ThongTinDoanhNghiepAPIClient:
         Returns:
             PaginatedResponse chứa danh sách CompanySearchResult
         """
-        
-        # Build parameters
-        params = {
-            "p": page,
-            "r": page_size
-        }
-        
-        if location_slug:
-            params["l"] = location_slug
-        if keyword:
-            params["k"] = keyword
-        if industry_slug:
-            params["i"] = industry_slug
+        params = self._build_search_params(location_slug, keyword, industry_slug, page, page_size)
         
         try:
             data = self._make_request("/api/company", params=params)
+            return self._parse_search_results(data, page, page_size)
             
-            # Parse company list
-            companies = []
-            # API returns structure with LtsItems array (updated structure)
-            company_list = data.get("LtsItems", data.get("LtsDoanhNghiep", []))
-            if isinstance(company_list, list):
-                for item in company_list:
-                    company = CompanySearchResult(
-                        ma_so_thue=item.get("MaSoThue", ""),
-                        ten_cong_ty=item.get("Title", ""),
-                        dia_chi=item.get("DiaChiCongTy", ""),
-                        tinh_trang=item.get("TrangThaiHoatDong", ""),
-                        slug=item.get("SolrID", ""),
-                        ngay_cap=item.get("NgayCap"),
-                        nganh_nghe=item.get("NganhNgheTitle")
-                    )
-                    companies.append(company)
-            
-            # Get pagination info from Option object
-            option = data.get("Option", {})
-            total_count = option.get("TotalRow", len(companies))
-            current_page = option.get("CurrentPage", page)
-            
-            response = PaginatedResponse.from_api_data(
-                items=companies,
-                page=current_page,
-                page_size=page_size,
-                total_count=total_count
+        except Exception as e:
+            self.logger.error("Failed to search companies: %s", e)
+            return PaginatedResponse.from_api_data(items=[], page=page, page_size=page_size, total_count=0)
+    
+    async def search_companies_async(
+        self,
+        location_slug: Optional[str] = None,
+        keyword: Optional[str] = None,
+        industry_slug: Optional[str] = None,
+        page: int = 1,
+        page_size: int = 20
+    ) -> PaginatedResponse:
+        """
+        Async version của search_companies, dùng async session dùng chung
+        """
+        if not _HAS_ASYNC_HTTP:
+            return await asyncio.to_thread(
+                self.search_companies, location_slug, keyword, industry_slug, page, page_size
             )
-            
-            self.logger.info(f"Search found {total_count} companies, page {page}/{response.total_pages}")
-            return response
+        
+        params = self._build_search_params(location_slug, keyword, industry_slug, page, page_size)
+        
+        try:
+            data = await self._make_request_async("/api/company", params=params)
+            return self._parse_search_results(data, page, page_size)
             
         except Exception as e:
-            self.logger.error(f"Failed to search companies: {e}")
-            return PaginatedResponse(items=[], page=page, page_size=page_size, total_count=0)
+            self.logger.error("Failed to search companies: %s", e)
+            return PaginatedResponse.from_api_data(items=[], page=page, page_size=page_size, total_count=0)
 
     def get_company_detail(self, slug: str) -> Optional[CompanyDetail]:
         """
@@ -472,34 +1201,212 @@ class ThongTinDoanhNghiepAPIClient:
         """
         try:
             data = self._make_request(f"/api/company/{slug}")
+            company_detail = self._parse_company_detail(data)
 
-            # API trả về trực tiếp CompanyDetail
-            company_detail = CompanyDetail(
-                ma_so_thue=data.get("MaSoThue", ""),
-                ten_cong_ty=data.get("Title", ""),
-                dia_chi_thue=data.get("DiaChiCongTy", ""),
-                dai_dien_phap_luat=data.get("DaiDienPhapLuat", ""),
-                dien_thoai=data.get("DienThoai", ""),
-                email=data.get("Email", ""),
-                ngay_cap=data.get("NgayCap"),
-                nganh_nghe_chinh=data.get("NganhNgheChinh", ""),
-                nganh_nghe_kinh_doanh_chi_tiet=data.get("NganhNgheKinhDoanhChiTiet", []), # List of strings
-                trang_thai=data.get("TrangThaiHoatDong", ""),
-                cap_nhat_lan_cuoi=data.get("CapNhatLanCuoi"),
-                slug=data.get("SolrID", "")
-            )
+            self.logger.info("Retrieved detail for company %s", slug)
+            return company_detail
+        
+        except Exception as e:
+            self.logger.error("Failed to get company detail for %s: %s", slug, e)
+            return None
+    
+    async def get_company_detail_async(self, slug: str) -> Optional[CompanyDetail]:
+        """
+        Async version của get_company_detail, dùng async session dùng chung
+        """
+        if not _HAS_ASYNC_HTTP:
+            return await asyncio.to_thread(self.get_company_detail, slug)
+        
+        try:
+            data = await self._make_request_async(f"/api/company/{slug}")
+            company_detail = self._parse_company_detail(data)
 
-            self.logger.info(f"Retrieved detail for company {slug}")
+            self.logger.info("Retrieved detail for company %s", slug)
             return company_detail
 
         except Exception as e:
-            self.logger.error(f"Failed to get company detail for {slug}: {e}")
+            self.logger.error("Failed to get company detail for %s: %s", slug, e)
             return None
 
+    def iter_search_results(
+        self,
+        location_slug: Optional[str] = None,
+        keyword: Optional[str] = None,
+        industry_slug: Optional[str] = None,
+        page_size: int = 20,
+        max_pages: Optional[int] = None,
+        max_workers: int = 4
+    ) -> Iterator[CompanySearchResult]:
+        """
+        Duyệt kết quả tìm kiếm của tất cả các trang, theo đúng thứ tự trang
+        
+        Trang 1 cho biết tổng số trang; các trang sau được tải trước trên max_workers
+        worker threads (tối đa max_workers trang đang chờ) trong lúc caller xử lý
+        trang hiện tại. Tốc độ gửi requests vẫn do rate limiter điều phối.
+        
+        Args:
+            location_slug: Slug địa lý
+            keyword: Từ khóa tìm kiếm tên công ty
+            industry_slug: Slug ngành nghề
+            page_size: Số kết quả mỗi trang
+            max_pages: Số trang tối đa (None = tất cả)
+            max_workers: Số trang được tải đồng thời
+        
+        Yields:
+            CompanySearchResult của từng công ty
+        """
+        search = partial(
+            self.search_companies,
+            location_slug=location_slug,
+            keyword=keyword,
+            industry_slug=industry_slug,
+            page_size=page_size
+        )
+        
+        first_page = search(page=1)
+        yield from first_page.items
+        
+        last_page = first_page.total_pages
+        if max_pages is not None:
+            last_page = min(last_page, max_pages)
+        if not first_page.items or last_page <= 1:
+            return
+        
+        pages = iter(range(2, last_page + 1))
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="search-pages") as executor:
+            # Các trang đang tải, theo thứ tự trang
+            pending = deque(executor.submit(search, page=page) for page in islice(pages, max(1, max_workers)))
+            try:
+                while pending:
+                    search_result = pending.popleft().result()
+                    for page in islice(pages, 1):
+                        pending.append(executor.submit(search, page=page))
+                    yield from search_result.items
+            finally:
+                for future in pending:
+                    future.cancel()
+    
+    def iter_companies(
+        self,
+        location_slug: Optional[str] = None,
+        keyword: Optional[str] = None,
+        industry_slug: Optional[str] = None,
+        max_results: Optional[int] = None,
+        page_size: int = 20
+    ) -> Iterator[CompanyDetail]:
+        """
+        Duyệt chi tiết các công ty theo filter, lần lượt từng trang
+        
+        Mỗi CompanyDetail được yield ngay khi lấy xong nên bộ nhớ chỉ giữ một trang
+        kết quả tìm kiếm, caller có thể ghi ra file/database từng dòng. Trang kế tiếp
+        được tìm kiếm trên một worker thread trong lúc lấy chi tiết của trang hiện tại.
+        
+        Args:
+            location_slug: Slug địa lý
+            keyword: Từ khóa tìm kiếm tên công ty
+            industry_slug: Slug ngành nghề
+            max_results: Số công ty tối đa (None = không giới hạn)
+            page_size: Số kết quả mỗi trang
+        
+        Yields:
+            CompanyDetail của từng công ty lấy được chi tiết
+        """
+        if max_results is not None and max_results <= 0:
+            return
+        
+        if max_results is not None:
+            page_size = min(page_size, max_results)
+        
+        count = 0
+        requested = set()  # MST đã lấy chi tiết (các trang có thể trả về trùng công ty)
+        search = partial(
+            self.search_companies,
+            location_slug=location_slug,
+            keyword=keyword,
+            industry_slug=industry_slug,
+            page_size=page_size
+        )
+        
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-prefetch") as executor:
+            next_page = None
+            page = 1
+            search_result = search(page=page)
+            try:
+                while True:
+                    summaries = []
+                    for summary in search_result.items:
+                        if summary.ma_so_thue not in requested:
+                            requested.add(summary.ma_so_thue)
+                            summaries.append(summary)
+                    
+                    # Prefetch trang kế tiếp, trừ khi trang này có thể đã đủ max_results
+                    if search_result.items and search_result.has_next and (
+                        max_results is None or count + len(summaries) < max_results
+                    ):
+                        next_page = executor.submit(search, page=page + 1)
+                    
+                    for company_summary in summaries:
+                        detail = self.get_company_detail(company_summary.ma_so_thue)
+                        if detail is None:
+                            continue
+                        
+                        yield detail
+                        count += 1
+                        if max_results is not None and count >= max_results:
+                            return
+                    
+                    if not search_result.items or not search_result.has_next:
+                        return
+                    
+                    page += 1
+                    if next_page is not None:
+                        search_result = next_page.result()
+                        next_page = None
+                    else:
+                        search_result = search(page=page)
+            finally:
+                if next_page is not None:
+                    next_page.cancel()
+    
+    def get_companies(
+        self,
+        location_slug: Optional[str] = None,
+        keyword: Optional[str] = None,
+        industry_slug: Optional[str] = None,
+        max_results: Optional[int] = None,
+        page_size: int = 20
+    ) -> List[CompanyDetail]:
+        """
+        Danh sách chi tiết công ty theo filter (xem iter_companies)
+        """
+        return list(self.iter_companies(location_slug, keyword, industry_slug, max_results, page_size))
+    
+    def get_company_summary_by_tax_code(self, tax_code: str) -> Optional[CompanySearchResult]:
+        """
+        Kết quả tìm kiếm (một request) của công ty theo mã số thuế, khi không cần chi tiết
+        
+        Args:
+            tax_code: Mã số thuế của công ty
+        
+        Returns:
+            CompanySearchResult hoặc None nếu không tìm thấy
+        """
+        search_results = self.search_companies(keyword=tax_code, page_size=1)
+        if not search_results.items:
+            return None
+        
+        summary = search_results.items[0]
+        if summary.slug:
+            self._cache.set(_slug_cache_key(tax_code), summary.slug, REFERENCE_CACHE_TTL)
+        return summary
+    
     def get_company_by_tax_code(self, tax_code: str) -> Optional[CompanyDetail]:
         """
         Tìm kiếm thông tin chi tiết công ty theo mã số thuế.
-        Sử dụng search_companies để tìm slug, sau đó dùng get_company_detail.
+        
+        Thứ tự thử: slug đã biết của MST (cache) -> /api/company/{tax_code} trực tiếp
+        (một request; bỏ qua khi API đã cho thấy không nhận MST làm slug) -> search_companies
+        để tìm slug, sau đó dùng get_company_detail.
 
         Args:
             tax_code: Mã số thuế của công ty
@@ -508,25 +1415,128 @@ class ThongTinDoanhNghiepAPIClient:
             CompanyDetail object hoặc None nếu không tìm thấy
         """
         try:
+            company_slug = self._cache.get(_slug_cache_key(tax_code))
+            if company_slug is not None:
+                return self.get_company_detail(company_slug)
+            
+            if self._tax_code_as_slug is not False:
+                company_detail = self._get_detail_by_tax_code(tax_code)
+                if company_detail is not None:
+                    return company_detail
+            
             # Tìm kiếm công ty theo mã số thuế
-            search_results = self.search_companies(keyword=tax_code, page_size=1)
-
-            if search_results.items:
-                # Lấy slug của công ty đầu tiên tìm được
-                company_slug = search_results.items[0].slug
-                if company_slug:
-                    return self.get_company_detail(company_slug)
-                else:
-                    self.logger.warning(f"No slug found for tax code {tax_code}")
-                    return None
-            else:
-                self.logger.info(f"No company found for tax code {tax_code}")
-                return None
+            summary = self.get_company_summary_by_tax_code(tax_code)
+            return self._detail_from_summary(tax_code, summary, self.get_company_detail)
 
         except Exception as e:
-            self.logger.error(f"Failed to get company by tax code {tax_code}: {e}")
+            self.logger.error("Failed to get company by tax code %s: %s", tax_code, e)
             return None
-
+    
+    def _get_detail_by_tax_code(self, tax_code: str) -> Optional[CompanyDetail]:
+        """
+        Chi tiết công ty qua /api/company/{tax_code} (MST làm slug); None nếu API không nhận
+        """
+        try:
+            data = self._make_request(f"/api/company/{tax_code}")
+        except Exception as e:
+            self.logger.debug("Direct tax code lookup failed for %s: %s", tax_code, e)
+            return None
+        return self._parse_detail_by_tax_code(tax_code, data)
+    
+    def _parse_detail_by_tax_code(self, tax_code: str, data: Any) -> Optional[CompanyDetail]:
+        """
+        CompanyDetail từ response của /api/company/{tax_code} nếu đúng công ty cần tìm
+        """
+        if isinstance(data, dict) and data.get("MaSoThue") == tax_code:
+            self._tax_code_as_slug = True
+            return self._parse_company_detail(data)
+        return None
+    
+    def _detail_from_summary(
+        self,
+        tax_code: str,
+        summary: Optional[CompanySearchResult],
+        get_detail: Callable[[str], Any]
+    ) -> Any:
+        """
+        get_detail(slug) của kết quả tìm kiếm theo MST (None nếu không tìm thấy / không có slug);
+        tìm thấy qua search thì API không nhận MST làm slug, các lần sau bỏ qua request trực tiếp
+        """
+        if summary is None:
+            self.logger.info("No company found for tax code %s", tax_code)
+            return None
+        
+        if not summary.slug:
+            self.logger.warning("No slug found for tax code %s", tax_code)
+            return None
+        
+        if self._tax_code_as_slug is None:
+            self._tax_code_as_slug = False
+        return get_detail(summary.slug)
+    
+    async def get_company_summary_by_tax_code_async(self, tax_code: str) -> Optional[CompanySearchResult]:
+        """
+        Async version của get_company_summary_by_tax_code
+        """
+        search_results = await self.search_companies_async(keyword=tax_code, page_size=1)
+        if not search_results.items:
+            return None
+        
+        summary = search_results.items[0]
+        if summary.slug:
+            self._cache.set(_slug_cache_key(tax_code), summary.slug, REFERENCE_CACHE_TTL)
+        return summary
+    
+    async def get_company_by_tax_code_async(self, tax_code: str) -> Optional[CompanyDetail]:
+        """
+        Async version của get_company_by_tax_code (cùng thứ tự thử)
+        """
+        try:
+            company_slug = self._cache.get(_slug_cache_key(tax_code))
+            if company_slug is not None:
+                return await self.get_company_detail_async(company_slug)
+            
+            if self._tax_code_as_slug is not False:
+                try:
+                    data = await self._make_request_async(f"/api/company/{tax_code}")
+                except Exception as e:
+                    self.logger.debug("Direct tax code lookup failed for %s: %s", tax_code, e)
+                    data = None
+                company_detail = self._parse_detail_by_tax_code(tax_code, data)
+                if company_detail is not None:
+                    return company_detail
+            
+            summary = await self.get_company_summary_by_tax_code_async(tax_code)
+            detail = self._detail_from_summary(tax_code, summary, self.get_company_detail_async)
+            return await detail if detail is not None else None
+        
+        except Exception as e:
+            self.logger.error("Failed to get company by tax code %s: %s", tax_code, e)
+            return None
+    
+    async def get_companies_by_tax_codes_async(
+        self,
+        tax_codes: List[str],
+        concurrency: int = 16
+    ) -> List[Optional[CompanyDetail]]:
+        """
+        Tra cứu nhiều MST đồng thời (tối đa concurrency tra cứu cùng lúc; tốc độ
+        gửi requests vẫn do rate limiter của client điều phối)
+        
+        Args:
+            tax_codes: Danh sách mã số thuế
+            concurrency: Số tra cứu chạy đồng thời
+        
+        Returns:
+            CompanyDetail (hoặc None nếu không tìm thấy) theo đúng thứ tự tax_codes
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def lookup(tax_code: str) -> Optional[CompanyDetail]:
+            async with semaphore:
+                return await self.get_company_by_tax_code_async(tax_code)
+        
+        return list(await asyncio.gather(*(lookup(tax_code) for tax_code in tax_codes)))
 
 # Example Usage (for testing purposes)
 async def main():
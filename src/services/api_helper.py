@@ -278,12 +278,7 @@ class APIHelper:
             output_data = []
             
             for company in companies:
-                company_data = company.to_dict()
-                
-                if not include_raw:
-                    company_data.pop('raw_json', None)
-                
-                output_data.append(company_data)
+                output_data.append(company.to_dict(include_raw_json=include_raw))
             
             # Ensure output directory exists
             Path(output_file).parent.mkdir(parents=True, exist_ok=True)
@@ -319,21 +314,13 @@ class APIHelper:
         city = cities[0]
         industry = industries[0]
         
-        # Search companies
-        search_result = self.api_client.search_companies(
+        # Search companies và lấy chi tiết từng công ty
+        return self.api_client.get_companies(
             location_slug=city.slug,
             industry_slug=industry.slug,
+            max_results=max_companies,
             page_size=max_companies
         )
-        
-        # Get details for each company
-        companies = []
-        for company_summary in search_result.items[:max_companies]:
-            detail = self.api_client.get_company_detail(company_summary.ma_so_thue)
-            if detail:
-                companies.append(detail)
-        
-        return companies
 
 
 def create_api_client_with_logging(
@@ -413,22 +400,18 @@ def quick_search(
             print(f"Validation errors: {params.get('errors', [])}")
             return []
         
-        # Search companies
-        search_result = client.search_companies(
+        print(f"Searching companies, getting details for first {max_results}...")
+        
+        # Search companies và lấy chi tiết từng công ty
+        companies = []
+        for detail in client.iter_companies(
             location_slug=params.get('location_slug'),
             industry_slug=params.get('industry_slug'),
+            max_results=max_results,
             page_size=min(max_results, 50)
-        )
-        
-        print(f"Found {search_result.total_count} companies, getting details for first {max_results}...")
-        
-        # Get details
-        companies = []
-        for company_summary in search_result.items[:max_results]:
-            detail = client.get_company_detail(company_summary.ma_so_thue)
-            if detail:
-                companies.append(detail)
-                print(f"✓ {detail.ma_so_thue}: {detail.ten_cong_ty}")
+        ):
+            companies.append(detail)
+            print(f"✓ {detail.ma_so_thue}: {detail.ten_cong_ty}")
         
         # Export if requested
         if output_file and companies:
@@ -6,11 +6,12 @@ Author: MiniMax Agent
 
 import logging
 import asyncio
-from typing import Optional, List, Dict, Any, Callable
+from typing import Optional, List, Dict, Any, Callable, Iterator, Union
 from datetime import datetime
-import time
+import json
+from functools import partial
 
-from .api_client import ThongTinDoanhNghiepAPIClient
+from .api_client import ThongTinDoanhNghiepAPIClient, _json_loads
 from .hsctvn_client import HSCTVNEnhanced
 from ..models.enhanced_company import EnhancedCompany
 from ..models.database import DatabaseManager
@@ -55,6 +56,12 @@ class EnhancedIntegratedDataService:
             'end_time': None
         }
     
+    def close(self):
+        """
+        Đóng các HTTP sessions dùng bởi service
+        """
+        self.api_client.close()
+    
     def _report_progress(self, message: str, current: int, total: int):
         """Report progress via callback and logging"""
         if self.progress_callback:
@@ -69,7 +76,9 @@ class EnhancedIntegratedDataService:
         max_companies: Optional[int] = None,
         page_size: int = 20,
         enable_hsctvn: bool = True,
-        hsctvn_delay: float = 2.0
+        hsctvn_delay: float = 2.0,
+        hsctvn_concurrency: int = 4,
+        api_concurrency: int = 8
     ) -> Dict[str, Any]:
         """
         Thu thập dữ liệu enhanced từ 2 nguồn
@@ -80,7 +89,9 @@ class EnhancedIntegratedDataService:
             max_companies: Giới hạn số công ty
             page_size: Số công ty mỗi page
             enable_hsctvn: Có kích hoạt HSCTVN scraping không
-            hsctvn_delay: Delay giữa các HSCTVN requests (giây)
+            hsctvn_delay: Delay của mỗi worker sau một HSCTVN request (giây)
+            hsctvn_concurrency: Số HSCTVN requests chạy đồng thời tối đa
+            api_concurrency: Số API detail requests chạy đồng thời tối đa
             
         Returns:
             Dictionary chứa thống kê kết quả
@@ -108,7 +119,8 @@ class EnhancedIntegratedDataService:
                 location_slug=location_slug,
                 industry_slug=industry_slug,
                 max_companies=max_companies,
-                page_size=page_size
+                page_size=page_size,
+                concurrency=api_concurrency
             )
             
             if not companies:
@@ -117,7 +129,7 @@ class EnhancedIntegratedDataService:
             
             # Giai đoạn 2: Tích hợp với HSCTVN (nếu được kích hoạt)
             if enable_hsctvn:
-                await self._integrate_hsctvn_data(companies, hsctvn_delay)
+                await self._integrate_hsctvn_data(companies, hsctvn_delay, hsctvn_concurrency)
             
             # Giai đoạn 3: Lưu vào database
             await self._save_enhanced_companies(companies)
@@ -136,157 +148,231 @@ class EnhancedIntegratedDataService:
             self.logger.error(f"Enhanced collection failed: {e}")
             self.db_manager.log_message('ERROR', f"Enhanced collection failed: {e}")
             raise
+        
+        finally:
+            # aiohttp session gắn với event loop của lần thu thập này
+            await self.api_client.aclose()
     
     async def _collect_from_api(
         self,
         location_slug: Optional[str],
         industry_slug: Optional[str],
         max_companies: Optional[int],
-        page_size: int
+        page_size: int,
+        concurrency: int = 8
     ) -> List[EnhancedCompany]:
         """
         Thu thập dữ liệu từ API chính
+        
+        Chi tiết của các công ty trong một trang được lấy đồng thời, giới hạn bởi
+        asyncio.Semaphore(concurrency); khoảng cách giữa các requests do API client
+        điều phối (rate_limit_delay, Retry-After). Trang kết quả kế tiếp được tìm kiếm
+        song song với việc lấy chi tiết của trang hiện tại.
         """
-        self.logger.info("Phase 1: Collecting data from main API...")
+        self.logger.info(f"Phase 1: Collecting data from main API (concurrency={concurrency})...")
         
         companies = []
+        requested = set()  # MST đã lấy chi tiết (các trang có thể trả về trùng công ty)
         page = 1
+        next_search = None
+        search = partial(
+            self.api_client.search_companies_async,
+            location_slug=location_slug,
+            industry_slug=industry_slug,
+            page_size=page_size
+        )
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        completed = 0
         
-        while True:
-            self._report_progress(
-                f"Searching page {page} from API...", 
-                len(companies), 
-                max_companies or 1000
-            )
-            
-            # Search companies
-            search_result = self.api_client.search_companies(
-                location_slug=location_slug,
-                industry_slug=industry_slug,
-                page=page,
-                page_size=page_size
-            )
+        async def fetch_one(company_summary, total: int) -> Optional[EnhancedCompany]:
+            nonlocal completed
             
-            if not search_result.items:
-                self.logger.info("No more companies found from API")
-                break
-            
-            # Get details for each company
-            for i, company_summary in enumerate(search_result.items):
-                current_count = len(companies) + 1
-                
-                # Check limits
-                if max_companies and current_count > max_companies:
-                    break
-                
+            async with semaphore:
+                completed += 1
                 self._report_progress(
                     f"Getting details: {company_summary.ma_so_thue}",
-                    current_count,
-                    max_companies or search_result.total_count
+                    completed,
+                    total
                 )
                 
                 try:
                     # Get company detail from API
-                    company_detail = self.api_client.get_company_detail(company_summary.ma_so_thue)
+                    company_detail = await self.api_client.get_company_detail_async(company_summary.ma_so_thue)
                     
                     if company_detail:
-                        # Convert to EnhancedCompany
-                        enhanced_company = EnhancedCompany.from_api_data(company_detail.to_dict())
-                        companies.append(enhanced_company)
-                        
                         self.stats['api_success'] += 1
                         self.logger.debug(f"API data collected: {company_summary.ma_so_thue}")
-                    else:
-                        self.logger.warning(f"No details found for {company_summary.ma_so_thue}")
-                        self.stats['errors'] += 1
-                        
+                        # Convert to EnhancedCompany (JSON gốc của response được dùng lại, không serialize lần hai)
+                        return EnhancedCompany.from_api_data(
+                            company_detail.to_dict(include_raw_json=False),
+                            raw_json=company_detail.raw_json
+                        )
+                    
+                    self.logger.warning(f"No details found for {company_summary.ma_so_thue}")
+                    self.stats['errors'] += 1
+                
                 except Exception as e:
                     self.logger.error(f"Error getting details for {company_summary.ma_so_thue}: {e}")
                     self.stats['errors'] += 1
-                
-                # Rate limiting
-                time.sleep(0.5)
+                return None
+        
+        try:
+            while True:
+                self._report_progress(
+                    f"Searching page {page} from API...", 
+                    len(companies), 
+                    max_companies or 1000
+                )
+            
+                # Search companies (trang đã được prefetch ở vòng trước nếu có)
+                if next_search is not None:
+                    search_result = await next_search
+                    next_search = None
+                else:
+                    search_result = await search(page=page)
+            
+                if not search_result.items:
+                    self.logger.info("No more companies found from API")
+                    break
             
-            # Check stopping conditions
-            if max_companies and len(companies) >= max_companies:
-                break
+                # Get details for the companies of this page: mỗi lượt chỉ lấy số công ty còn thiếu
+                # so với max_companies, lượt sau bù cho các công ty không lấy được chi tiết
+                total = max_companies or search_result.total_count
+                summaries = []
+                for summary in search_result.items:
+                    if summary.ma_so_thue not in requested:
+                        requested.add(summary.ma_so_thue)
+                        summaries.append(summary)
+                
+                # Tìm kiếm trang kế tiếp trong lúc lấy chi tiết trang này,
+                # trừ khi trang này có thể đã đủ max_companies
+                if search_result.has_next and (
+                    not max_companies or len(companies) + len(summaries) < max_companies
+                ):
+                    next_search = asyncio.ensure_future(search(page=page + 1))
+                
+                while summaries:
+                    needed = max_companies - len(companies) if max_companies else len(summaries)
+                    if needed <= 0:
+                        break
+                    batch, summaries = summaries[:needed], summaries[needed:]
+                    details = await asyncio.gather(*(fetch_one(summary, total) for summary in batch))
+                    companies.extend(company for company in details if company is not None)
                 
-            if not search_result.has_next:
-                break
+                # Check stopping conditions
+                if max_companies and len(companies) >= max_companies:
+                    break
+                
+                if not search_result.has_next:
+                    break
             
-            page += 1
+                page += 1
+        finally:
+            if next_search is not None:
+                next_search.cancel()
         
         self.stats['total_processed'] = len(companies)
         self.logger.info(f"Phase 1 completed: {len(companies)} companies from API")
         return companies
     
-    async def _integrate_hsctvn_data(self, companies: List[EnhancedCompany], delay: float):
+    async def _integrate_hsctvn_data(
+        self,
+        companies: List[EnhancedCompany],
+        delay: float,
+        concurrency: int = 4,
+        max_retries: int = 2
+    ):
         """
         Tích hợp dữ liệu từ HSCTVN
+        
+        Các requests chạy đồng thời, giới hạn bởi asyncio.Semaphore(concurrency).
+        Request lỗi được retry với exponential backoff.
         """
-        self.logger.info(f"Phase 2: Integrating HSCTVN data for {len(companies)} companies...")
+        self.logger.info(f"Phase 2: Integrating HSCTVN data for {len(companies)} companies (concurrency={concurrency})...")
         
-        for i, company in enumerate(companies, 1):
-            self._report_progress(
-                f"HSCTVN integration: {company.ma_so_thue}",
-                i,
-                len(companies)
-            )
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        total = len(companies)
+        completed = 0
+        
+        async def integrate_one(company: EnhancedCompany):
+            nonlocal completed
             
-            try:
-                # Get data from HSCTVN
-                hsctvn_data = await self.hsctvn_client.search_company(company.ma_so_thue)
+            async with semaphore:
+                for attempt in range(max_retries + 1):
+                    try:
+                        # Get data from HSCTVN
+                        hsctvn_data = await self.hsctvn_client.search_company(company.ma_so_thue)
+                        
+                        # Chỉ count success nếu có dữ liệu thực sự hữu ích
+                        if hsctvn_data and self.hsctvn_client.has_meaningful_data(hsctvn_data):
+                            company.integrate_hsctvn_data(hsctvn_data)
+                            self.stats['hsctvn_success'] += 1
+                            # Count as dual source if both sources have data
+                            if company.data_source == "dual":
+                                self.stats['dual_source_success'] += 1
+                            self.logger.debug(f"HSCTVN data integrated: {company.ma_so_thue}")
+                            self.logger.info(f"HSCTVN data validated successfully for {company.ma_so_thue}")
+                        else:
+                            self.logger.warning(f"HSCTVN data validation failed for {company.ma_so_thue}")
+                        break
+                        
+                    except Exception as e:
+                        if attempt < max_retries:
+                            backoff = max(delay, 1.0) * (2 ** attempt)
+                            self.logger.warning(f"HSCTVN request failed for {company.ma_so_thue}, retrying in {backoff:.1f}s: {e}")
+                            await asyncio.sleep(backoff)
+                        else:
+                            self.logger.error(f"Error integrating HSCTVN data for {company.ma_so_thue}: {e}")
+                            self.stats['errors'] += 1
                 
-                # Chỉ count success nếu có dữ liệu thực sự hữu ích
-                if hsctvn_data and self.hsctvn_client.has_meaningful_data(hsctvn_data):
-                    company.integrate_hsctvn_data(hsctvn_data)
-                    self.stats['hsctvn_success'] += 1
-                    # Count as dual source if both sources have data
-                    if company.data_source == "dual":
-                        self.stats['dual_source_success'] += 1
-                    self.logger.debug(f"HSCTVN data integrated: {company.ma_so_thue}")
-                    self.logger.info(f"HSCTVN data validated successfully for {company.ma_so_thue}")
-                else:
-                    self.logger.warning(f"HSCTVN data validation failed for {company.ma_so_thue}")
-                    
-            except Exception as e:
-                self.logger.error(f"Error integrating HSCTVN data for {company.ma_so_thue}: {e}")
-                self.stats['errors'] += 1
+                # Rate limiting for HSCTVN (per worker slot)
+                if delay > 0:
+                    await asyncio.sleep(delay)
             
-            # Rate limiting for HSCTVN
-            await asyncio.sleep(delay)
+            completed += 1
+            self._report_progress(
+                f"HSCTVN integration: {company.ma_so_thue}",
+                completed,
+                total
+            )
+        
+        await asyncio.gather(*(integrate_one(company) for company in companies))
         
         self.logger.info(f"Phase 2 completed: {self.stats['hsctvn_success']} successful HSCTVN integrations")
     
-    async def _save_enhanced_companies(self, companies: List[EnhancedCompany]):
+    async def _save_enhanced_companies(self, companies: List[EnhancedCompany], batch_size: int = 500):
         """
         Lưu enhanced companies vào database
+        
+        Companies được gom theo batch, mỗi batch ghi trong một transaction.
         """
         self.logger.info(f"Phase 3: Saving {len(companies)} enhanced companies to database...")
         
-        for i, company in enumerate(companies, 1):
-            self._report_progress(
-                f"Saving: {company.ma_so_thue}",
-                i,
-                len(companies)
-            )
+        total = len(companies)
+        for start in range(0, total, batch_size):
+            batch = companies[start:start + batch_size]
             
             try:
-                company_dict = company.to_dict()
+                # Check which companies already exist (for stats)
+                existing = self.db_manager.get_existing_tax_codes([c.ma_so_thue for c in batch])
+                saved = self.db_manager.save_companies(c.to_dict() for c in batch)
                 
-                # Check if exists
-                if self.db_manager.company_exists(company.ma_so_thue):
-                    if self.db_manager.update_company(company.ma_so_thue, company_dict):
-                        self.stats['updated_records'] += 1
-                        self.logger.debug(f"Updated company: {company.ma_so_thue}")
+                if saved:
+                    updated = sum(1 for c in batch if c.ma_so_thue in existing)
+                    self.stats['updated_records'] += updated
+                    self.stats['new_records'] += saved - updated
                 else:
-                    if self.db_manager.insert_company(company_dict):
-                        self.stats['new_records'] += 1
-                        self.logger.debug(f"Inserted new company: {company.ma_so_thue}")
-                        
+                    self.stats['errors'] += len(batch)
+            
             except Exception as e:
-                self.logger.error(f"Error saving company {company.ma_so_thue}: {e}")
-                self.stats['errors'] += 1
+                self.logger.error(f"Error saving companies batch at {start}: {e}")
+                self.stats['errors'] += len(batch)
+            
+            self._report_progress(
+                f"Saving: {batch[-1].ma_so_thue}",
+                min(start + batch_size, total),
+                total
+            )
         
         self.logger.info(f"Phase 3 completed: {self.stats['new_records']} new, {self.stats['updated_records']} updated")
     
@@ -333,8 +419,8 @@ class EnhancedIntegratedDataService:
                 conditions.append('data_source = ?')
                 params.append(data_source)
             
-            # Get raw data
-            raw_companies = self.db_manager.get_companies(
+            # Get raw data (stream theo batch, không giữ cả list dict)
+            raw_companies = self.db_manager.iter_companies(
                 tinh_trang=tinh_trang,
                 nganh_nghe=nganh_nghe,
                 tinh_thanh_pho=tinh_thanh_pho,
@@ -345,47 +431,7 @@ class EnhancedIntegratedDataService:
             enhanced_companies = []
             for raw_data in raw_companies:
                 try:
-                    # Create EnhancedCompany from database data
-                    company = EnhancedCompany(
-                        ma_so_thue=raw_data.get('ma_so_thue', ''),
-                        ten_cong_ty=raw_data.get('ten_cong_ty', ''),
-                        ten_giao_dich=raw_data.get('ten_giao_dich', ''),
-                        ten_tieng_anh=raw_data.get('ten_tieng_anh', ''),
-                        nguoi_dai_dien=raw_data.get('nguoi_dai_dien', ''),
-                        chuc_vu_dai_dien=raw_data.get('chuc_vu_dai_dien', ''),
-                        dai_dien_phap_luat=raw_data.get('dai_dien_phap_luat', ''),
-                        dien_thoai=raw_data.get('dien_thoai', ''),
-                        dien_thoai_dai_dien=raw_data.get('dien_thoai_dai_dien', ''),
-                        fax=raw_data.get('fax', ''),
-                        email=raw_data.get('email', ''),
-                        website=raw_data.get('website', ''),
-                        dia_chi_dang_ky=raw_data.get('dia_chi_dang_ky', ''),
-                        dia_chi_thue=raw_data.get('dia_chi_thue', ''),
-                        tinh_thanh_pho=raw_data.get('tinh_thanh_pho', ''),
-                        quan_huyen=raw_data.get('quan_huyen', ''),
-                        phuong_xa=raw_data.get('phuong_xa', ''),
-                        nganh_nghe_kinh_doanh_chinh=raw_data.get('nganh_nghe_kinh_doanh_chinh', ''),
-                        # Parse nganh_nghe_khac from JSON string
-                        nganh_nghe_khac=self._parse_json_field(raw_data.get('nganh_nghe_khac', '')),
-                        loai_hinh_doanh_nghiep=raw_data.get('loai_hinh_doanh_nghiep', ''),
-                        tinh_trang_hoat_dong=raw_data.get('tinh_trang_hoat_dong', ''),
-                        so_giay_phep_kinh_doanh=raw_data.get('so_giay_phep_kinh_doanh', ''),
-                        ngay_cap_giay_phep=raw_data.get('ngay_cap_giay_phep'),
-                        ngay_hoat_dong=raw_data.get('ngay_hoat_dong'),
-                        ngay_thay_doi_gan_nhat=raw_data.get('ngay_thay_doi_gan_nhat'),
-                        co_quan_cap_phep=raw_data.get('co_quan_cap_phep', ''),
-                        so_quyet_dinh=raw_data.get('so_quyet_dinh', ''),
-                        von_dieu_le=raw_data.get('von_dieu_le', ''),
-                        von_dang_ky=raw_data.get('von_dang_ky', ''),
-                        cap_nhat_lan_cuoi=raw_data.get('cap_nhat_lan_cuoi', ''),
-                        trang_thai_hsctvn=raw_data.get('trang_thai_hsctvn', ''),
-                        data_source=raw_data.get('data_source', 'api'),
-                        raw_json_api=raw_data.get('raw_json_api', ''),
-                        raw_json_hsctvn=raw_data.get('raw_json_hsctvn', ''),
-                        created_at=self._parse_datetime(raw_data.get('created_at')),
-                        updated_at=self._parse_datetime(raw_data.get('updated_at'))
-                    )
-                    enhanced_companies.append(company)
+                    enhanced_companies.append(self._row_to_enhanced_company(raw_data))
                     
                 except Exception as e:
                     self.logger.error(f"Error converting raw data to EnhancedCompany: {e}")
@@ -398,23 +444,107 @@ class EnhancedIntegratedDataService:
             self.logger.error(f"Failed to get enhanced companies from database: {e}")
             return []
 
+    def iter_enhanced_companies_from_db(
+        self,
+        batch_size: int = 1000,
+        tinh_trang: Optional[str] = None,
+        nganh_nghe: Optional[str] = None,
+        tinh_thanh_pho: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[EnhancedCompany]:
+        """
+        Stream enhanced companies từ database, đọc theo batch (không materialize cả list)
+        
+        Args:
+            batch_size: Số rows đọc mỗi lần từ cursor
+            tinh_trang: Tình trạng hoạt động
+            nganh_nghe: Ngành nghề
+            tinh_thanh_pho: Tỉnh/thành phố
+            limit: Giới hạn số kết quả
+        
+        Yields:
+            EnhancedCompany objects
+        """
+        raw_companies = self.db_manager.iter_companies(
+            batch_size=batch_size,
+            tinh_trang=tinh_trang,
+            nganh_nghe=nganh_nghe,
+            tinh_thanh_pho=tinh_thanh_pho,
+            limit=limit
+        )
+        
+        for raw_data in raw_companies:
+            try:
+                company = self._row_to_enhanced_company(raw_data)
+            except Exception as e:
+                self.logger.error(f"Error converting raw data to EnhancedCompany: {e}")
+                continue
+            yield company
+    
+    def _row_to_enhanced_company(self, raw_data: Dict[str, Any]) -> EnhancedCompany:
+        """
+        Create EnhancedCompany from database row
+        
+        Row của Companies không có raw JSON (bảng CompanyRaw): raw_json_api/raw_json_hsctvn
+        để rỗng, đọc qua db_manager.get_raw() khi cần.
+        """
+        return EnhancedCompany(
+            ma_so_thue=raw_data.get('ma_so_thue', ''),
+            ten_cong_ty=raw_data.get('ten_cong_ty', ''),
+            ten_giao_dich=raw_data.get('ten_giao_dich', ''),
+            ten_tieng_anh=raw_data.get('ten_tieng_anh', ''),
+            nguoi_dai_dien=raw_data.get('nguoi_dai_dien', ''),
+            chuc_vu_dai_dien=raw_data.get('chuc_vu_dai_dien', ''),
+            dai_dien_phap_luat=raw_data.get('dai_dien_phap_luat', ''),
+            dien_thoai=raw_data.get('dien_thoai', ''),
+            dien_thoai_dai_dien=raw_data.get('dien_thoai_dai_dien', ''),
+            fax=raw_data.get('fax', ''),
+            email=raw_data.get('email', ''),
+            website=raw_data.get('website', ''),
+            dia_chi_dang_ky=raw_data.get('dia_chi_dang_ky', ''),
+            dia_chi_thue=raw_data.get('dia_chi_thue', ''),
+            tinh_thanh_pho=raw_data.get('tinh_thanh_pho', ''),
+            quan_huyen=raw_data.get('quan_huyen', ''),
+            phuong_xa=raw_data.get('phuong_xa', ''),
+            nganh_nghe_kinh_doanh_chinh=raw_data.get('nganh_nghe_kinh_doanh_chinh', ''),
+            # Parse nganh_nghe_khac from JSON string
+            nganh_nghe_khac=self._parse_json_field(raw_data.get('nganh_nghe_khac', '')),
+            loai_hinh_doanh_nghiep=raw_data.get('loai_hinh_doanh_nghiep', ''),
+            tinh_trang_hoat_dong=raw_data.get('tinh_trang_hoat_dong', ''),
+            so_giay_phep_kinh_doanh=raw_data.get('so_giay_phep_kinh_doanh', ''),
+            ngay_cap_giay_phep=raw_data.get('ngay_cap_giay_phep'),
+            ngay_hoat_dong=raw_data.get('ngay_hoat_dong'),
+            ngay_thay_doi_gan_nhat=raw_data.get('ngay_thay_doi_gan_nhat'),
+            co_quan_cap_phep=raw_data.get('co_quan_cap_phep', ''),
+            so_quyet_dinh=raw_data.get('so_quyet_dinh', ''),
+            von_dieu_le=raw_data.get('von_dieu_le', ''),
+            von_dang_ky=raw_data.get('von_dang_ky', ''),
+            cap_nhat_lan_cuoi=raw_data.get('cap_nhat_lan_cuoi', ''),
+            trang_thai_hsctvn=raw_data.get('trang_thai_hsctvn', ''),
+            data_source=raw_data.get('data_source', 'api'),
+            created_at=self._parse_datetime(raw_data.get('created_at')),
+            updated_at=self._parse_datetime(raw_data.get('updated_at'))
+        )
+    
     def _parse_json_field(self, json_string: str) -> List[str]:
         """Parse JSON string to list, handling errors"""
         if not json_string:
             return []
         try:
-            return json.loads(json_string)
-        except json.JSONDecodeError:
+            return _json_loads(json_string)
+        except json.JSONDecodeError:  # orjson.JSONDecodeError là lớp con
             self.logger.warning(f"Invalid JSON string for nganh_nghe_khac: {json_string}")
             return []
 
-    def _parse_datetime(self, dt_string: Optional[str]) -> Optional[datetime]:
+    def _parse_datetime(self, dt_string: Optional[Union[str, int]]) -> Optional[datetime]:
         """
         Parse datetime string to datetime object.
-        Handles multiple formats and None values.
+        Handles epoch seconds (database timestamps), multiple formats and None values.
         """
         if not dt_string:
             return None
+        if isinstance(dt_string, (int, float)):
+            return datetime.fromtimestamp(dt_string)
         for fmt in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%d %H:%M:%S.%f"]:
             try:
                 return datetime.strptime(dt_string, fmt)
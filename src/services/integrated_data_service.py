@@ -266,7 +266,6 @@ class IntegratedDataService:
         
         try:
             page = 1
-            collected_companies = []
             
             while True:
                 # Search companies
@@ -313,7 +312,6 @@ class IntegratedDataService:
                         if company_detail:
                             # Save to database
                             if self.save_company(company_detail):
-                                collected_companies.append(company_detail)
                                 self.logger.info(f"Successfully processed {tax_code}: {company_detail.ten_cong_ty}")
                             else:
                                 self.logger.error(f"Failed to save {tax_code}")
@@ -99,6 +99,39 @@ class CollectionWorker(QThread):
         self.terminate()
 
 
+class ExportWorker(QThread):
+    """
+    Worker thread for Excel export to avoid UI freezing
+    """
+    
+    export_completed = pyqtSignal(str)  # output path
+    export_failed = pyqtSignal(str)  # error message
+    
+    def __init__(
+        self,
+        controller: EnhancedAppController,
+        filename: str,
+        include_charts: bool = True
+    ):
+        super().__init__()
+        self.controller = controller
+        self.filename = filename
+        self.include_charts = include_charts
+    
+    def run(self):
+        """Run export in separate thread"""
+        try:
+            output_path = self.controller.export_to_excel(
+                companies=None,
+                filename=self.filename,
+                include_charts=self.include_charts
+            )
+            self.export_completed.emit(output_path)
+        
+        except Exception as e:
+            self.export_failed.emit(str(e))
+
+
 class EnhancedMainWindow(QMainWindow):
     """
     Enhanced main window cho Enterprise Data Collector v2.0
@@ -122,6 +155,7 @@ class EnhancedMainWindow(QMainWindow):
         
         # UI state
         self.collection_worker = None
+        self.export_worker = None
         self.current_companies = []
         
         # Initialize UI
@@ -666,24 +700,41 @@ class EnhancedMainWindow(QMainWindow):
             )
             
             if filename:
-                # Export
-                output_path = self.controller.export_to_excel(
-                    companies=self.current_companies,
+                # Export toàn bộ dữ liệu đã thu thập (stream từ database) trên worker thread
+                self.export_worker = ExportWorker(
+                    controller=self.controller,
                     filename=Path(filename).name,
                     include_charts=True
                 )
+                self.export_worker.export_completed.connect(self.on_export_completed)
+                self.export_worker.export_failed.connect(self.on_export_failed)
                 
-                QMessageBox.information(
-                    self,
-                    "Xuất thành công",
-                    f"Dữ liệu đã được xuất ra:\n{output_path}"
-                )
-                
-                self.log_message(f"Exported {len(self.current_companies)} companies to {output_path}")
+                self.export_button.setEnabled(False)
+                self.progress_label.setText("Đang xuất Excel...")
+                self.export_worker.start()
         
         except Exception as e:
             self.show_error(f"Failed to export: {e}")
     
+    def on_export_completed(self, output_path: str):
+        """Xử lý khi xuất Excel thành công"""
+        self.export_button.setEnabled(True)
+        self.progress_label.setText("Sẵn sàng")
+        
+        QMessageBox.information(
+            self,
+            "Xuất thành công",
+            f"Dữ liệu đã được xuất ra:\n{output_path}"
+        )
+        
+        self.log_message(f"Exported collected companies to {output_path}")
+    
+    def on_export_failed(self, error_message: str):
+        """Xử lý khi xuất Excel thất bại"""
+        self.export_button.setEnabled(True)
+        self.progress_label.setText("Sẵn sàng")
+        self.show_error(f"Failed to export: {error_message}")
+    
     def clear_data(self):
         """Xóa dữ liệu"""
         reply = QMessageBox.question(
@@ -812,6 +863,10 @@ Năm: 2025"""
                 self.collection_worker.stop()
                 self.collection_worker.wait(3000)  # Wait up to 3 seconds
             
+            # Đợi export đang chạy ghi xong file
+            if self.export_worker and self.export_worker.isRunning():
+                self.export_worker.wait()
+            
             # Close controller
             self.controller.close()
             